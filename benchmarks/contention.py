@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+
+"""Multi-process stress test for Trackerian's store locking.
+
+Several worker processes each run a number of begin and tag commands
+against the same data folder at once, the way an interactive session
+and scheduled jobs overlap. Every command is a separate Trackerian
+process. When they have all finished the store is loaded and checked
+for lost updates, and the throughput under contention is reported.
+
+Usage:
+    python3 benchmarks/contention.py [--processes 8] [--commands 25]
+                                     [--store pickle] [--json]
+
+"""
+
+import argparse
+import concurrent.futures
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO)
+
+import trackerian  # noqa: E402
+
+
+def parse_arguments(args):
+    """Parse arguments and return them in a dictionary."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--processes', type=int, default=8,
+                        help="Workers running commands at the same time")
+    parser.add_argument('--commands', type=int, default=25,
+                        help="Begin and tag pairs run by each worker")
+    parser.add_argument('--store', default='pickle',
+                        choices=sorted(trackerian.STORES),
+                        help="Value of TRACKERIAN_STORE")
+    parser.add_argument('--json', action='store_true',
+                        help="Print results as JSON")
+    return vars(parser.parse_args(args))
+
+
+def worker(number, commands, env):
+    """Run commands begin and tag pairs, one process per command."""
+    program = [sys.executable, os.path.join(REPO, 'trackerian.py')]
+    for command in range(commands):
+        label = 'w{}c{}'.format(number, command)
+        for args in (['-b', label], ['-t', label]):
+            subprocess.run(program + args, env=env, check=True,
+                           stdout=subprocess.DEVNULL)
+
+
+def count_updates(store):
+    """Return the number of activities and tags in the store in the cwd."""
+    trackerian.open_store(store)
+    activities = list(trackerian.Activity.instances)
+    return len(activities), sum(len(activity.tags) for activity in activities)
+
+
+def main():
+    """Run the workers then check the store and print the results."""
+    args = parse_arguments(sys.argv[1:])
+    env = dict(os.environ, TRACKERIAN_STORE=args['store'])
+    expected = args['processes'] * args['commands']
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        os.chdir(temp_dir)
+        start = time.perf_counter()
+        with concurrent.futures.ThreadPoolExecutor(args['processes']) as pool:
+            for future in [pool.submit(worker, number, args['commands'], env)
+                           for number in range(args['processes'])]:
+                future.result()
+        elapsed = time.perf_counter() - start
+        activities, tags = count_updates(args['store'])
+        os.chdir(REPO)
+
+    result = {
+        'processes': args['processes'],
+        'commands': expected * 2,
+        'store': args['store'],
+        'seconds': round(elapsed, 3),
+        'commands_per_second': round(expected * 2 / elapsed, 1),
+        'activities': activities,
+        'tags': tags,
+        'lost_updates': (expected - activities) + (expected - tags),
+    }
+    if args['json']:
+        print(json.dumps(result, indent=2))
+    else:
+        print("{commands} commands from {processes} processes on the {store} "
+              "store in {seconds}s ({commands_per_second}/s)".format(**result))
+        print("{} of {} activities and {} of {} tags kept, {} lost".format(
+            activities, expected, tags, expected, result['lost_updates']
+        ))
+    if result['lost_updates']:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
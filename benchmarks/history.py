@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+
+"""Synthetic history generator for Trackerian benchmarks.
+
+Activities are laid out backwards from now through working hours, with
+shorter days at weekends and gaps between activities, so day and week
+ranges hold what they would for a real user. Names and tags are drawn
+from fixed lists with a long tail, a few common ones and many rare ones,
+and each activity has up to three tags. Histories longer than YEARS
+years' worth of ordinary days are packed into YEARS years with more,
+shorter activities per day. The same count and seed always give the
+same history, apart from where now falls.
+
+Usage:
+    python3 benchmarks/history.py 100k [--store pickle] [--seed 0]
+                                        [--directory .]
+
+"""
+
+import argparse
+import array
+import datetime
+import itertools
+import os
+import random
+import sys
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO)
+
+import trackerian  # noqa: E402
+
+NAMES = [
+    'Email', 'Code Review', 'Standup', 'Write Tests', 'Bug Fixing',
+    'Planning', 'Documentation', 'Reading', 'Lunch', 'Client Call',
+    'Refactoring', 'Deploy', 'Research', 'Design', 'Interviews',
+    'One To One', 'Support', 'Triage', 'Writing', 'Admin', 'Invoicing',
+    'Training', 'Pairing', 'Release Notes', 'Benchmarking', 'Profiling',
+    'Migration', 'Security Review', 'Hiring', 'Onboarding', 'Retrospective',
+    'Estimating', 'Prototyping', 'Code Cleanup', 'Budgeting', 'Travel',
+    'Workshop', 'Conference', 'Mentoring', 'Blog Post', 'Demo',
+    'Dependency Updates', 'Incident Review', 'Data Cleanup', 'Reporting',
+    'Accessibility Audit', 'Translation', 'Backups', 'Server Maintenance',
+    'Roadmap', 'Expenses', 'Customer Feedback', 'Marketing', 'Sales Call',
+    'Legal Review', 'Architecture', 'Spike', 'Hackathon', 'Open Source',
+    'Exercise',
+]
+TAGS = [
+    'Billable', 'Productive', 'Meeting', 'Internal', 'Client A', 'Client B',
+    'Client C', 'Urgent', 'Deep Work', 'Remote', 'Office', 'Overtime',
+    'Backend', 'Frontend', 'Ops', 'Personal', 'Learning', 'Q1', 'Q2',
+    'Q3', 'Q4', 'Follow Up', 'Blocked', 'Review',
+]
+TAG_COUNTS = [0, 1, 2, 3]
+TAG_COUNT_WEIGHTS = [3, 4, 2, 1]
+
+YEARS = 20
+ACTIVITIES_PER_DAY = 10
+# Working hours as (start, end) hours by weekday, Monday first
+WORKING_HOURS = [(8, 18)] * 5 + [(10, 13)] * 2
+
+HOUR = 3600 * 10 ** 6
+
+
+def parse_count(value):
+    """Return value as an integer count, allowing k and M suffixes."""
+    multiplier = {'k': 10 ** 3, 'm': 10 ** 6}.get(value[-1:].lower(), 1)
+    count = int(value[:-1] if multiplier > 1 else value) * multiplier
+    if count < 1:
+        raise ValueError("{} is not a positive count".format(value))
+    return count
+
+
+def long_tail_weights(size):
+    """Return cumulative weights making earlier choices more common."""
+    return list(itertools.accumulate(1 / (rank + 1) for rank in range(size)))
+
+
+def generate_rows(count, end=None, seed=0):
+    """Return count finished activities as oldest first column rows.
+
+    Args:
+        count (int): Number of activities.
+        end (datetime): No activity finishes after this. Defaults to now.
+        seed (int): Seed choosing names, tags and durations.
+
+    Returns:
+        Iterator of (start, end, name, tags) rows as taken by
+        trackerian.row_activity.
+
+    """
+    rng = random.Random(seed)
+    per_day = max(ACTIVITIES_PER_DAY, -(-count // (YEARS * 365)))
+    slot = 10 * HOUR // per_day
+
+    end = end or trackerian.get_current_datetime()
+    day = end.replace(hour=0, minute=0, second=0, microsecond=0)
+    cursor = trackerian.datetime_to_micros(end)
+
+    # Walk backwards from end so the newest activities are always recent
+    starts = array.array('q')
+    ends = array.array('q')
+    while len(starts) < count:
+        opens, closes = WORKING_HOURS[day.weekday()]
+        opening = trackerian.datetime_to_micros(day) + opens * HOUR
+        cursor = min(cursor, opening + (closes - opens) * HOUR)
+        while len(starts) < count and cursor - slot >= opening:
+            start = cursor - slot
+            starts.append(start)
+            ends.append(start + int(slot * rng.uniform(0.5, 0.95)))
+            cursor = start
+        day -= datetime.timedelta(days=1)
+
+    name_weights = long_tail_weights(len(NAMES))
+    tag_weights = long_tail_weights(len(TAGS))
+    for start, stop in zip(reversed(starts), reversed(ends)):
+        name = rng.choices(NAMES, cum_weights=name_weights)[0]
+        tags = rng.choices(TAGS, cum_weights=tag_weights,
+                           k=rng.choices(TAG_COUNTS, TAG_COUNT_WEIGHTS)[0])
+        yield start, stop, name, tuple(dict.fromkeys(tags))
+
+
+def write_history(count, store='pickle', end=None, seed=0):
+    """Replace the history in the cwd with count generated activities.
+
+    The pickle store is always written, and other stores are then seeded
+    from it as they are on first use. Activity.instances is left holding
+    the generated activities.
+
+    Args:
+        count (int): Number of activities.
+        store (str): Key of trackerian.STORES to write as well.
+        end (datetime): No activity finishes after this. Defaults to now.
+        seed (int): Seed choosing names, tags and durations.
+
+    """
+    trackerian.Activity.instances = trackerian.IndexedActivities(
+        trackerian.row_activity(*row)
+        for row in generate_rows(count, end, seed)
+    )
+    trackerian.Activity.events = []
+    trackerian.Journal().checkpoint()
+    if store != 'pickle':
+        trackerian.open_store(store)
+
+
+def main():
+    """Write a generated history to a data folder."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('count', type=parse_count,
+                        help="Number of activities, such as 5000, 10k or 2M")
+    parser.add_argument('--store', default='pickle',
+                        choices=sorted(trackerian.STORES),
+                        help="Store to write as well as the pickle store")
+    parser.add_argument('--seed', type=int, default=0,
+                        help="Seed choosing names, tags and durations")
+    parser.add_argument('--directory', default='.',
+                        help="Folder to write the data files to")
+    args = parser.parse_args()
+
+    directory = os.path.abspath(args.directory)
+    os.makedirs(directory, exist_ok=True)
+    os.chdir(directory)
+    write_history(args.count, args.store, seed=args.seed)
+    first = trackerian.Activity.instances[0].start
+    print("Wrote {} activities from {:%Y-%m-%d} to {}".format(
+        args.count, first, directory
+    ))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+
+"""Speedup benchmark for the parallel summary engine.
+
+For each history size a synthetic history is generated in a temporary
+folder by history.py and print_summary is timed with the python engine,
+then with the parallel engine for each worker count. The speedup of each
+worker count is reported against the python engine and against the
+fewest workers timed, so running it on machines with more cores draws
+the curve of how summaries scale with them.
+
+Usage:
+    python3 benchmarks/parallel.py [--sizes 100k 1M] [--workers 1 2 4 8]
+                                   [--range all] [--runs 5]
+                                   [--store pickle] [--seed 0] [--json]
+
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+
+import history
+import suite
+
+trackerian = history.trackerian
+
+
+def parse_arguments(args):
+    """Parse arguments and return them in a dictionary."""
+    cpus = os.cpu_count() or 1
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', nargs='+', type=history.parse_count,
+                        default=[10 ** 5, 10 ** 6],
+                        help="Activities in each generated history, such as "
+                        "100k or 1M")
+    parser.add_argument('--workers', nargs='+', type=trackerian.positive_int,
+                        default=[count for count in (1, 2, 4, 8, 16, 32)
+                                 if count < cpus] + [cpus],
+                        help="Worker counts to time, by default powers of "
+                        "two up to the number of CPUs")
+    parser.add_argument('--range', default='all',
+                        choices=trackerian.TIME_PERIODS,
+                        help="Range summarised")
+    parser.add_argument('--runs', type=int, default=5,
+                        help="Times to run each benchmark")
+    parser.add_argument('--store', default='pickle',
+                        choices=sorted(trackerian.STORES),
+                        help="Store the history is loaded from")
+    parser.add_argument('--seed', type=int, default=0,
+                        help="Seed for the generated histories")
+    parser.add_argument('--json', action='store_true',
+                        help="Print results as JSON")
+    return vars(parser.parse_args(args))
+
+
+def benchmark_size(activities, args):
+    """Return results for the python engine and each worker count."""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        os.chdir(temp_dir)
+        history.write_history(activities, args['store'], seed=args['seed'])
+        trackerian.open_store(args['store'])
+        start = trackerian.calculate_date_range_start(args['range'])
+
+        benchmarks = [('python', suite.quietly(trackerian.print_summary,
+                                                 start, 'python'))]
+        for workers in args['workers']:
+            benchmarks.append((
+                'parallel {}'.format(workers),
+                suite.quietly(trackerian.print_summary, start, 'parallel',
+                              None, workers)
+            ))
+
+        results = []
+        for name, function in benchmarks:
+            # An untimed first call builds indexes and rollups it reuses
+            function()
+            results.append(suite.result(
+                'print_summary {} {}'.format(args['range'], name),
+                activities, suite.timed(function, args['runs'])
+            ))
+        os.chdir(suite.REPO)
+
+    serial = results[0]['median_ms']
+    fewest = results[1]['median_ms'] if len(results) > 1 else serial
+    for new in results:
+        new['speedup'] = round(serial / new['median_ms'], 2)
+        new['scaling'] = round(fewest / new['median_ms'], 2)
+    return results
+
+
+def main():
+    """Run the benchmark for each size and print the speedup curve."""
+    args = parse_arguments(sys.argv[1:])
+    args['workers'].sort()
+    if not trackerian.can_fork():
+        sys.exit("Worker processes cannot be forked on this platform")
+
+    results = []
+    for activities in args['sizes']:
+        results.extend(benchmark_size(activities, args))
+
+    if args['json']:
+        print(json.dumps({'version': suite.version(), 'cpus': os.cpu_count(),
+                          'store': args['store'], 'results': results},
+                         indent=2))
+        return
+
+    print("{} CPUs, {} store\n".format(os.cpu_count(), args['store']))
+    print("{:<28} {:>10} {:>12} {:>9} {:>11}".format(
+        'benchmark', 'activities', 'median ms', 'speedup', 'scaling'
+    ))
+    for new in results:
+        print("{:<28} {:>10} {:>12.2f} {:>8.2f}x {:>10.2f}x".format(
+            new['benchmark'], new['activities'], new['median_ms'],
+            new['speedup'], new['scaling']
+        ))
+
+
+if __name__ == '__main__':
+    main()
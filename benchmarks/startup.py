@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+
+"""Cold start benchmark for Trackerian commands.
+
+Every command is run in a fresh interpreter, as a script calling
+Trackerian would, against a generated history in a temporary folder.
+The begin, current, tag and finish commands are run as a cycle so each
+run sees the same state. Wall times are reported per command next to the
+time to start an interpreter that does nothing.
+
+Usage:
+    python3 benchmarks/startup.py [--runs 20] [--activities 1000]
+                                  [--store pickle] [--module] [--json]
+
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import history
+
+REPO = history.REPO
+trackerian = history.trackerian
+
+CYCLE = [['-b', 'Benchmark'], ['-c'], ['-t', 'bench'], ['-f']]
+READS = [['-l'], ['-s']]
+
+
+def parse_arguments(args):
+    """Parse arguments and return them in a dictionary."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=20,
+                        help="Times to run each command")
+    parser.add_argument('--activities', type=int, default=1000,
+                        help="Activities in the generated history")
+    parser.add_argument('--store', default='pickle',
+                        choices=sorted(trackerian.STORES),
+                        help="Value of TRACKERIAN_STORE")
+    parser.add_argument('--module', action='store_true',
+                        help="Run 'python -m trackerian' instead of the "
+                        "script so its cached bytecode is used")
+    parser.add_argument('--json', action='store_true',
+                        help="Print results as JSON")
+    return vars(parser.parse_args(args))
+
+
+def timed_run(command, env):
+    """Return the wall time in seconds of running command to completion."""
+    start = time.perf_counter()
+    subprocess.run(command, env=env, check=True, stdout=subprocess.DEVNULL)
+    return time.perf_counter() - start
+
+
+def summarise(name, times):
+    """Return a result dictionary for one command's wall times."""
+    return {
+        'command': name,
+        'runs': len(times),
+        'median_ms': round(statistics.median(times) * 1000, 2),
+        'min_ms': round(min(times) * 1000, 2),
+    }
+
+
+def main():
+    """Generate a history then time each command and print the results."""
+    args = parse_arguments(sys.argv[1:])
+    env = dict(os.environ, TRACKERIAN_STORE=args['store'],
+               PYTHONPATH=REPO)
+    if args['module']:
+        program = [sys.executable, '-m', 'trackerian']
+    else:
+        program = [sys.executable, os.path.join(REPO, 'trackerian.py')]
+
+    times = {' '.join(command): [] for command in CYCLE + READS}
+    times['(interpreter only)'] = []
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        os.chdir(temp_dir)
+        history.write_history(args['activities'])
+        # First run seeds other stores and writes the head record
+        subprocess.run(program + ['-c'], env=env, check=True,
+                       stdout=subprocess.DEVNULL)
+
+        for _ in range(args['runs']):
+            times['(interpreter only)'].append(
+                timed_run([sys.executable, '-c', 'pass'], env)
+            )
+            for command in CYCLE + READS:
+                times[' '.join(command)].append(
+                    timed_run(program + command, env)
+                )
+        os.chdir(REPO)
+
+    results = [summarise(name, values) for name, values in times.items()]
+    if args['json']:
+        print(json.dumps({
+            'activities': args['activities'], 'store': args['store'],
+            'module': args['module'], 'python': sys.version.split()[0],
+            'results': results,
+        }, indent=2))
+        return
+
+    print("{} activities, {} store, {}".format(
+        args['activities'], args['store'],
+        'python -m trackerian' if args['module'] else 'trackerian.py'
+    ))
+    print()
+    for result in results:
+        print("{:<20} median {:>8.2f} ms   min {:>8.2f} ms".format(
+            result['command'], result['median_ms'], result['min_ms']
+        ))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,261 @@
+#!/usr/bin/env python3
+
+"""Scaling benchmarks for Trackerian's functions and commands.
+
+For each history size a synthetic history is generated in a temporary
+folder by history.py, then the functions behind each command are timed
+in this interpreter: loading, committing to and checkpointing the store,
+listing, summarising and editing. Whole commands are timed as main() calls,
+loading the store first and committing after, as trackerian.py does.
+Commands that change the history are run as a cycle that puts it back
+so every run sees the same history.
+
+Results can be written as JSON with --output and an earlier results
+file passed to --compare to report which benchmarks got slower.
+
+Usage:
+    python3 benchmarks/suite.py [--sizes 10k 100k] [--runs 5]
+                                [--store pickle] [--seed 0]
+                                [--output results.json]
+                                [--compare baseline.json] [--tolerance 0.1]
+
+"""
+
+import argparse
+import contextlib
+import datetime
+import functools
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import history
+
+REPO = history.REPO
+trackerian = history.trackerian
+
+RANGES = ['day', 'week', 'all']
+# Commands are run in this order, so begin to remove leave no trace
+COMMANDS = [
+    ['-b', 'Benchmark'], ['-c'], ['-t', 'bench'], ['-f'], ['-r', '-1'],
+    ['-e', '0', 'name', 'Renamed'], ['-l', 'week'], ['-l', 'all'],
+    ['-s', 'week'], ['-s', 'all'], ['-x', 'all'],
+]
+
+
+def parse_arguments(args):
+    """Parse arguments and return them in a dictionary."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', nargs='+', type=history.parse_count,
+                        default=[10 ** 4, 10 ** 5],
+                        help="Activities in each generated history, such as "
+                        "10k or 10M")
+    parser.add_argument('--runs', type=int, default=5,
+                        help="Times to run each benchmark")
+    parser.add_argument('--store', default='pickle',
+                        choices=sorted(trackerian.STORES),
+                        help="Store main() loads and commits to")
+    parser.add_argument('--seed', type=int, default=0,
+                        help="Seed for the generated histories")
+    parser.add_argument('--output', metavar='file',
+                        help="Write results as JSON to file")
+    parser.add_argument('--json', action='store_true',
+                        help="Print results as JSON")
+    parser.add_argument('--compare', metavar='file',
+                        help="Results file of an earlier version to compare "
+                        "with")
+    parser.add_argument('--tolerance', type=float, default=0.1,
+                        help="Fraction slower than --compare counted as a "
+                        "regression")
+    return vars(parser.parse_args(args))
+
+
+def quietly(function, *args):
+    """Return a function calling function(*args) with stdout discarded."""
+    def run():
+        with open(os.devnull, 'w') as devnull:
+            with contextlib.redirect_stdout(devnull):
+                function(*args)
+    return run
+
+
+def edit_first(info_to_edit, new_value):
+    """Edit the first activity then drop the event it queued."""
+    trackerian.edit_activity(trackerian.Activity.instances[0],
+                             info_to_edit, new_value)
+    del trackerian.Activity.events[:]
+
+
+def commit_tag(store):
+    """Journal and commit an empty tag of the latest activity."""
+    trackerian.record_event('tag', trackerian.Activity.instances[-1], [])
+    store.commit()
+
+
+def function_benchmarks(store):
+    """Return (name, function) pairs timing the module's functions.
+
+    Args:
+        store: Loaded store whose load, commit and checkpoint are timed.
+
+    """
+    engines = ['python']
+    if trackerian.load_numpy() is not None:
+        engines.append('numpy')
+    benchmarks = [
+        ('store load', store.load),
+        ('store commit', functools.partial(commit_tag, store)),
+        ('store checkpoint', store.checkpoint),
+    ]
+    for time_period in RANGES:
+        start = trackerian.calculate_date_range_start(time_period)
+        benchmarks.append(('print_list ' + time_period,
+                           quietly(trackerian.print_list, start)))
+        for engine in engines:
+            benchmarks.append(('print_summary {} {}'.format(time_period,
+                                                            engine),
+                               quietly(trackerian.print_summary, start,
+                                       engine)))
+    benchmarks.append(('edit_activity name',
+                       functools.partial(edit_first, 'name', ['Renamed'])))
+    benchmarks.append(('edit_activity tag',
+                       functools.partial(edit_first, 'tag', ['bench'])))
+    return benchmarks
+
+
+def run_command(command, store):
+    """Run a command the way trackerian.py does, with stdout discarded."""
+    args = trackerian.parse_arguments(command)
+    journal = trackerian.open_store(store, tail=trackerian.tail_only(args))
+    quietly(trackerian.main, args, journal)()
+    journal.commit()
+
+
+def timed(function, runs):
+    """Return the wall times in seconds of calling function runs times."""
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return times
+
+
+def result(name, activities, times):
+    """Return a result dictionary for one benchmark's wall times."""
+    return {
+        'benchmark': name,
+        'activities': activities,
+        'runs': len(times),
+        'median_ms': round(statistics.median(times) * 1000, 3),
+        'min_ms': round(min(times) * 1000, 3),
+        'max_ms': round(max(times) * 1000, 3),
+    }
+
+
+def benchmark_size(activities, args):
+    """Return results for every benchmark on a generated history."""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        os.chdir(temp_dir)
+        start = time.perf_counter()
+        history.write_history(activities, args['store'], seed=args['seed'])
+        results = [result('generate history', activities,
+                          [time.perf_counter() - start])]
+
+        store = trackerian.open_store(args['store'])
+        for name, function in function_benchmarks(store):
+            # An untimed first call builds indexes and rollups it reuses
+            function()
+            results.append(result(name, activities,
+                                  timed(function, args['runs'])))
+
+        times = {' '.join(command): [] for command in COMMANDS}
+        for _ in range(args['runs']):
+            for command in COMMANDS:
+                times[' '.join(command)].extend(timed(
+                    lambda: run_command(command, args['store']), 1
+                ))
+        results.extend(result('main ' + name, activities, values)
+                       for name, values in times.items())
+        os.chdir(REPO)
+    return results
+
+
+def version():
+    """Return the git description of the checkout being measured."""
+    try:
+        return subprocess.run(
+            ['git', 'describe', '--always', '--dirty'], cwd=REPO,
+            stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+            universal_newlines=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline_file, tolerance):
+    """Print each result's change from baseline_file.
+
+    Returns:
+        Number of benchmarks more than tolerance slower than baseline.
+
+    """
+    with open(baseline_file) as baseline:
+        before = {(old['benchmark'], old['activities']): old['median_ms']
+                  for old in json.load(baseline)['results']}
+    regressions = 0
+    print("Compared with {}\n".format(baseline_file))
+    for new in results:
+        old = before.get((new['benchmark'], new['activities']))
+        if not old:
+            continue
+        change = new['median_ms'] / old - 1
+        slower = change > tolerance
+        regressions += slower
+        print("{:<28} {:>10} {:>10.2f} ms -> {:>10.2f} ms {:>+8.1%}{}".format(
+            new['benchmark'], new['activities'], old, new['median_ms'],
+            change, '  SLOWER' if slower else ''
+        ))
+    return regressions
+
+
+def main():
+    """Run the benchmarks for each size and report the results."""
+    args = parse_arguments(sys.argv[1:])
+    results = []
+    for activities in args['sizes']:
+        results.extend(benchmark_size(activities, args))
+
+    report = {
+        'version': version(),
+        'date': datetime.datetime.now().isoformat(timespec='seconds'),
+        'python': sys.version.split()[0],
+        'platform': platform.platform(),
+        'store': args['store'],
+        'seed': args['seed'],
+        'runs': args['runs'],
+        'results': results,
+    }
+    if args['output']:
+        with open(args['output'], 'w') as output:
+            json.dump(report, output, indent=2)
+    if args['json']:
+        print(json.dumps(report, indent=2))
+    elif not args['compare']:
+        for new in results:
+            print("{:<28} {:>10} median {:>10.2f} ms   min {:>10.2f} ms"
+                  .format(new['benchmark'], new['activities'],
+                          new['median_ms'], new['min_ms']))
+
+    if args['compare'] and compare(results, args['compare'],
+                                   args['tolerance']):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -5,6 +5,16 @@
 import collections
 import datetime
 import io
+import json
+import os
+import pickle
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
 import unittest
 import unittest.mock
 from unittest.mock import patch
@@ -73,6 +83,51 @@ class TestParseArguments(unittest.TestCase):
         self.assertEqual(args['remove'], 1)
 
 
+class TestQuickArguments(unittest.TestCase):
+    """Tests for trackerian's quick_arguments() function."""
+
+    def test_matches_parse_arguments_for_quick_commands(self):
+        for args in (['-b', 'Write', 'Readme'], ['--begin', 'Code'], ['-f'],
+                     ['--finish'], ['-c'], ['--current'], ['-t'],
+                     ['--tag', 'Args', 'Listed']):
+            with self.subTest(args=args):
+                self.assertEqual(trackerian.quick_arguments(args),
+                                 trackerian.parse_arguments(args))
+
+    def test_other_commands_left_to_parse_arguments(self):
+        for args in ([], ['-l'], ['-h'], ['--summary', 'all'],
+                     ['-b', 'Code', '-t', 'Work'], ['-f', 'extra'],
+                     ['--fin'], ['-b', '-5']):
+            with self.subTest(args=args):
+                self.assertIsNone(trackerian.quick_arguments(args))
+
+
+class TestLazyModules(unittest.TestCase):
+    """Tests for the modules trackerian imports only when used."""
+
+    def test_quick_commands_do_not_import_them(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            script = os.path.abspath(trackerian.__file__)
+            modules = subprocess.run(
+                [sys.executable, script, '-c'], cwd=temp_dir,
+                env=dict(os.environ, PYTHONVERBOSE='1',
+                         TRACKERIAN_STORE='pickle'),
+                stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+                universal_newlines=True, check=True
+            ).stderr
+        for module in ('trackerian_stores', 'trackerian_engines',
+                       'trackerian_daemon', 'json', 'mmap', 'array'):
+            with self.subTest(module=module):
+                self.assertNotIn('import {!r}'.format(module), modules)
+
+    def test_moved_names_still_reachable(self):
+        self.assertIs(trackerian.SQLiteStore,
+                      sys.modules['trackerian_stores'].SQLiteStore)
+        self.assertIs(trackerian.serve,
+                      sys.modules['trackerian_daemon'].serve)
+        with self.assertRaises(AttributeError):
+            trackerian.missing_name
+
 class TestMainBegin(unittest.TestCase):
     """Tests for how main() deals with the begin arg."""
 
@@ -222,7 +277,7 @@ class TestMainCurrent(unittest.TestCase):
 class TestMainList(unittest.TestCase):
     """Tests for how main() deals with list args."""
 
-    @patch('trackerian.calculate_date_range_start')
+    @patch('trackerian.calculate_date_range', return_value=(None, None))
     @patch('trackerian.parse_arguments')
     def test_passes_arg_to_calculate_datetime(self, mocked_args,
                                               mocked_calculate):
@@ -230,6 +285,17 @@ class TestMainList(unittest.TestCase):
         trackerian.main()
         self.assertEqual(mocked_calculate.call_args[0][0], 'passed')
 
+    @patch('sys.stdout', new_callable=io.StringIO)
+    @patch('trackerian.print_list')
+    @patch('trackerian.parse_arguments')
+    def test_since_alone_lists_range(self, mocked_args, mocked_print,
+                                     mocked_stdout):
+        since = datetime.datetime(2018, 3, 1)
+        mocked_args.return_value = edit_args_dict('since', since)
+        trackerian.main()
+        self.assertEqual(mocked_print.call_args[0][0], since)
+        self.assertIsNone(mocked_print.call_args[1]['date_range_end'])
+
 
 class TestMainTag(unittest.TestCase):
     """Tests for how main() deals with the tag arg."""
@@ -332,10 +398,10 @@ class TestMainEdit(unittest.TestCase):
 class TestMainSummary(unittest.TestCase):
     """Tests for how main() deals with summary args."""
 
-    @patch('trackerian.calculate_date_range_start')
+    @patch('trackerian.calculate_date_range', return_value=(None, None))
     @patch('trackerian.parse_arguments')
-    def test_passes_arg_to_calculate_date_range_start(self, mocked_args,
-                                                      mocked_calculate):
+    def test_passes_arg_to_calculate_date_range(self, mocked_args,
+                                                mocked_calculate):
         mocked_args.return_value = edit_args_dict('summary', 'day')
         trackerian.main()
         self.assertEqual(mocked_calculate.call_args[0][0], 'day')
@@ -366,6 +432,54 @@ class TestCalculateSummaryDateRangeStart(unittest.TestCase):
         self.assertTrue(eight_days_ago < test_return < early_week_ago)
 
 
+class TestCalculateDateRange(unittest.TestCase):
+    """Tests for calculate_date_range and the --since and --until types."""
+
+    def setUp(self):
+        """Fix the current time to a Thursday afternoon."""
+        patcher = patch('trackerian.get_current_datetime',
+                        return_value=datetime.datetime(2018, 3, 15, 14, 5,
+                                                       30, 250))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_day_starts_exactly_at_midnight(self):
+        self.assertEqual(trackerian.calculate_date_range('day'),
+                         (datetime.datetime(2018, 3, 15), None))
+
+    def test_calendar_periods(self):
+        for period, expected in (
+                ('month', (datetime.datetime(2018, 3, 1), None)),
+                ('year', (datetime.datetime(2018, 1, 1), None)),
+                ('last-week', (datetime.datetime(2018, 3, 5),
+                               datetime.datetime(2018, 3, 12)))):
+            with self.subTest(period=period):
+                self.assertEqual(trackerian.calculate_date_range(period),
+                                 expected)
+
+    def test_since_and_until_replace_period_bounds(self):
+        since = datetime.datetime(2018, 3, 6)
+        until = datetime.datetime(2018, 3, 8)
+        self.assertEqual(
+            trackerian.calculate_date_range('last-week', since, until),
+            (since, until)
+        )
+        self.assertEqual(trackerian.calculate_date_range('all', since),
+                         (since, None))
+
+    def test_until_date_includes_whole_day(self):
+        args = trackerian.parse_arguments(['-s', 'all', '--since',
+                                           '2018-03-01', '--until',
+                                           '2018-03-02'])
+        self.assertEqual(args['since'], datetime.datetime(2018, 3, 1))
+        self.assertEqual(args['until'], datetime.datetime(2018, 3, 3))
+
+    def test_until_time_is_exact(self):
+        args = trackerian.parse_arguments(['-l', '--until',
+                                           '2018-03-02T09:30'])
+        self.assertEqual(args['until'], datetime.datetime(2018, 3, 2, 9, 30))
+
+
 class TestPrintList(unittest.TestCase):
     """Tests for print_list function."""
 
@@ -423,6 +537,293 @@ class TestPrintList(unittest.TestCase):
         self.assertIn('2', mocked_stdout.getvalue())
 
 
+class TestRenderList(unittest.TestCase):
+    """Tests for paging and ordering in print_list and render_list."""
+
+    def setUp(self):
+        """Create five finished activities an hour apart."""
+        start = datetime.datetime(2018, 5, 1, 9, 0, 0)
+        for num in range(5):
+            trackerian.Activity('Row{}'.format(num),
+                                start + datetime.timedelta(hours=num))
+            activity = trackerian.Activity.instances[-1]
+            activity.end = activity.start + datetime.timedelta(minutes=30)
+
+    def tearDown(self):
+        """Restore trackerian's Activity instances to an empty list."""
+        trackerian.Activity.instances = []
+
+    def listed(self, *args, **kwargs):
+        """Return the activity numbers printed by print_list."""
+        with patch('sys.stdout', new_callable=io.StringIO) as mocked_stdout:
+            trackerian.print_list(*args, **kwargs)
+        return [int(line.split()[0]) for line in
+                mocked_stdout.getvalue().splitlines() if line]
+
+    def test_output_matches_activity_str(self):
+        with patch('sys.stdout', new_callable=io.StringIO) as mocked_stdout:
+            trackerian.print_list(None)
+        expected = ''.join('{:<5} {}\n\n'.format(num, activity) for
+                           num, activity in
+                           enumerate(trackerian.Activity.instances))
+        self.assertEqual(mocked_stdout.getvalue(), expected)
+
+    def test_limit_and_offset(self):
+        self.assertEqual(self.listed(None, limit=2, offset=1), [1, 2])
+
+    def test_newest_first(self):
+        self.assertEqual(self.listed(None, newest_first=True),
+                         [4, 3, 2, 1, 0])
+        self.assertEqual(self.listed(None, limit=2, newest_first=True),
+                         [4, 3])
+
+    def test_newest_first_with_indexed_activities(self):
+        trackerian.Activity.instances = trackerian.IndexedActivities(
+            trackerian.Activity.instances
+        )
+        range_start = datetime.datetime(2018, 5, 1, 10, 0, 0)
+        self.assertEqual(self.listed(range_start, newest_first=True),
+                         [4, 3, 2, 1])
+
+    @patch('trackerian.LIST_CHUNK_ROWS', 2)
+    def test_output_written_in_chunks(self):
+        chunks = list(trackerian.render_list(None))
+        self.assertEqual(len(chunks), 3)
+
+    def test_rows_past_limit_not_formatted(self):
+        with patch('trackerian.Activity.describe', autospec=True,
+                   return_value='row') as mocked_describe:
+            list(trackerian.render_list(None, limit=2))
+        self.assertEqual(mocked_describe.call_count, 2)
+
+    @patch('trackerian.open_pager')
+    def test_pager_receives_list(self, mocked_open_pager):
+        pager_input = io.StringIO()
+        pager_input.close = lambda: None
+        mocked_open_pager.return_value.stdin = pager_input
+        with patch('sys.stdout', new_callable=io.StringIO) as mocked_stdout:
+            trackerian.print_list(None, pager=True)
+        self.assertEqual(mocked_stdout.getvalue(), '')
+        self.assertIn('Row4', pager_input.getvalue())
+        mocked_open_pager.return_value.wait.assert_called_once_with()
+
+    def test_negative_limit_rejected(self):
+        self.assertRaises(ValueError, trackerian.non_negative_int, '-1')
+
+
+class TestImportActivities(unittest.TestCase):
+    """Tests for importing activities from CSV and JSONL files."""
+
+    def setUp(self):
+        """Load an empty Journal in a temporary directory."""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.data_file = os.path.join(self.temp_dir.name, 'data.pickle')
+        self.journal_file = os.path.join(self.temp_dir.name, 'data.journal')
+        self.journal = trackerian.Journal(self.data_file, self.journal_file)
+        self.journal.load()
+
+    def tearDown(self):
+        """Remove temporary files and restore Activity class attributes."""
+        self.temp_dir.cleanup()
+        trackerian.Activity.instances = []
+        trackerian.Activity.events = []
+
+    def write(self, file_name, text):
+        """Write text to file_name in the temporary directory."""
+        path = os.path.join(self.temp_dir.name, file_name)
+        with open(path, 'w') as import_file:
+            import_file.write(text)
+        return path
+
+    @patch('sys.stdout', new_callable=io.StringIO)
+    def run_import(self, path, mocked_stdout, batch_size=None):
+        """Import path into the journal and return what was printed."""
+        trackerian.import_activities(path, self.journal, batch_size)
+        return mocked_stdout.getvalue()
+
+    def reload(self):
+        """Return activities as a fresh invocation would load them."""
+        trackerian.Journal(self.data_file, self.journal_file).load()
+        return trackerian.Activity.instances
+
+    def test_imports_csv(self):
+        path = self.write('history.csv', (
+            'name,start,end,tags\n'
+            'Code,2018-01-02T09:00:00,2018-01-02T10:30:00,work deep\n'
+            'Lunch,2018-01-02 12:00,2018-01-02 12:45,\n'
+        ))
+        output = self.run_import(path)
+        self.assertIn('Imported 2 activities', output)
+        activities = self.reload()
+        self.assertEqual(len(activities), 2)
+        self.assertEqual(activities[0].tags, ['work', 'deep'])
+        self.assertEqual(activities[1].duration,
+                         datetime.timedelta(minutes=45))
+
+    def test_imports_jsonl(self):
+        path = self.write('history.jsonl', (
+            '{"name": "Read", "start": "2018-01-03T20:00:00", '
+            '"end": "2018-01-03T21:00:00", "tags": ["Home"]}\n'
+            '\n'
+            '{"name": "Write", "start": "2018-01-04T08:00:00", '
+            '"end": "2018-01-04T08:30:00"}\n'
+        ))
+        self.run_import(path)
+        activities = self.reload()
+        self.assertEqual([activity.name for activity in activities],
+                         ['Read', 'Write'])
+        self.assertEqual(activities[0].tags, ['Home'])
+
+    def test_invalid_records_skipped_and_reported(self):
+        path = self.write('history.jsonl', (
+            '{"name": "Good", "start": "2018-01-03T20:00:00", '
+            '"end": "2018-01-03T21:00:00"}\n'
+            'not json\n'
+            '{"name": "", "start": "2018-01-03T20:00:00", '
+            '"end": "2018-01-03T21:00:00"}\n'
+            '{"name": "Late", "start": "2018-01-03T20:00:00", '
+            '"end": "2018-01-03T19:00:00"}\n'
+            '{"name": "Tags", "start": "2018-01-03T20:00:00", '
+            '"end": "2018-01-03T21:00:00", "tags": 5}\n'
+            '{"name": "Time", "start": "yesterday", '
+            '"end": "2018-01-03T21:00:00"}\n'
+        ))
+        output = self.run_import(path)
+        self.assertIn('Skipped line 3: missing name', output)
+        self.assertIn('Skipped line 4: end is not after start', output)
+        self.assertIn('Skipped 5 invalid records', output)
+        self.assertEqual(len(self.reload()), 1)
+
+    def test_zero_length_record_skipped(self):
+        path = self.write('history.jsonl', (
+            '{"name": "Blip", "start": "2018-01-03T20:00:00", '
+            '"end": "2018-01-03T20:00:00"}\n'
+        ))
+        output = self.run_import(path)
+        self.assertIn('Skipped line 1: end is not after start', output)
+        self.assertEqual(len(self.reload()), 0)
+
+    def test_commits_once_per_batch(self):
+        lines = ''.join(
+            '{{"name": "N{0}", "start": "2018-02-01T{0:02}:00:00", '
+            '"end": "2018-02-01T{0:02}:30:00"}}\n'.format(hour)
+            for hour in range(5)
+        )
+        path = self.write('history.jsonl', lines)
+        with patch.object(self.journal, 'append',
+                          wraps=self.journal.append) as mocked_append:
+            self.run_import(path, batch_size=2)
+        self.assertEqual(mocked_append.call_count, 3)
+        self.assertEqual(len(self.reload()), 5)
+
+    @patch('trackerian.CHECKPOINT_INTERVAL', 4)
+    def test_final_batch_checkpoints_full_journal(self):
+        lines = ''.join(
+            '{{"name": "N{0}", "start": "2018-02-01T{0:02}:00:00", '
+            '"end": "2018-02-01T{0:02}:30:00"}}\n'.format(hour)
+            for hour in range(4)
+        )
+        path = self.write('history.jsonl', lines)
+        self.run_import(path, batch_size=2)
+        self.assertEqual(self.journal.length, 0)
+        self.assertEqual(len(self.reload()), 4)
+
+    def test_timezone_converted_to_local_time(self):
+        start = datetime.datetime(2018, 6, 1, 12, 0,
+                                  tzinfo=datetime.timezone.utc)
+        path = self.write('history.jsonl', (
+            '{{"name": "Call", "start": "{}", "end": "{}"}}\n'.format(
+                start.isoformat(),
+                (start + datetime.timedelta(hours=1)).isoformat()
+            )
+        ))
+        self.run_import(path)
+        self.assertEqual(self.reload()[0].start,
+                         start.astimezone().replace(tzinfo=None))
+
+    def test_refuses_while_tracking(self):
+        trackerian.Activity('Running')
+        path = self.write('history.csv', 'name,start,end,tags\n')
+        output = self.run_import(path)
+        self.assertIn('Finish tracking Running before importing', output)
+
+    def test_unknown_extension_rejected(self):
+        path = self.write('history.txt', '')
+        self.assertIn('must be .csv or .jsonl', self.run_import(path))
+
+
+class TestExportActivities(unittest.TestCase):
+    """Tests for exporting activities as CSV and JSONL."""
+
+    @patch('trackerian.get_current_datetime')
+    def setUp(self, mocked_time):
+        """Create a finished activity and a running one."""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.now = datetime.datetime(2018, 7, 2, 12, 0, 0)
+        trackerian.Activity('Old', datetime.datetime(2018, 6, 1, 9, 0, 0))
+        trackerian.Activity.instances[0].end = datetime.datetime(
+            2018, 6, 1, 10, 30, 0
+        )
+        trackerian.Activity.instances[0].tags = ['Billable', 'Client']
+        trackerian.Activity('Running', datetime.datetime(2018, 7, 2, 11, 0))
+
+    def tearDown(self):
+        """Remove temporary files and restore Activity instances."""
+        self.temp_dir.cleanup()
+        trackerian.Activity.instances = []
+
+    def export(self, *args):
+        """Return what export_activities writes to standard output."""
+        with patch('trackerian.get_current_datetime', return_value=self.now):
+            with patch('sys.stdout', new_callable=io.StringIO) as stdout:
+                trackerian.export_activities(*args)
+        return stdout.getvalue()
+
+    def test_csv_rows(self):
+        lines = self.export(None, 'csv').splitlines()
+        self.assertEqual(lines[0], 'index,id,name,tags,start,end,duration')
+        self.assertEqual(lines[1], '0,,Old,Billable Client,'
+                                   '2018-06-01T09:00:00,2018-06-01T10:30:00,'
+                                   '5400.0')
+        self.assertEqual(lines[2], '1,,Running,,2018-07-02T11:00:00,,3600.0')
+
+    def test_jsonl_records(self):
+        records = [json.loads(line) for line in
+                   self.export(None, 'jsonl').splitlines()]
+        self.assertEqual(records[0]['tags'], ['Billable', 'Client'])
+        self.assertIsNone(records[1]['end'])
+        self.assertEqual(records[1]['duration'], 3600.0)
+
+    def test_range_start_honoured(self):
+        range_start = datetime.datetime(2018, 7, 1)
+        lines = self.export(range_start, 'csv').splitlines()
+        self.assertEqual(len(lines), 2)
+        self.assertTrue(lines[1].startswith('1,,Running'))
+
+    def test_writes_to_output_file(self):
+        path = os.path.join(self.temp_dir.name, 'export.jsonl')
+        self.assertEqual(self.export(None, 'jsonl', path), '')
+        with open(path) as export_file:
+            self.assertEqual(len(export_file.readlines()), 2)
+
+    def test_main_export_has_no_padding(self):
+        args = edit_args_dict('export', 'all')
+        with patch('trackerian.get_current_datetime', return_value=self.now):
+            with patch('sys.stdout', new_callable=io.StringIO) as stdout:
+                trackerian.main(args)
+        self.assertTrue(stdout.getvalue().startswith('index,'))
+
+    @patch('sys.stdout', new_callable=io.StringIO)
+    def test_finished_rows_can_be_imported(self, mocked_stdout):
+        path = os.path.join(self.temp_dir.name, 'export.csv')
+        self.export(None, 'csv', path)
+        trackerian.Activity.instances[-1].end = self.now
+        trackerian.import_activities(path)
+        self.assertIn('Imported 1 activities', mocked_stdout.getvalue())
+        self.assertEqual(trackerian.Activity.instances[-1].tags,
+                         ['Billable', 'Client'])
+
+
 class TestPrintSummaryName(unittest.TestCase):
     """Tests for print_summary function relating to Activity names."""
 
@@ -591,6 +992,26 @@ class TestEditActivity(unittest.TestCase):
         trackerian.edit_activity(trackerian.Activity.instances[0], 'no', 'cat')
         self.assertIn('Information', mocked_stdout.getvalue())
 
+    @patch('sys.stdout', new_callable=io.StringIO)
+    def test_rejected_time_edit_leaves_each_store_unchanged(self,
+                                                            mocked_stdout):
+        self.addCleanup(setattr, trackerian.Activity, 'events', [])
+        for name in sorted(trackerian.STORES):
+            with self.subTest(store=name), \
+                    tempfile.TemporaryDirectory() as temp_dir:
+                journal = trackerian.open_store(name, directory=temp_dir)
+                trackerian.main(edit_args_dict('begin', ['Work']), journal)
+                journal.commit()
+                for value in ('bad', '25:00:00'):
+                    args = edit_args_dict('edit', ['0', 'end', value])
+                    trackerian.main(args, journal)
+                    self.assertEqual(trackerian.Activity.events, [])
+                    journal.commit()
+                journal = trackerian.open_store(name, directory=temp_dir)
+                self.assertIsNone(trackerian.Activity.instances[0].end)
+                if name == 'sqlite':
+                    journal.connection.close()
+
 
 class TestEndActivityActivityClassMethod(unittest.TestCase):
     """Tests for end_activity method of Activity class."""
@@ -755,6 +1176,1964 @@ class TestPercentageOfTimedelta(unittest.TestCase):
         )
 
 
+class TestActivitySlots(unittest.TestCase):
+    """Tests for the slotted Activity representation."""
+
+    def setUp(self):
+        """Create one finished activity."""
+        start = datetime.datetime(2018, 3, 4, 9, 0, 0)
+        self.activity = trackerian.Activity('Code', start)
+        self.activity.end = start + datetime.timedelta(minutes=45)
+
+    def tearDown(self):
+        """Restore trackerian's Activity instances to an empty list."""
+        trackerian.Activity.instances = []
+
+    def test_activity_has_no_instance_dict(self):
+        self.assertFalse(hasattr(self.activity, '__dict__'))
+
+    def test_display_values_derived_from_start_and_end(self):
+        self.assertEqual(self.activity.start_str, '09:00:00')
+        self.assertEqual(self.activity.end_str, '09:45:00')
+        self.assertEqual(self.activity.duration,
+                         datetime.timedelta(minutes=45))
+
+    def test_setting_duration_moves_end(self):
+        self.activity.duration = datetime.timedelta(hours=2)
+        self.assertEqual(self.activity.end_str, '11:00:00')
+        self.activity.duration = None
+        self.assertIsNone(self.activity.end)
+
+    def test_pickle_round_trip(self):
+        copy = pickle.loads(pickle.dumps(self.activity))
+        self.assertEqual(
+            (copy.name, copy.tags, copy.start, copy.end),
+            (self.activity.name, self.activity.tags,
+             self.activity.start, self.activity.end)
+        )
+
+    def test_restores_pre_slots_instance_dict(self):
+        activity = trackerian.Activity.__new__(trackerian.Activity)
+        activity.__setstate__({
+            'name': 'Old', 'tags': ['Legacy'], 'start': self.activity.start,
+            'start_str': '09:00:00', 'end': None, 'end_str': None,
+            'duration': None
+        })
+        self.assertEqual(activity.name, 'Old')
+        self.assertEqual(activity.tags, ['Legacy'])
+        self.assertIsNone(activity.duration)
+
+
+class TestVocabulary(unittest.TestCase):
+    """Tests for interning names and tags with the Vocabulary class."""
+
+    def setUp(self):
+        """Create an empty vocabulary."""
+        self.vocabulary = trackerian.Vocabulary()
+
+    def tearDown(self):
+        """Restore trackerian's Activity instances to an empty list."""
+        trackerian.Activity.instances = []
+
+    def test_same_string_gets_same_id(self):
+        first = self.vocabulary.id('Code')
+        self.assertEqual(self.vocabulary.id('Code'), first)
+        self.assertEqual(len(self.vocabulary), 1)
+
+    def test_intern_returns_canonical_copy(self):
+        canonical = self.vocabulary.intern('Reading Papers')
+        copy = ' '.join(['Reading', 'Papers'])
+        self.assertIs(self.vocabulary.intern(copy), canonical)
+
+    def test_spellings_share_title_key(self):
+        key = self.vocabulary.key('code')
+        self.assertEqual(self.vocabulary.key('CODE'), key)
+        self.assertEqual(self.vocabulary.strings[key], 'Code')
+
+    def test_decode_uses_title(self):
+        totals = {self.vocabulary.key('work'): 3}
+        self.assertEqual(self.vocabulary.decode(totals), {'Work': 3})
+
+    def test_activity_names_are_interned(self):
+        trackerian.Activity(' '.join(['Deep', 'Work']))
+        trackerian.Activity(' '.join(['Deep', 'Work']))
+        first, second = trackerian.Activity.instances
+        self.assertIs(first.name, second.name)
+
+    def test_repeated_name_pickled_once(self):
+        for _ in range(3):
+            trackerian.Activity(' '.join(['Deep', 'Work']))
+        data = pickle.dumps(trackerian.Activity.instances)
+        self.assertEqual(data.count(b'Deep Work'), 1)
+
+
+class TestJournal(unittest.TestCase):
+    """Tests for the Journal class."""
+
+    def setUp(self):
+        """Point a Journal at files in a temporary directory."""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.data_file = os.path.join(self.temp_dir.name, 'data.pickle')
+        self.journal_file = os.path.join(self.temp_dir.name, 'data.journal')
+        self.journal = self.new_journal()
+
+    def tearDown(self):
+        """Remove temporary files and restore Activity class attributes."""
+        self.temp_dir.cleanup()
+        trackerian.Activity.instances = []
+        trackerian.Activity.events = []
+
+    def new_journal(self):
+        """Return a loaded Journal as a fresh invocation would see it."""
+        journal = trackerian.Journal(self.data_file, self.journal_file)
+        journal.load()
+        return journal
+
+    @patch('sys.stdout', new_callable=io.StringIO)
+    @patch('trackerian.parse_arguments')
+    def run_main(self, args, mocked_args, mocked_stdout):
+        """Run main() with args then commit and reload the journal."""
+        mocked_args.return_value = args
+        trackerian.main()
+        self.journal.commit()
+        self.journal = self.new_journal()
+
+    def test_load_creates_missing_snapshot(self):
+        self.assertTrue(os.path.exists(self.data_file))
+        self.assertEqual(trackerian.Activity.instances, [])
+
+    def test_begin_and_tag_replayed(self):
+        self.run_main(edit_args_dict('begin', ['Replayed']))
+        self.run_main(edit_args_dict('tag', ['Journal']))
+        self.assertEqual(trackerian.Activity.instances[0].name, 'Replayed')
+        self.assertEqual(trackerian.Activity.instances[0].tags, ['Journal'])
+
+    def test_finish_replayed(self):
+        self.run_main(edit_args_dict('begin', ['Finished']))
+        self.run_main(edit_args_dict('finish', True))
+        self.assertTrue(trackerian.Activity.instances[0].end)
+        self.assertTrue(trackerian.Activity.instances[0].duration is not None)
+
+    def test_edit_and_remove_replayed(self):
+        self.run_main(edit_args_dict('begin', ['First']))
+        self.run_main(edit_args_dict('begin', ['Second']))
+        self.run_main(edit_args_dict('edit', ['1', 'name', 'renamed']))
+        self.run_main(edit_args_dict('remove', 0))
+        self.assertEqual(len(trackerian.Activity.instances), 1)
+        self.assertEqual(trackerian.Activity.instances[0].name, 'Renamed')
+
+    def test_commit_appends_without_rewriting_snapshot(self):
+        snapshot_time = os.path.getmtime(self.data_file)
+        snapshot_size = os.path.getsize(self.data_file)
+        self.run_main(edit_args_dict('begin', ['Appended']))
+        self.assertEqual(os.path.getsize(self.data_file), snapshot_size)
+        self.assertEqual(os.path.getmtime(self.data_file), snapshot_time)
+        self.assertEqual(self.journal.length, 1)
+
+    @patch('trackerian.CHECKPOINT_INTERVAL', 3)
+    def test_checkpoint_folds_journal_into_snapshot(self):
+        for name in ('One', 'Two'):
+            self.run_main(edit_args_dict('begin', [name]))
+        self.assertEqual(self.journal.length, 0)
+        self.assertEqual(len(trackerian.Activity.instances), 2)
+
+    def test_journal_for_older_snapshot_ignored(self):
+        self.run_main(edit_args_dict('begin', ['Folded']))
+        stale_journal = open(self.journal_file, 'rb').read()
+        self.journal.checkpoint()
+        with open(self.journal_file, 'wb') as journal_file:
+            journal_file.write(stale_journal)
+        self.journal = self.new_journal()
+        self.assertEqual(len(trackerian.Activity.instances), 1)
+
+    def test_torn_final_record_truncated(self):
+        self.run_main(edit_args_dict('begin', ['Kept']))
+        intact_size = os.path.getsize(self.journal_file)
+        with open(self.journal_file, 'ab') as journal_file:
+            journal_file.write(pickle.dumps(('tag', 0, ['Torn']))[:-4])
+        self.journal = self.new_journal()
+        self.assertEqual(trackerian.Activity.instances[0].tags, [])
+        self.assertEqual(os.path.getsize(self.journal_file), intact_size)
+
+
+class TestJournalTail(unittest.TestCase):
+    """Tests for loading and committing only the head of a Journal."""
+
+    def setUp(self):
+        """Journal one finished and one running activity."""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.data_file = os.path.join(self.temp_dir.name, 'data.pickle')
+        self.journal_file = os.path.join(self.temp_dir.name, 'data.journal')
+        self.run_main(edit_args_dict('begin', ['First']), tail=False)
+        self.run_main(edit_args_dict('begin', ['Second']), tail=False)
+
+    def tearDown(self):
+        """Remove temporary files and restore Activity class attributes."""
+        self.temp_dir.cleanup()
+        trackerian.Activity.instances = []
+        trackerian.Activity.events = []
+
+    @patch('sys.stdout', new_callable=io.StringIO)
+    def run_main(self, args, mocked_stdout, tail=True):
+        """Run main() with args as a fresh invocation would then commit."""
+        self.journal = trackerian.Journal(self.data_file, self.journal_file)
+        if not (tail and self.journal.load_tail()):
+            self.journal.load()
+        trackerian.main(args)
+        self.journal.commit()
+        return mocked_stdout.getvalue()
+
+    def full_load(self):
+        """Load the whole history as a fresh invocation would."""
+        trackerian.Journal(self.data_file, self.journal_file).load()
+        return trackerian.Activity.instances
+
+    def test_load_tail_reads_only_latest_activity(self):
+        journal = trackerian.Journal(self.data_file, self.journal_file)
+        self.assertTrue(journal.load_tail())
+        self.assertIsInstance(trackerian.Activity.instances,
+                              trackerian.TailActivities)
+        self.assertEqual(len(trackerian.Activity.instances), 2)
+        self.assertEqual(trackerian.Activity.instances[-1].name, 'Second')
+        with self.assertRaises(IndexError):
+            trackerian.Activity.instances[0]
+
+    def test_current_uses_head(self):
+        output = self.run_main(edit_args_dict('current', True))
+        self.assertTrue(self.journal.tail)
+        self.assertIn('Second', output)
+
+    def test_tail_changes_replayed_by_full_load(self):
+        self.run_main(edit_args_dict('tag', ['Tail']))
+        self.run_main(edit_args_dict('finish', True))
+        self.assertTrue(self.journal.tail)
+        activities = self.full_load()
+        self.assertEqual(activities[1].tags, ['Tail'])
+        self.assertTrue(activities[1].end)
+        self.assertEqual(activities[0].tags, [])
+
+    def test_successive_tail_commands_share_head(self):
+        self.run_main(edit_args_dict('tag', ['One']))
+        self.run_main(edit_args_dict('tag', ['Two']))
+        self.assertTrue(self.journal.tail)
+        self.assertEqual(self.full_load()[-1].tags, ['One', 'Two'])
+
+    def test_head_stale_after_journal_changes(self):
+        with open(self.journal_file, 'ab') as journal_file:
+            journal_file.write(pickle.dumps(('tag', 1, ['Elsewhere'])))
+        journal = trackerian.Journal(self.data_file, self.journal_file)
+        self.assertFalse(journal.load_tail())
+
+    def test_interrupted_checkpoint_leaves_no_head(self):
+        journal = trackerian.Journal(self.data_file, self.journal_file)
+        journal.load()
+        with patch('trackerian.Journal.write_snapshot',
+                   side_effect=OSError):
+            with self.assertRaises(OSError):
+                journal.checkpoint()
+        self.assertFalse(journal.load_tail())
+
+    @patch('trackerian.CHECKPOINT_INTERVAL', 3)
+    def test_full_journal_checkpointed_from_tail(self):
+        self.run_main(edit_args_dict('tag', ['Folded']))
+        self.assertEqual(self.journal.length, 0)
+        self.assertEqual(self.full_load()[-1].tags, ['Folded'])
+        self.assertEqual(len(trackerian.Activity.instances), 2)
+
+    def test_tail_only_arguments(self):
+        self.assertTrue(trackerian.tail_only(edit_args_dict('finish', True)))
+        self.assertTrue(trackerian.tail_only(edit_args_dict('tag', ['T'])))
+        self.assertFalse(trackerian.tail_only(edit_args_dict('list', 'day')))
+        args = edit_args_dict('begin', ['New'])
+        args['tag'] = ['T']
+        self.assertFalse(trackerian.tail_only(args))
+
+
+class TestColumnStore(unittest.TestCase):
+    """Tests for ColumnFile, ColumnActivities and ColumnJournal."""
+
+    def setUp(self):
+        """Write four known activities to a column snapshot and reload it."""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.data_file = os.path.join(self.temp_dir.name, 'data.columns')
+        self.journal_file = os.path.join(self.temp_dir.name, 'data.journal')
+
+        self.expected = track_activities(FOUR_ACTIVITIES)
+
+        self.journal = trackerian.ColumnJournal(self.data_file,
+                                                self.journal_file)
+        self.journal.checkpoint()
+        self.journal.load()
+
+    def tearDown(self):
+        """Remove temporary files and restore Activity class attributes."""
+        trackerian.Activity.instances = []
+        trackerian.Activity.events = []
+        self.temp_dir.cleanup()
+
+    def test_load_gives_column_backed_instances(self):
+        self.assertIsInstance(trackerian.Activity.instances,
+                              trackerian.ColumnActivities)
+
+    def test_rows_round_trip(self):
+        for loaded, expected in zip(trackerian.Activity.instances,
+                                    self.expected):
+            self.assertEqual(loaded.name, expected.name)
+            self.assertEqual(loaded.tags, expected.tags)
+            self.assertEqual(loaded.start, expected.start)
+            self.assertEqual(loaded.end, expected.end)
+
+    def test_indexing_only_loads_requested_row(self):
+        trackerian.Activity.instances[-1]
+        self.assertEqual(list(trackerian.Activity.instances.loaded), [3])
+
+    @patch('trackerian.get_current_datetime')
+    def test_summary_matches_list_summary(self, mocked_time):
+        mocked_time.return_value = datetime.datetime(2018, 12, 10, 16, 30)
+        range_start = datetime.datetime(2018, 12, 10, 10, 0)
+        column_summary = trackerian.summarise_activities(range_start)
+        trackerian.Activity.instances = self.expected
+        self.assertEqual(column_summary,
+                         trackerian.summarise_activities(range_start))
+
+    def test_select_skips_earlier_rows_but_keeps_numbering(self):
+        range_start = datetime.datetime(2018, 12, 10, 12, 0)
+        selected = trackerian.select_activities(range_start)
+        self.assertEqual([(num, activity.name)
+                          for num, activity in selected],
+                         [(2, 'Lunch'), (3, 'Read')])
+
+    def test_select_does_not_load_rows(self):
+        self.assertEqual(len(list(trackerian.select_activities(None))), 4)
+        self.assertEqual(trackerian.Activity.instances.loaded, {})
+
+    def test_remove_renumbers_following_rows(self):
+        del trackerian.Activity.instances[1]
+        self.assertEqual(len(trackerian.Activity.instances), 3)
+        self.assertEqual(trackerian.Activity.instances[1].name, 'Lunch')
+        lunch = trackerian.Activity.instances[1]
+        self.assertEqual(trackerian.Activity.instances.index(lunch), 1)
+
+    def test_journal_replayed_onto_columns(self):
+        trackerian.record_event('remove', 0)
+        trackerian.Activity('Appended')
+        trackerian.record_event('begin', trackerian.Activity.instances[-1],
+                                ('Appended',
+                                 trackerian.Activity.instances[-1].start))
+        self.journal.commit()
+        self.journal.load()
+        names = [activity.name for activity in trackerian.Activity.instances]
+        self.assertEqual(names, ['code', 'Lunch', 'Read', 'Appended'])
+
+    def test_checkpoint_writes_columns_atomically(self):
+        with patch('trackerian.write_atomically',
+                   wraps=trackerian.write_atomically) as mocked_write:
+            self.journal.checkpoint()
+        self.assertIn(self.data_file, [call[0][0] for call
+                                       in mocked_write.call_args_list])
+        self.assertFalse([file_name for file_name
+                          in os.listdir(self.temp_dir.name)
+                          if file_name.endswith('.tmp')])
+
+    def test_checkpoint_keeps_unloaded_rows(self):
+        trackerian.Activity.instances[0].tags.append('Edited')
+        self.journal.checkpoint()
+        self.journal.load()
+        self.assertEqual(trackerian.Activity.instances[0].tags,
+                         ['Work', 'Edited'])
+        self.assertEqual(trackerian.Activity.instances[3].name, 'Read')
+
+
+class TestSQLiteStore(unittest.TestCase):
+    """Tests for SQLiteStore and SQLiteActivities."""
+
+    def setUp(self):
+        """Write four known activities to a database and load it."""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.store = trackerian.SQLiteStore(
+            os.path.join(self.temp_dir.name, 'data.sqlite')
+        )
+
+        self.expected = track_activities(FOUR_ACTIVITIES)
+
+        self.store.checkpoint()
+        self.store.load()
+
+    def tearDown(self):
+        """Close the database and restore Activity class attributes."""
+        self.store.connection.close()
+        trackerian.Activity.instances = []
+        trackerian.Activity.events = []
+        self.temp_dir.cleanup()
+
+    @patch('sys.stdout', new_callable=io.StringIO)
+    @patch('trackerian.parse_arguments')
+    def run_main(self, args, mocked_args, mocked_stdout):
+        """Run main() with args then commit to the database."""
+        mocked_args.return_value = args
+        trackerian.main()
+        self.store.commit()
+
+    def test_end_edited_to_none_stored_as_null(self):
+        self.store.apply(('edit', 0, ('end', None)))
+        self.store.connection.commit()
+        self.store.load()
+        self.assertIsNone(trackerian.Activity.instances[0].end)
+
+    def test_rows_round_trip(self):
+        for loaded, expected in zip(trackerian.Activity.instances,
+                                    self.expected):
+            self.assertEqual(loaded.name, expected.name)
+            self.assertEqual(loaded.tags, expected.tags)
+            self.assertEqual(loaded.start, expected.start)
+            self.assertEqual(loaded.end, expected.end)
+
+    @patch('trackerian.get_current_datetime')
+    def test_summary_matches_list_summary(self, mocked_time):
+        mocked_time.return_value = datetime.datetime(2018, 12, 10, 16, 30)
+        for range_start in (None, datetime.datetime(2018, 12, 10, 10, 0)):
+            sqlite_summary = trackerian.summarise_activities(range_start)
+            self.assertEqual(
+                sqlite_summary,
+                trackerian.sum_durations(self.expected, range_start)
+            )
+
+    def test_select_uses_start_index_and_keeps_numbering(self):
+        range_start = datetime.datetime(2018, 12, 10, 12, 0)
+        selected = trackerian.select_activities(range_start)
+        self.assertEqual([(num, activity.name)
+                          for num, activity in selected],
+                         [(2, 'Lunch'), (3, 'Read')])
+        plan = self.store.connection.execute(
+            "EXPLAIN QUERY PLAN SELECT MIN(id) FROM activities "
+            "INDEXED BY activities_start WHERE start_time >= 0"
+        ).fetchall()
+        self.assertIn('activities_start', str(plan))
+
+    def test_main_changes_written_as_rows(self):
+        self.run_main(edit_args_dict('tag', ['Evening']))
+        self.run_main(edit_args_dict('finish', True))
+        self.run_main(edit_args_dict('edit', ['0', 'name', 'renamed']))
+        self.run_main(edit_args_dict('remove', 1))
+        self.run_main(edit_args_dict('begin', ['Later']))
+        names = [activity.name for activity in trackerian.Activity.instances]
+        self.assertEqual(names, ['Renamed', 'Lunch', 'Read', 'Later'])
+        self.assertEqual(trackerian.Activity.instances[2].tags,
+                         ['Home', 'Evening'])
+        self.assertTrue(trackerian.Activity.instances[2].end)
+
+
+class TestSegmentStore(unittest.TestCase):
+    """Tests for SegmentStore and SegmentActivities."""
+
+    def setUp(self):
+        """Write activities spread over three months to segments."""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.store = trackerian.SegmentStore(
+            os.path.join(self.temp_dir.name, 'data.segments')
+        )
+
+        self.expected = track_activities(
+            (datetime.datetime(2018, month, 10, 9), 1, name, tags)
+            for month, name, tags in ((10, 'Code', ['Work']),
+                                      (10, 'Read', []),
+                                      (11, 'code', ['work']),
+                                      (12, 'Lunch', []))
+        )
+
+        self.store.checkpoint()
+        self.store.load()
+
+    def tearDown(self):
+        """Remove temporary files and restore Activity class attributes."""
+        trackerian.Activity.instances = []
+        trackerian.Activity.events = []
+        self.temp_dir.cleanup()
+
+    @patch('sys.stdout', new_callable=io.StringIO)
+    @patch('trackerian.parse_arguments')
+    def run_main(self, args, mocked_args, mocked_stdout):
+        """Run main() with args then commit the changed segments."""
+        mocked_args.return_value = args
+        trackerian.main()
+        self.store.commit()
+
+    def test_one_segment_per_month(self):
+        self.assertEqual([segment['month'] for segment in self.store.manifest],
+                         ['2018-10', '2018-11', '2018-12'])
+
+    def test_select_reads_only_segments_in_range(self):
+        range_start = datetime.datetime(2018, 12, 1)
+        selected = list(trackerian.select_activities(range_start))
+        self.assertEqual([(num, activity.name)
+                          for num, activity in selected], [(3, 'Lunch')])
+        self.assertEqual(list(self.store.cache), [2])
+
+    def test_summary_matches_list_summary(self):
+        for range_start in (None, datetime.datetime(2018, 11, 1)):
+            self.assertEqual(
+                trackerian.summarise_activities(range_start),
+                trackerian.sum_durations(self.expected, range_start)
+            )
+
+    def test_tag_rewrites_only_last_segment(self):
+        untouched = [segment['file'] for segment in self.store.manifest[:2]]
+        mtimes = [os.path.getmtime(self.store.path(file_name))
+                  for file_name in untouched]
+        self.run_main(edit_args_dict('tag', ['Late']))
+        self.assertEqual([os.path.getmtime(self.store.path(file_name))
+                          for file_name in untouched], mtimes)
+        self.assertEqual(trackerian.Activity.instances[3].tags, ['Late'])
+
+    def test_commit_reads_only_touched_segments(self):
+        with patch.object(self.store, 'read_segment',
+                          wraps=self.store.read_segment) as mocked_read:
+            self.run_main(edit_args_dict('tag', ['Late']))
+        self.assertEqual({call[0][0] for call in mocked_read.call_args_list},
+                         {2})
+
+    def test_changed_segment_written_to_new_file(self):
+        old_file = self.store.manifest[2]['file']
+        self.run_main(edit_args_dict('tag', ['Late']))
+        self.assertNotEqual(self.store.manifest[2]['file'], old_file)
+        self.assertFalse(os.path.exists(self.store.path(old_file)))
+        self.assertEqual(len(os.listdir(self.store.data_file)), 4)
+
+    def test_segments_and_manifest_written_atomically(self):
+        with patch('trackerian.write_atomically',
+                   wraps=trackerian.write_atomically) as mocked_write:
+            self.run_main(edit_args_dict('tag', ['Late']))
+        self.assertEqual([os.path.basename(call[0][0]) for call
+                          in mocked_write.call_args_list],
+                         [self.store.manifest[2]['file'], 'manifest.json'])
+
+    def test_remove_and_begin_update_manifest(self):
+        self.run_main(edit_args_dict('remove', 2))
+        self.run_main(edit_args_dict('begin', ['Now']))
+        names = [activity.name for activity in trackerian.Activity.instances]
+        self.assertEqual(names, ['Code', 'Read', 'Lunch', 'Now'])
+        self.assertEqual(len(self.store.manifest), 3)
+        self.assertEqual(len(os.listdir(self.store.data_file)), 4)
+
+
+class TestDateRangeQueries(unittest.TestCase):
+    """Tests that every store answers bounded date ranges alike."""
+
+    ranges = [
+        (datetime.datetime(2018, 12, 11), datetime.datetime(2018, 12, 12)),
+        (None, datetime.datetime(2018, 12, 11)),
+        (datetime.datetime(2018, 12, 10, 10),
+         datetime.datetime(2018, 12, 13, 9)),
+        (datetime.datetime(2018, 12, 13), None),
+        (datetime.datetime(2018, 12, 12), datetime.datetime(2018, 12, 11)),
+    ]
+
+    def setUp(self):
+        """Track activities at midnight, nine and two over four days."""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        patcher = patch('trackerian.get_current_datetime',
+                        return_value=datetime.datetime(2018, 12, 13, 16))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.expected = track_activities(
+            (datetime.datetime(2018, 12, day, hour), 1, name, tags)
+            for day in range(10, 14)
+            for hour, name, tags in ((0, 'Night', ['Late']),
+                                     (9, 'Code', ['Work']),
+                                     (14, 'Read', ['Home', 'Work']))
+        )
+        self.expected[-1].end = None
+
+    def tearDown(self):
+        """Remove temporary files and restore Activity class attributes."""
+        trackerian.Activity.instances = []
+        trackerian.Activity.events = []
+        self.temp_dir.cleanup()
+
+    def stores(self):
+        """Yield the name of each store after loading the activities."""
+        path = os.path.join(self.temp_dir.name, 'data')
+        for name, store in (
+                ('pickle', trackerian.Journal(path + '.pickle',
+                                              path + '.journal')),
+                ('columns', trackerian.ColumnJournal(path + '.columns',
+                                                     path + '.cjournal')),
+                ('sqlite', trackerian.SQLiteStore(path + '.sqlite')),
+                ('segments', trackerian.SegmentStore(path + '.segments'))):
+            trackerian.Activity.instances = list(self.expected)
+            store.checkpoint()
+            store.load()
+            yield name
+            if name == 'sqlite':
+                store.connection.close()
+
+    def test_range_start_is_inclusive(self):
+        midnight = datetime.datetime(2018, 12, 11)
+        total, names, _ = trackerian.sum_durations(
+            self.expected, midnight, midnight + datetime.timedelta(hours=1)
+        )
+        self.assertEqual(names, {'Night': datetime.timedelta(hours=1)})
+
+    def test_stores_select_same_activities(self):
+        for name in self.stores():
+            for start, end in self.ranges:
+                with self.subTest(store=name, start=start, end=end):
+                    selected = [(num, activity.start) for num, activity
+                                in trackerian.select_activities(
+                                    start, date_range_end=end
+                                )]
+                    self.assertEqual(selected, [
+                        (num, activity.start)
+                        for num, activity in enumerate(self.expected)
+                        if trackerian.in_date_range(activity.start, start,
+                                                    end)
+                    ])
+
+    def test_stores_summarise_same_totals(self):
+        for name in self.stores():
+            for start, end in self.ranges:
+                with self.subTest(store=name, start=start, end=end):
+                    self.assertEqual(
+                        trackerian.summarise_activities(start, end),
+                        trackerian.sum_durations(self.expected, start, end)
+                    )
+
+    def test_zero_length_activity_counted_as_finished(self):
+        self.expected[0].end = self.expected[0].start
+        for name in self.stores():
+            with self.subTest(store=name):
+                total = trackerian.summarise_activities(None)[0]
+                self.assertEqual(total, datetime.timedelta(hours=12))
+                self.assertEqual(
+                    trackerian.sum_durations(self.expected, None)[0], total
+                )
+                if trackerian.load_numpy():
+                    self.assertEqual(trackerian.numpy_summarise(
+                        trackerian.Activity.instances, None
+                    )[0], total)
+
+    @unittest.skipUnless(trackerian.can_fork(), "Needs forked processes")
+    def test_stores_summarise_same_totals_in_parallel(self):
+        for name in self.stores():
+            for start, end in self.ranges:
+                for workers in (1, 3):
+                    with self.subTest(store=name, start=start, end=end,
+                                      workers=workers):
+                        self.assertEqual(
+                            trackerian.parallel_summarise(start, end,
+                                                          workers),
+                            trackerian.sum_durations(self.expected, start,
+                                                     end)
+                        )
+
+    def test_stores_select_newest_first_without_loading(self):
+        for name in self.stores():
+            start, end = self.ranges[2]
+            with self.subTest(store=name):
+                selected = [num for num, _ in trackerian.select_activities(
+                    start, True, end
+                )]
+                self.assertEqual(selected, [9, 8, 7, 6, 5, 4, 3, 2])
+                loaded = getattr(trackerian.Activity.instances, 'loaded',
+                                 {})
+                self.assertEqual(loaded, {})
+
+    def test_newest_first_within_range(self):
+        trackerian.Activity.instances = trackerian.IndexedActivities(
+            self.expected
+        )
+        start, end = self.ranges[0]
+        selected = [num for num, _ in trackerian.select_activities(
+            start, True, end
+        )]
+        self.assertEqual(selected, [5, 4, 3])
+
+    def test_unsorted_columns_fall_back_to_scan(self):
+        self.expected[0].start = datetime.datetime(2018, 12, 11, 20)
+        path = os.path.join(self.temp_dir.name, 'data.columns')
+        trackerian.Activity.instances = list(self.expected)
+        journal = trackerian.ColumnJournal(path, path + '.journal')
+        journal.checkpoint()
+        journal.load()
+        self.assertFalse(trackerian.Activity.instances.columns.sorted)
+        start, end = self.ranges[0]
+        self.assertEqual(
+            [num for num, _ in trackerian.select_activities(
+                start, date_range_end=end)],
+            [0, 3, 4, 5]
+        )
+
+
+class TestIndexedActivities(unittest.TestCase):
+    """Tests for the IndexedActivities start index."""
+
+    def setUp(self):
+        """Instantiate three activities an hour apart in an indexed list."""
+        trackerian.Activity.instances = trackerian.IndexedActivities()
+        for hour, name in ((9, 'Nine'), (10, 'Ten'), (11, 'Eleven')):
+            trackerian.Activity(name, datetime.datetime(2018, 12, 10, hour))
+
+    def tearDown(self):
+        """Restore trackerian's Activity class attributes."""
+        trackerian.Activity.instances = []
+        trackerian.Activity.events = []
+
+    def assert_index_sorted(self):
+        instances = trackerian.Activity.instances
+        self.assertEqual(instances.starts, sorted(instances.starts))
+        self.assertEqual(
+            [instances[num].start for num in instances.positions],
+            instances.starts
+        )
+
+    def selected_names(self, range_start):
+        return [(num, activity.name) for num, activity
+                in trackerian.select_activities(range_start)]
+
+    def test_select_from_range_start(self):
+        range_start = datetime.datetime(2018, 12, 10, 10)
+        self.assertEqual(self.selected_names(range_start),
+                         [(1, 'Ten'), (2, 'Eleven')])
+
+    def test_start_edit_moves_activity_in_index(self):
+        trackerian.Activity.instances[0].update_datetime('start', '12:00:00')
+        self.assert_index_sorted()
+        range_start = datetime.datetime(2018, 12, 10, 10, 30)
+        self.assertEqual(self.selected_names(range_start),
+                         [(0, 'Nine'), (2, 'Eleven')])
+
+    def test_out_of_range_delete_raises_index_error(self):
+        instances = trackerian.Activity.instances
+        for index in (3, -4):
+            with self.subTest(index=index):
+                with self.assertRaises(IndexError):
+                    del instances[index]
+        self.assertEqual([activity.name for activity in instances],
+                         ['Nine', 'Ten', 'Eleven'])
+        del instances[-1]
+        self.assertEqual([activity.name for activity in instances],
+                         ['Nine', 'Ten'])
+        with self.assertRaises(IndexError):
+            del trackerian.IndexedActivities()[0]
+
+    def test_remove_renumbers_index(self):
+        del trackerian.Activity.instances[0]
+        self.assert_index_sorted()
+        self.assertEqual(self.selected_names(None),
+                         [(0, 'Ten'), (1, 'Eleven')])
+
+    @patch('trackerian.get_current_datetime')
+    def test_summary_matches_unindexed_summary(self, mocked_time):
+        mocked_time.return_value = datetime.datetime(2018, 12, 10, 16)
+        range_start = datetime.datetime(2018, 12, 10, 10)
+        self.assertEqual(
+            trackerian.summarise_activities(range_start),
+            trackerian.sum_durations(list(trackerian.Activity.instances),
+                                     range_start)
+        )
+
+    def finish_all(self):
+        """End every activity an hour after it started."""
+        for activity in trackerian.Activity.instances:
+            activity.end = activity.start + datetime.timedelta(hours=1)
+            trackerian.record_event('finish', activity, activity.end)
+
+    @patch('trackerian.get_current_datetime')
+    def test_rollups_match_unindexed_summary_after_changes(self,
+                                                           mocked_time):
+        mocked_time.return_value = datetime.datetime(2018, 12, 12, 16)
+        self.finish_all()
+        trackerian.Activity('Next Day', datetime.datetime(2018, 12, 11, 9))
+        trackerian.Activity.instances[-1].tags = ['Late']
+        trackerian.record_event('tag', trackerian.Activity.instances[-1])
+        trackerian.Activity.instances[1].name = 'Renamed'
+        trackerian.record_event('edit', trackerian.Activity.instances[1])
+        del trackerian.Activity.instances[0]
+
+        for range_start in (None, datetime.datetime(2018, 12, 10, 10, 30)):
+            self.assertEqual(
+                trackerian.summarise_activities(range_start),
+                trackerian.sum_durations(list(trackerian.Activity.instances),
+                                         range_start)
+            )
+
+    def test_only_dirty_days_totalled_again(self):
+        self.finish_all()
+        trackerian.Activity.instances.refresh_rollups()
+        trackerian.Activity('Next Day', datetime.datetime(2018, 12, 11, 9))
+        self.assertEqual(trackerian.Activity.instances.dirty_days,
+                         {datetime.date(2018, 12, 11)})
+        trackerian.Activity.instances.refresh_rollups()
+        self.assertFalse(
+            trackerian.Activity.instances.rollups[datetime.date(2018, 12,
+                                                                10)][3]
+        )
+        self.assertTrue(
+            trackerian.Activity.instances.rollups[datetime.date(2018, 12,
+                                                                11)][3]
+        )
+
+    def test_index_survives_pickling(self):
+        trackerian.Activity.instances[2].update_datetime('start', '08:00:00')
+        restored = pickle.loads(pickle.dumps(trackerian.Activity.instances))
+        self.assertEqual(restored.positions, [2, 0, 1])
+
+
+@unittest.skipIf(trackerian.load_numpy() is None, "NumPy is not installed")
+class TestActivityIDs(unittest.TestCase):
+    """Tests for stable activity IDs and finding activities by them."""
+
+    def setUp(self):
+        """Instantiate four activities an hour apart in an indexed list."""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        path = os.path.join(self.temp_dir.name, 'data')
+        self.journal = trackerian.Journal(path + '.pickle', path + '.journal')
+        self.journal.load()
+        for hour, name in ((9, 'Nine'), (10, 'Ten'), (11, 'Eleven'),
+                           (12, 'Twelve')):
+            trackerian.Activity(name, datetime.datetime(2018, 12, 10, hour))
+            trackerian.Activity.instances[-1].end = datetime.datetime(
+                2018, 12, 10, hour, 30
+            )
+        self.journal.checkpoint()
+
+    def tearDown(self):
+        """Remove temporary files and restore module state."""
+        trackerian.Activity.instances = []
+        trackerian.Activity.events = []
+        self.temp_dir.cleanup()
+
+    def names_by_id(self):
+        return {activity.id: activity.name
+                for activity in trackerian.Activity.instances}
+
+    @patch('sys.stdout', new_callable=io.StringIO)
+    def run_main(self, key, value, mocked_stdout):
+        """Run main with one argument set and commit, returning output."""
+        trackerian.main(edit_args_dict(key, value), self.journal)
+        self.journal.commit()
+        return mocked_stdout.getvalue()
+
+    def test_ids_given_in_order(self):
+        self.assertEqual(self.names_by_id(), {1: 'Nine', 2: 'Ten',
+                                              3: 'Eleven', 4: 'Twelve'})
+
+    def test_ids_kept_after_remove_and_not_reused(self):
+        del trackerian.Activity.instances[3]
+        del trackerian.Activity.instances[0]
+        trackerian.Activity('Thirteen', datetime.datetime(2018, 12, 10, 13))
+        self.assertEqual(self.names_by_id(), {2: 'Ten', 3: 'Eleven',
+                                              5: 'Thirteen'})
+
+    def test_find_returns_position(self):
+        instances = trackerian.Activity.instances
+        self.assertEqual(instances.find(3), 2)
+        del instances[0]
+        self.assertEqual(instances.find(3), 1)
+        self.assertIsNone(instances.find(1))
+        self.assertIsNone(instances.find(99))
+
+    def test_ids_survive_reload(self):
+        self.run_main('remove', '@4')
+        self.run_main('begin', ['Thirteen'])
+        self.journal.load()
+        self.assertEqual(self.names_by_id(), {1: 'Nine', 2: 'Ten',
+                                              3: 'Eleven', 5: 'Thirteen'})
+        self.journal.checkpoint()
+        self.journal.load()
+        self.assertEqual(trackerian.Activity.instances.next_id, 6)
+
+    def test_lists_pickled_without_ids_numbered_in_order(self):
+        activities = list(trackerian.Activity.instances)
+        for activity in activities:
+            activity.id = None
+        restored = trackerian.IndexedActivities.restore(
+            activities, [activity.start for activity in activities],
+            list(range(len(activities)))
+        )
+        self.assertEqual([activity.id for activity in restored],
+                         [1, 2, 3, 4])
+        self.assertEqual(restored.next_id, 5)
+
+    def test_batch_of_removes_by_id_hits_each_activity(self):
+        for reference in ('@1', '@3', '@2'):
+            self.run_main('remove', reference)
+        self.journal.load()
+        self.assertEqual(self.names_by_id(), {4: 'Twelve'})
+
+    def test_edit_by_id(self):
+        self.run_main('edit', ['@2', 'start', '13:00:00'])
+        self.run_main('edit', ['@2', 'name', 'moved'])
+        self.journal.load()
+        instances = trackerian.Activity.instances
+        self.assertEqual(instances[instances.find(2)].name, 'Moved')
+        self.assertEqual(instances[instances.find(2)].start,
+                         datetime.datetime(2018, 12, 10, 13))
+
+    def test_positions_still_accepted(self):
+        self.run_main('remove', -1)
+        self.run_main('edit', ['0', 'name', 'First'])
+        self.assertEqual(self.names_by_id(), {1: 'First', 2: 'Ten',
+                                              3: 'Eleven'})
+
+    def test_unknown_id_reported(self):
+        self.assertIn('There is no activity with ID @9.',
+                      self.run_main('remove', '@9'))
+        self.assertEqual(len(trackerian.Activity.instances), 4)
+
+    def test_stores_without_ids_reported(self):
+        trackerian.Activity.instances = list(trackerian.Activity.instances)
+        self.assertIn('Only the pickle store keeps activity IDs.',
+                      self.run_main('edit', ['@1', 'name', 'New']))
+
+    def test_ids_parsed_as_strings(self):
+        self.assertEqual(trackerian.parse_arguments(['-r', '@3'])['remove'],
+                         '@3')
+        with patch('sys.stderr', new_callable=io.StringIO):
+            with self.assertRaises(SystemExit):
+                trackerian.parse_arguments(['-r', '@x'])
+
+    @patch('sys.stdout', new_callable=io.StringIO)
+    def test_list_shows_ids(self, mocked_stdout):
+        del trackerian.Activity.instances[0]
+        trackerian.print_list(None)
+        lines = mocked_stdout.getvalue().split('\n\n')
+        self.assertTrue(lines[0].startswith('0     @2      (10:00:00 - '))
+        self.assertTrue(lines[2].startswith('2     @4      (12:00:00 - '))
+
+    def test_export_has_ids(self):
+        records = list(trackerian.export_records(None))
+        self.assertEqual([record['id'] for record in records], [1, 2, 3, 4])
+
+
+class TestArchive(unittest.TestCase):
+    """Tests for archiving old activities out of the pickle store."""
+
+    ranges = [
+        (None, None),
+        (datetime.datetime(2018, 12, 11), None),
+        (datetime.datetime(2018, 12, 10, 12), datetime.datetime(2018, 12, 12)),
+        (datetime.datetime(2018, 12, 11, 10), datetime.datetime(2018, 12, 13,
+                                                                 9)),
+        (None, datetime.datetime(2018, 12, 11, 14)),
+    ]
+
+    def setUp(self):
+        """Load a journal holding four days of activities, one running."""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        patcher = patch('trackerian.get_current_datetime',
+                        return_value=datetime.datetime(2018, 12, 13, 16))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.data_file = os.path.join(self.temp_dir.name, 'data.pickle')
+        self.journal = self.new_journal()
+        self.expected = track_activities(
+            (datetime.datetime(2018, 12, day, hour), hour / 2, name, tags)
+            for day in range(10, 14)
+            for hour, name, tags in ((9, 'Code', ['Work']),
+                                     (14, 'read', ['home', 'Work']))
+        )
+        self.expected[-1].end = None
+        self.journal.checkpoint()
+
+    def tearDown(self):
+        """Remove temporary files and restore Activity class attributes."""
+        trackerian.Activity.instances = []
+        trackerian.Activity.events = []
+        self.temp_dir.cleanup()
+
+    def new_journal(self):
+        """Return a loaded Journal as a fresh invocation would see it."""
+        journal = trackerian.Journal(self.data_file,
+                                     self.data_file + '.journal')
+        journal.load()
+        return journal
+
+    @patch('sys.stdout', new_callable=io.StringIO)
+    def archive(self, before, mocked_stdout):
+        """Archive activities before a time and reload the journal."""
+        trackerian.archive_activities(before, self.journal)
+        self.journal = self.new_journal()
+        return mocked_stdout.getvalue()
+
+    def test_archived_activities_leave_snapshot(self):
+        output = self.archive(datetime.datetime(2018, 12, 12))
+        self.assertIn('Archived 4 activities', output)
+        instances = trackerian.Activity.instances
+        self.assertEqual([activity.start.day for activity in instances],
+                         [12, 12, 13, 13])
+        self.assertEqual(len(instances.archive), 4)
+        archive_dir = os.path.join(self.temp_dir.name, 'data.archive')
+        file_name, = os.listdir(archive_dir)
+        path = os.path.join(archive_dir, file_name)
+        self.assertEqual(os.stat(path).st_mode & 0o222, 0)
+        with open(path, 'rb') as archive_file:
+            self.assertEqual(archive_file.read(2), b'\x1f\x8b')
+
+    def test_ids_kept_by_activities_left(self):
+        self.archive(datetime.datetime(2018, 12, 12))
+        instances = trackerian.Activity.instances
+        self.assertEqual([activity.id for activity in instances],
+                         [5, 6, 7, 8])
+        self.assertEqual(instances.next_id, 9)
+
+    def test_running_activity_is_not_archived(self):
+        self.archive(datetime.datetime(2019, 1, 1))
+        self.assertEqual(len(trackerian.Activity.instances), 1)
+        self.assertIsNone(trackerian.Activity.instances[0].end)
+        self.assertIn('no finished activities',
+                      self.archive(datetime.datetime(2019, 1, 1)))
+
+    def test_summaries_match_unarchived_history(self):
+        self.archive(datetime.datetime(2018, 12, 11, 12))
+        self.archive(datetime.datetime(2018, 12, 12, 12))
+        for start, end in self.ranges:
+            with self.subTest(start=start, end=end):
+                self.assertEqual(
+                    trackerian.summarise_activities(start, end),
+                    trackerian.sum_durations(self.expected, start, end)
+                )
+
+    def test_whole_days_are_summarised_without_reading_archive(self):
+        self.archive(datetime.datetime(2018, 12, 12))
+        with patch('trackerian.Archive.read') as mocked_read:
+            trackerian.summarise_activities(None)
+            trackerian.summarise_activities(datetime.datetime(2018, 12, 11))
+            list(trackerian.select_activities(
+                datetime.datetime(2018, 12, 12)
+            ))
+        mocked_read.assert_not_called()
+
+    def test_list_reads_archive_when_range_reaches_it(self):
+        self.archive(datetime.datetime(2018, 12, 12))
+        selected = [(num, activity.start) for num, activity
+                    in trackerian.select_activities(
+                        datetime.datetime(2018, 12, 11, 10)
+                    )]
+        self.assertEqual(selected, [('A3', self.expected[3].start)] + [
+            (num, activity.start)
+            for num, activity in enumerate(self.expected[4:])
+        ])
+        newest = [num for num, _ in trackerian.select_activities(
+            None, newest_first=True
+        )]
+        self.assertEqual(newest, [3, 2, 1, 0, 'A3', 'A2', 'A1', 'A0'])
+
+    @unittest.skipIf(trackerian.load_numpy() is None,
+                     "NumPy is not installed")
+    def test_numpy_engine_adds_archive(self):
+        self.archive(datetime.datetime(2018, 12, 12))
+        start, end = self.ranges[2]
+        self.assertEqual(
+            trackerian.merge_summaries([
+                trackerian.Activity.instances.archive.summarise(start, end),
+                trackerian.numpy_summarise(trackerian.Activity.instances,
+                                           start, end)
+            ]),
+            trackerian.sum_durations(self.expected, start, end)
+        )
+
+    @patch('sys.stdout', new_callable=io.StringIO)
+    def test_main_archives_before_date(self, mocked_stdout):
+        args = edit_args_dict('archive_before',
+                              trackerian.since_time('2018-12-11'))
+        self.assertFalse(trackerian.tail_only(args))
+        trackerian.main(args, self.journal)
+        self.journal = self.new_journal()
+        self.assertEqual(len(trackerian.Activity.instances), 6)
+        trackerian.main(edit_args_dict('summary', 'all'))
+        self.assertIn('Activities Tracked: 8', mocked_stdout.getvalue())
+
+    @patch('sys.stdout', new_callable=io.StringIO)
+    def test_other_stores_cannot_archive(self, mocked_stdout):
+        trackerian.Activity.instances = list(self.expected)
+        trackerian.archive_activities(datetime.datetime(2018, 12, 12))
+        self.assertIn('Only the pickle store', mocked_stdout.getvalue())
+        self.assertEqual(trackerian.Activity.instances, self.expected)
+
+
+class TestNumpySummarise(unittest.TestCase):
+    """Tests for the numpy_summarise function."""
+
+    def setUp(self):
+        """Instantiate activities with repeated names and tags."""
+        day = datetime.datetime(2018, 12, 10, 9, 0, 0)
+        for hour, name, tags in ((0, 'Code', ['Work', 'work']),
+                                 (1, 'Read', ['Home']), (2, 'code', []),
+                                 (3, 'Lunch', ['Home', 'Food'])):
+            trackerian.Activity(name, day + datetime.timedelta(hours=hour))
+            trackerian.Activity.instances[-1].tags = tags
+            trackerian.Activity.instances[-1].duration = datetime.timedelta(
+                minutes=10 * (hour + 1)
+            )
+        trackerian.Activity.instances[-1].duration = None
+
+    def tearDown(self):
+        """Restore trackerian's Activity instances to an empty list."""
+        trackerian.Activity.instances = []
+
+    @patch('trackerian.get_current_datetime')
+    def test_matches_python_engine(self, mocked_time):
+        mocked_time.return_value = datetime.datetime(2018, 12, 10, 13, 0)
+        for range_start in (None, datetime.datetime(2018, 12, 10, 10, 0)):
+            numpy_summary = trackerian.numpy_summarise(
+                trackerian.Activity.instances, range_start
+            )
+            python_summary = trackerian.summarise_activities(range_start)
+            self.assertEqual(numpy_summary, python_summary)
+            for numpy_group, python_group in zip(numpy_summary[1:],
+                                                 python_summary[1:]):
+                self.assertEqual(list(numpy_group), list(python_group))
+
+    @patch('sys.stdout', new_callable=io.StringIO)
+    def test_print_summary_output_matches(self, mocked_stdout):
+        with patch('trackerian.get_current_datetime') as mocked_time:
+            mocked_time.return_value = datetime.datetime(2018, 12, 10, 13)
+            trackerian.print_summary(None, 'numpy')
+            trackerian.print_summary(None, 'python')
+        numpy_output, python_output = mocked_stdout.getvalue().split(
+            'Activities Tracked'
+        )[1:]
+        self.assertEqual(numpy_output, python_output)
+
+
+class TestHistogram(unittest.TestCase):
+    """Tests for splitting activities into hour of the week buckets."""
+
+    def setUp(self):
+        """Fix the current time to a Wednesday afternoon."""
+        patcher = patch('trackerian.get_current_datetime',
+                        return_value=datetime.datetime(2018, 12, 12, 16))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        """Restore trackerian's Activity class attributes."""
+        trackerian.Activity.instances = []
+        trackerian.Activity.events = []
+
+    @staticmethod
+    def hour(day, hour):
+        """Return the bucket of an hour of a weekday, Monday being 0."""
+        return day * 24 + hour
+
+    @staticmethod
+    def by_minute(intervals):
+        """Return buckets filled a minute at a time, for comparison."""
+        minute = 60 * 10 ** 6
+        totals = [0] * trackerian.HOURS_PER_WEEK
+        for start, end in intervals:
+            for micros in range(start, end, minute):
+                when = trackerian.micros_to_datetime(micros)
+                totals[when.weekday() * 24 + when.hour] += minute
+        return totals
+
+    def totals(self, *intervals):
+        histogram = trackerian.WeekHistogram()
+        for start, end in intervals:
+            histogram.add(trackerian.datetime_to_micros(start),
+                          trackerian.datetime_to_micros(end))
+        return histogram.totals()
+
+    def test_part_hours_split_at_boundary(self):
+        totals = self.totals((datetime.datetime(2018, 12, 10, 9, 45),
+                              datetime.datetime(2018, 12, 10, 10, 15)))
+        half_hour = 30 * 60 * 10 ** 6
+        self.assertEqual(totals[self.hour(0, 9)], half_hour / 2)
+        self.assertEqual(totals[self.hour(0, 10)], half_hour / 2)
+        self.assertEqual(sum(totals), half_hour)
+
+    def test_sunday_night_wraps_to_monday(self):
+        totals = self.totals((datetime.datetime(2018, 12, 16, 22, 30),
+                              datetime.datetime(2018, 12, 17, 2)))
+        hour = trackerian.HOUR_MICROS
+        self.assertEqual(totals[self.hour(6, 22)], hour // 2)
+        self.assertEqual(totals[self.hour(6, 23)], hour)
+        self.assertEqual(totals[self.hour(0, 0)], hour)
+        self.assertEqual(totals[self.hour(0, 1)], hour)
+        self.assertEqual(totals[self.hour(0, 2)], 0)
+
+    def test_weeks_long_interval_fills_every_hour(self):
+        totals = self.totals((datetime.datetime(2018, 12, 3),
+                              datetime.datetime(2018, 12, 17, 12)))
+        self.assertEqual(totals[self.hour(0, 11)],
+                         3 * trackerian.HOUR_MICROS)
+        self.assertEqual(totals[self.hour(3, 20)],
+                         2 * trackerian.HOUR_MICROS)
+
+    def test_matches_minute_by_minute_split(self):
+        rng = random.Random(20)
+        minute = 60 * 10 ** 6
+        base = trackerian.datetime_to_micros(datetime.datetime(2018, 1, 1))
+        intervals = []
+        for _ in range(40):
+            start = base + rng.randrange(0, 60 * 24 * 30) * minute
+            intervals.append((start, start + rng.randrange(0, 60 * 400)
+                              * minute))
+        histogram = trackerian.WeekHistogram()
+        for start, end in intervals:
+            histogram.add(start, end)
+        self.assertEqual(histogram.totals(), self.by_minute(intervals))
+
+    def add_activities(self):
+        """Track activities crossing midnight and one still running."""
+        track_activities((
+            (datetime.datetime(2018, 12, 10, 23), 2, 'Code', ['Work']),
+            (datetime.datetime(2018, 12, 11, 9), 1, 'code', ['work']),
+            (datetime.datetime(2018, 12, 12, 15), None, 'Read', []),
+        ))
+
+    def test_groups_merge_title_case(self):
+        self.add_activities()
+        overall, names = trackerian.histogram_activities(None, by='name')
+        self.assertEqual(list(names), ['Code', 'Read'])
+        self.assertEqual(names['Code'][self.hour(1, 9)],
+                         trackerian.HOUR_MICROS)
+        self.assertEqual(names['Read'][self.hour(2, 15)],
+                         trackerian.HOUR_MICROS)
+        self.assertEqual(sum(overall), 4 * trackerian.HOUR_MICROS)
+        _, tags = trackerian.histogram_activities(None, by='tag')
+        self.assertEqual(sum(tags['Work']), 3 * trackerian.HOUR_MICROS)
+
+    def test_range_selects_by_start(self):
+        self.add_activities()
+        overall, _ = trackerian.histogram_activities(
+            datetime.datetime(2018, 12, 11), datetime.datetime(2018, 12, 12)
+        )
+        self.assertEqual(sum(overall), trackerian.HOUR_MICROS)
+
+    @unittest.skipIf(trackerian.load_numpy() is None,
+                     "NumPy is not installed")
+    def test_numpy_matches_python(self):
+        self.add_activities()
+        trackerian.Activity('Week Long', datetime.datetime(2018, 11, 1, 7))
+        trackerian.Activity.instances[-1].end = datetime.datetime(2018, 11,
+                                                                  20, 8, 20)
+        for by in (None, 'name', 'tag'):
+            with self.subTest(by=by):
+                self.assertEqual(
+                    trackerian.numpy_histogram(trackerian.Activity.instances,
+                                               None, None, by),
+                    trackerian.histogram_activities(None, None, by)
+                )
+
+    def test_render_shades_by_share_of_busiest_hour(self):
+        totals = [0] * trackerian.HOURS_PER_WEEK
+        totals[self.hour(0, 0)] = 4
+        totals[self.hour(0, 1)] = 1
+        lines = trackerian.render_heatmap('Code', totals,
+                                          trackerian.ASCII_SHADES)
+        self.assertTrue(lines[0].startswith('Code |'))
+        self.assertTrue(lines[3].startswith('Mon ##::..'))
+        self.assertTrue(lines[4].startswith('Tue ....'))
+        self.assertIn('Busiest hour Mon 00:00', lines[-1])
+
+    @patch('sys.stdout', new_callable=io.StringIO)
+    def test_main_prints_heatmap_per_group(self, mocked_stdout):
+        self.add_activities()
+        args = edit_args_dict('histogram', 'all')
+        args['by'] = 'tag'
+        trackerian.main(args)
+        output = mocked_stdout.getvalue()
+        self.assertIn('All Activities |', output)
+        self.assertIn('Work |', output)
+        self.assertFalse(trackerian.tail_only(args))
+
+
+class TestPrintSummaryEngine(unittest.TestCase):
+    """Tests for print_summary engine selection."""
+
+    def tearDown(self):
+        """Restore trackerian's Activity instances to an empty list."""
+        trackerian.Activity.instances = []
+
+    @patch('sys.stdout', new_callable=io.StringIO)
+    @patch('trackerian.numpy', None)
+    def test_missing_numpy_falls_back_to_python(self, mocked_stdout):
+        trackerian.Activity('Fallback')
+        trackerian.print_summary(None, 'numpy')
+        self.assertIn('NumPy is not installed', mocked_stdout.getvalue())
+        self.assertIn('Fallback', mocked_stdout.getvalue())
+
+    @patch('sys.stdout', new_callable=io.StringIO)
+    @patch('trackerian.can_fork', return_value=False)
+    def test_parallel_without_fork_falls_back_to_python(self, _,
+                                                         mocked_stdout):
+        trackerian.Activity('Fallback')
+        trackerian.print_summary(None, 'parallel')
+        self.assertIn('cannot be forked', mocked_stdout.getvalue())
+        self.assertIn('Fallback', mocked_stdout.getvalue())
+
+
+@unittest.skipUnless(trackerian.can_fork(), "Needs forked processes")
+class TestParallelSummarise(unittest.TestCase):
+    """Tests for totalling partitions of the history in worker processes."""
+
+    def setUp(self):
+        """Track activities with names and tags in mixed case."""
+        patcher = patch('trackerian.get_current_datetime',
+                        return_value=datetime.datetime(2018, 12, 12, 16))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        names = ['Email', 'code', 'Code', 'Read', 'email', 'Plan', 'read']
+        for num in range(40):
+            trackerian.Activity(names[num % len(names)],
+                                datetime.datetime(2018, 12, 1, 8)
+                                + datetime.timedelta(hours=7 * num))
+            activity = trackerian.Activity.instances[-1]
+            activity.tags = [['work', 'Home'], ['Work'], []][num % 3]
+            activity.end = activity.start + datetime.timedelta(
+                minutes=10 + num
+            )
+        trackerian.Activity.instances[-1].end = None
+
+    def tearDown(self):
+        """Restore trackerian's Activity class attributes."""
+        trackerian.Activity.instances = []
+        trackerian.Activity.events = []
+
+    def test_merged_groups_keep_serial_order(self):
+        serial = trackerian.sum_durations(trackerian.Activity.instances, None)
+        for workers in (1, 2, 5, 100):
+            with self.subTest(workers=workers):
+                total, names, tags = trackerian.parallel_summarise(
+                    None, workers=workers
+                )
+                self.assertEqual(total, serial[0])
+                self.assertEqual(list(names.items()),
+                                 list(serial[1].items()))
+                self.assertEqual(list(tags.items()), list(serial[2].items()))
+
+    def test_empty_range(self):
+        self.assertEqual(
+            trackerian.parallel_summarise(datetime.datetime(2019, 1, 1),
+                                          workers=4),
+            (datetime.timedelta(), {}, {})
+        )
+
+    def test_merge_summaries_adds_partitions(self):
+        hour = datetime.timedelta(hours=1)
+        self.assertEqual(
+            trackerian.merge_summaries([
+                (hour, {'Code': hour}, {'Work': hour}),
+                (2 * hour, {'Read': hour, 'Code': hour}, {}),
+            ]),
+            (3 * hour, {'Code': 2 * hour, 'Read': hour}, {'Work': hour})
+        )
+
+    @patch('sys.stdout', new_callable=io.StringIO)
+    def test_main_prints_same_summary(self, mocked_stdout):
+        args = edit_args_dict('summary', 'all')
+        trackerian.main(args)
+        serial = mocked_stdout.getvalue()
+        mocked_stdout.seek(0)
+        mocked_stdout.truncate()
+        args.update(engine='parallel', workers=3)
+        trackerian.main(args)
+        self.assertEqual(mocked_stdout.getvalue(), serial)
+
+    def test_workers_must_be_positive(self):
+        with self.assertRaises(SystemExit), \
+                patch('sys.stderr', new_callable=io.StringIO):
+            trackerian.parse_arguments(['-s', '--engine', 'parallel',
+                                        '--workers', '0'])
+
+
+class TestResultCache(unittest.TestCase):
+    """Tests for reusing list and summary results between commands."""
+
+    def setUp(self):
+        """Load a journal holding a finished and a running activity."""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.now = datetime.datetime(2018, 12, 10, 12)
+        patcher = patch('trackerian.get_current_datetime',
+                        side_effect=lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        path = os.path.join(self.temp_dir.name, 'data')
+        self.cache_file = path + '.cache'
+        self.journal = trackerian.Journal(path + '.pickle', path + '.journal')
+        self.journal.load()
+        for hour, name, tags in ((9, 'Code', ['work']),
+                                 (11, 'read', ['Work', 'Home'])):
+            trackerian.Activity(name, datetime.datetime(2018, 12, 10, hour))
+            trackerian.Activity.instances[-1].tags = tags
+        trackerian.Activity.instances[0].end = datetime.datetime(2018, 12, 10,
+                                                                 10)
+        self.journal.checkpoint()
+        self.results = self.new_cache()
+
+    def tearDown(self):
+        """Remove temporary files and restore module state."""
+        trackerian.Activity.instances = []
+        trackerian.Activity.events = []
+        self.temp_dir.cleanup()
+
+    def new_cache(self):
+        """Return a ResultCache for the journal as it is now."""
+        results = trackerian.ResultCache(self.journal.version(),
+                                         self.cache_file)
+        patcher = patch('trackerian.RESULTS', results)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        return results
+
+    @patch('sys.stdout', new_callable=io.StringIO)
+    def summary(self, mocked_stdout):
+        """Return the printed summary of today's activities."""
+        trackerian.print_summary(datetime.datetime(2018, 12, 10))
+        return mocked_stdout.getvalue()
+
+    def test_entries_saved_for_unchanged_store(self):
+        self.results.put('key', 'entry')
+        self.results.save(self.journal.version())
+        self.assertEqual(self.new_cache().get('key'), 'entry')
+
+    def test_committed_change_invalidates_entries(self):
+        self.results.put('key', 'entry')
+        self.results.save(self.journal.version())
+        trackerian.Activity.instances[-1].end_activity()
+        trackerian.record_event('finish', trackerian.Activity.instances[-1],
+                                trackerian.Activity.instances[-1].end)
+        self.journal.commit()
+        self.assertIsNone(self.new_cache().get('key'))
+
+    def test_least_recently_used_entries_dropped(self):
+        for key in range(trackerian.CACHE_ENTRIES):
+            self.results.put(key, key)
+        self.results.get(0)
+        self.results.put('new', 'new')
+        self.assertIsNone(self.results.get(1))
+        self.assertEqual(self.results.get(0), 0)
+
+    def test_cached_summary_adds_elapsed_time(self):
+        first = self.summary()
+        self.now += datetime.timedelta(minutes=30)
+        with patch('trackerian.summarise_activities') as mocked_summarise:
+            cached = self.summary()
+        mocked_summarise.assert_not_called()
+        self.assertNotEqual(cached, first)
+        self.results.entries.clear()
+        self.assertEqual(cached, self.summary())
+        self.assertIn('Read                 01:30:00', cached)
+        self.assertIn('Home                 01:30:00', cached)
+        self.assertIn('Work                 02:30:00', cached)
+
+    def test_cached_list_describes_running_activity_again(self):
+        start = datetime.datetime(2018, 12, 10)
+        first = ''.join(trackerian.render_list(start))
+        self.now += datetime.timedelta(minutes=5)
+        with patch('trackerian.select_activities') as mocked_select:
+            cached = ''.join(trackerian.render_list(start))
+        mocked_select.assert_not_called()
+        self.assertIn('Duration: 01:05:00', cached)
+        self.assertEqual(cached.replace('01:05:00', '01:00:00'), first)
+
+    def test_cached_list_keeps_ids_when_tail_loaded(self):
+        start = datetime.datetime(2018, 12, 10)
+        first = ''.join(trackerian.render_list(start))
+        self.assertIn('@1', first)
+        self.assertTrue(self.journal.load_tail())
+        self.assertIsInstance(trackerian.Activity.instances,
+                              trackerian.TailActivities)
+        self.assertEqual(''.join(trackerian.render_list(start)), first)
+
+    def test_long_lists_not_cached(self):
+        with patch('trackerian.CACHE_LIST_ROWS', 1):
+            ''.join(trackerian.render_list(None))
+        self.assertEqual(len(self.results.entries), 0)
+
+    def test_only_plain_lists_and_summaries_have_keys(self):
+        start = datetime.datetime(2018, 12, 10)
+        self.assertEqual(trackerian.result_key(edit_args_dict('summary',
+                                                              'day')),
+                         ('summary', start, None))
+        since = edit_args_dict('since', start)
+        self.assertEqual(trackerian.result_key(since),
+                         ('list', start, None, None, 0, False))
+        args = edit_args_dict('summary', 'day')
+        args['tag'] = ['work']
+        self.assertIsNone(trackerian.result_key(args))
+        self.assertIsNone(trackerian.result_key(edit_args_dict('remove',
+                                                               0)))
+
+    @patch('sys.stdout', new_callable=io.StringIO)
+    def test_tail_loaded_store_loads_when_not_cached(self, _):
+        self.assertTrue(self.journal.load_tail())
+        trackerian.main(edit_args_dict('summary', 'day'), self.journal)
+        self.assertIsInstance(trackerian.Activity.instances,
+                              trackerian.IndexedActivities)
+
+
+class TestUsers(unittest.TestCase):
+    """Tests for per-user stores and team summaries."""
+
+    def setUp(self):
+        """Write stores for two users in a temporary users folder."""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.users_dir = os.path.join(self.temp_dir.name, 'data.users')
+        patcher = patch('trackerian.USERS_DIR', self.users_dir)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.now = datetime.datetime(2018, 12, 10, 12)
+        patcher = patch('trackerian.get_current_datetime',
+                        side_effect=lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        for user, rows in (('alice', [(9, 10, 'Code', ['Work']),
+                                      (10, 11, 'Email', [])]),
+                           ('bob', [(8, 11, 'code', ['work', 'Home'])])):
+            directory = trackerian.user_directory(user)
+            os.makedirs(directory)
+            journal = trackerian.open_store('pickle', directory=directory)
+            for start, end, name, tags in rows:
+                trackerian.Activity(name,
+                                    datetime.datetime(2018, 12, 10, start))
+                trackerian.Activity.instances[-1].end = datetime.datetime(
+                    2018, 12, 10, end
+                )
+                trackerian.Activity.instances[-1].tags = tags
+            journal.checkpoint()
+        trackerian.Activity.instances = []
+
+    def tearDown(self):
+        """Remove temporary files and restore module state."""
+        trackerian.Activity.instances = []
+        trackerian.Activity.events = []
+        self.temp_dir.cleanup()
+
+    def team_summary(self, date_range_start=None):
+        """Return the printed team summary from date_range_start."""
+        with patch('sys.stdout', new_callable=io.StringIO) as mocked_stdout:
+            trackerian.print_team_summary(date_range_start)
+        return mocked_stdout.getvalue()
+
+    def test_user_ids_validated(self):
+        for value in ('alice', 'bob.smith', 'team-2_b'):
+            self.assertEqual(trackerian.user_id(value), value)
+        for value in ('', '.hidden', '..', 'a/b', 'a b'):
+            with self.assertRaises(ValueError):
+                trackerian.user_id(value)
+
+    def test_user_argument_selects_folder(self):
+        args = trackerian.parse_arguments(['--user', 'alice', '-l'])
+        self.assertEqual(trackerian.user_directory(args['user']),
+                         os.path.join(self.users_dir, 'alice'))
+        self.assertEqual(trackerian.user_directory(None), '')
+
+    def test_users_listed_from_folders(self):
+        self.assertEqual(trackerian.list_users(), ['alice', 'bob'])
+        with patch('trackerian.USERS_DIR', self.temp_dir.name + '/none'):
+            self.assertEqual(trackerian.list_users(), [])
+
+    def test_stores_opened_in_user_folder(self):
+        for name in sorted(trackerian.STORES):
+            with self.subTest(store=name):
+                directory = trackerian.user_directory('bob')
+                trackerian.open_store(name, directory=directory)
+                self.assertEqual(
+                    [activity.name
+                     for activity in trackerian.Activity.instances],
+                    ['code']
+                )
+                store = trackerian.store_at(name, directory)
+                self.assertTrue(os.path.exists(store.data_file))
+                self.assertEqual(os.path.dirname(store.data_file), directory)
+                trackerian.Activity.instances = []
+
+    def test_team_summary_adds_up_users(self):
+        output = self.team_summary()
+        self.assertIn('Activities Tracked: 3 | Total Time Tracked: 05:00:00',
+                      output)
+        self.assertIn('Code                 04:00:00', output)
+        self.assertIn('Work                 04:00:00', output)
+        self.assertIn('bob                  03:00:00', output)
+        self.assertIn('alice                02:00:00', output)
+
+    def test_team_summary_keeps_loaded_activities(self):
+        trackerian.Activity('Mine')
+        activities = trackerian.Activity.instances
+        self.team_summary()
+        self.assertIs(trackerian.Activity.instances, activities)
+
+    def test_team_summary_reuses_cached_user_summaries(self):
+        first = self.team_summary()
+        with patch('trackerian.open_store') as mocked_open:
+            self.assertEqual(self.team_summary(), first)
+        mocked_open.assert_not_called()
+
+    def test_empty_range_has_zero_percentages(self):
+        output = self.team_summary(datetime.datetime(2030, 1, 1))
+        self.assertIn('Activities Tracked: 3 | Total Time Tracked: 00:00:00',
+                      output)
+        self.assertIn('bob                  00:00:00        0.00%', output)
+
+    @unittest.skipUnless(hasattr(socket, 'AF_UNIX'), "Needs Unix sockets")
+    def test_user_with_daemon_totalled_by_it(self):
+        socket_file = os.path.join(self.users_dir, 'bob', 'data.sock')
+        daemon = subprocess.Popen(
+            [sys.executable, os.path.abspath(trackerian.__file__),
+             '--user', 'bob', '--daemon'],
+            cwd=self.temp_dir.name, stdout=subprocess.DEVNULL,
+            env=dict(os.environ, TRACKERIAN_STORE='pickle')
+        )
+        self.addCleanup(daemon.wait, 5)
+        self.addCleanup(daemon.terminate)
+        for _ in range(500):
+            if trackerian.daemon_running(socket_file):
+                break
+            time.sleep(0.01)
+        with patch('trackerian.open_store',
+                   wraps=trackerian.open_store) as mocked_open:
+            output = self.team_summary()
+        self.assertEqual(mocked_open.call_count, 1)
+        self.assertIn('Total Time Tracked: 05:00:00', output)
+        self.assertIn('bob                  03:00:00', output)
+
+    def test_user_whose_daemon_fails_skipped(self):
+        directory = trackerian.user_directory('bob')
+        with trackerian.StoreLock(os.path.join(directory, 'data.lock')), \
+                patch('trackerian.daemon_exchange',
+                      return_value={'error': 'broken'}):
+            output = self.team_summary()
+        self.assertIn('Total Time Tracked: 02:00:00', output)
+        self.assertIn('Skipped bob as their daemon could not total their '
+                      'activities.', output)
+
+    def test_totals_survive_encoding(self):
+        summary = (datetime.timedelta(hours=2, microseconds=5),
+                   {'Code': datetime.timedelta(hours=2, microseconds=5)},
+                   {'Work': datetime.timedelta(hours=1)})
+        self.assertEqual(trackerian.decode_totals(json.loads(json.dumps(
+            trackerian.encode_totals(3, summary)
+        ))), (3, summary))
+
+    @patch('sys.stdout', new_callable=io.StringIO)
+    def test_main_without_users_prints_message(self, mocked_stdout):
+        with patch('trackerian.USERS_DIR', self.temp_dir.name + '/none'):
+            trackerian.main(edit_args_dict('team', 'all'))
+        self.assertIn('No users have tracked activities',
+                      mocked_stdout.getvalue())
+
+    def test_commands_kept_apart_by_user(self):
+        program = [sys.executable, os.path.abspath(trackerian.__file__)]
+        env = dict(os.environ, TRACKERIAN_STORE='pickle')
+
+        def run(*args):
+            return subprocess.run(program + list(args),
+                                  cwd=self.temp_dir.name, env=env,
+                                  stdout=subprocess.PIPE,
+                                  universal_newlines=True,
+                                  check=True).stdout
+
+        run('--user', 'carol', '-b', 'Design')
+        run('-b', 'Solo')
+        self.assertIn('Design', run('--user', 'carol', '-c'))
+        self.assertIn('Solo', run('-c'))
+        self.assertTrue(os.path.exists(
+            os.path.join(self.users_dir, 'carol', 'data.pickle')
+        ))
+        output = run('--team', 'all')
+        self.assertIn('Activities Tracked: 4', output)
+        self.assertIn('carol', output)
+        self.assertNotIn('Solo', output)
+
+
+class TestWriteAtomically(unittest.TestCase):
+    """Tests for the write_atomically function."""
+
+    def setUp(self):
+        """Create a file holding known contents."""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.temp_dir.name, 'data.pickle')
+        with open(self.path, 'wb') as data_file:
+            data_file.write(b'old')
+
+    def tearDown(self):
+        """Remove temporary files."""
+        self.temp_dir.cleanup()
+
+    def test_replaces_contents(self):
+        trackerian.write_atomically(self.path, lambda f: f.write(b'new'))
+        with open(self.path, 'rb') as data_file:
+            self.assertEqual(data_file.read(), b'new')
+
+    def test_failed_write_keeps_old_file(self):
+        def write(data_file):
+            data_file.write(b'ne')
+            raise KeyboardInterrupt
+
+        with self.assertRaises(KeyboardInterrupt):
+            trackerian.write_atomically(self.path, write)
+        with open(self.path, 'rb') as data_file:
+            self.assertEqual(data_file.read(), b'old')
+        self.assertEqual(os.listdir(self.temp_dir.name), ['data.pickle'])
+
+
+@unittest.skipIf(trackerian.fcntl is None, "Needs fcntl file locking")
+class TestStoreLock(unittest.TestCase):
+    """Tests for the StoreLock class and locked commands."""
+
+    def setUp(self):
+        """Use a lock file in a temporary directory."""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.lock_file = os.path.join(self.temp_dir.name, 'data.lock')
+
+    def tearDown(self):
+        """Remove temporary files."""
+        self.temp_dir.cleanup()
+
+    def test_held_lock_not_acquired_without_blocking(self):
+        with trackerian.StoreLock(self.lock_file):
+            other = trackerian.StoreLock(self.lock_file)
+            self.assertFalse(other.acquire(blocking=False))
+        self.assertTrue(other.acquire(blocking=False))
+        other.release()
+
+    def test_overlapping_commands_lose_no_updates(self):
+        program = [sys.executable, os.path.abspath(trackerian.__file__)]
+        env = dict(os.environ, TRACKERIAN_STORE='pickle')
+
+        def worker(number):
+            for command in range(3):
+                label = 'w{}c{}'.format(number, command)
+                for args in (['-b', label], ['-t', label]):
+                    subprocess.run(program + args, cwd=self.temp_dir.name,
+                                   env=env, stdout=subprocess.DEVNULL,
+                                   check=True)
+
+        workers = [threading.Thread(target=worker, args=(number,))
+                   for number in range(4)]
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+
+        trackerian.Journal(
+            os.path.join(self.temp_dir.name, 'data.pickle'),
+            os.path.join(self.temp_dir.name, 'data.journal')
+        ).load()
+        activities = list(trackerian.Activity.instances)
+        trackerian.Activity.instances = []
+        self.assertEqual(len(activities), 12)
+        self.assertEqual(sum(len(activity.tags) for activity in activities),
+                         12)
+
+
+@unittest.skipUnless(hasattr(socket, 'AF_UNIX'), "Needs Unix sockets")
+class TestProfile(unittest.TestCase):
+    """Tests for timing the phases of a command with --profile."""
+
+    def tearDown(self):
+        """Stop profiling and restore Activity class attributes."""
+        trackerian.PROFILE = trackerian.NullProfile()
+        trackerian.Activity.instances = []
+        trackerian.Activity.events = []
+
+    @patch('trackerian.time.perf_counter')
+    def test_nested_phase_left_out_of_outer_phase(self, mocked_clock):
+        mocked_clock.side_effect = [0.0, 1.0, 3.0, 10.0]
+        profile = trackerian.Profile()
+        with profile.phase('command'):
+            with profile.phase('render'):
+                pass
+        self.assertEqual(profile.phases['render'][:2], [1, 2.0])
+        self.assertEqual(profile.phases['command'][:2], [1, 8.0])
+
+    def test_phases_accumulate_calls(self):
+        profile = trackerian.Profile()
+        profile.add('compute', 0.5)
+        profile.add('compute', 0.25)
+        results = profile.results()
+        self.assertEqual(results['phases'][0]['calls'], 2)
+        self.assertEqual(results['phases'][0]['ms'], 750.0)
+        self.assertEqual(results['total_ms'], 750.0)
+
+    def test_json_report(self):
+        profile = trackerian.Profile()
+        profile.add('parse', 0.001)
+        profile.add('load', 0.002)
+        report = json.loads(profile.report('json'))
+        self.assertEqual([phase['phase'] for phase in report['phases']],
+                         ['parse', 'load'])
+
+    def test_text_report(self):
+        profile = trackerian.Profile()
+        profile.add('save', 0.0125)
+        lines = profile.report().splitlines()
+        self.assertTrue(lines[0].startswith('Phase'))
+        self.assertTrue(lines[1].startswith('save'))
+        self.assertIn('12.50', lines[1])
+        self.assertTrue(lines[-1].startswith('Total'))
+
+    def test_null_profile_records_nothing(self):
+        profile = trackerian.NullProfile()
+        with profile.phase('compute'):
+            pass
+        self.assertFalse(hasattr(profile, 'phases'))
+
+    @patch('sys.stdout', new_callable=io.StringIO)
+    def test_list_and_summary_profiled(self, mocked_stdout):
+        trackerian.Activity('Profiled', datetime.datetime(2018, 6, 1, 9))
+        trackerian.Activity.instances[0].end = datetime.datetime(2018, 6, 1,
+                                                                 10)
+        trackerian.PROFILE = trackerian.Profile()
+        trackerian.print_list(None)
+        trackerian.print_summary(None)
+        self.assertEqual(trackerian.PROFILE.phases['compute'][0], 3)
+        self.assertEqual(trackerian.PROFILE.phases['render'][0], 2)
+
+    def test_run_request_returns_report_apart(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            journal = trackerian.Journal(
+                os.path.join(temp_dir, 'data.pickle'),
+                os.path.join(temp_dir, 'data.journal')
+            )
+            journal.load()
+            args = edit_args_dict('begin', ['Profiled'])
+            args['profile'] = 'json'
+            output, report = trackerian.run_request(journal, args)
+        self.assertNotIn('phases', output)
+        report = json.loads(report)
+        self.assertEqual([phase['phase'] for phase in report['phases']],
+                         ['command', 'save'])
+        self.assertIsInstance(trackerian.PROFILE, trackerian.NullProfile)
+
+
+class TestDaemon(unittest.TestCase):
+    """Tests for serving commands from a daemon over a Unix socket."""
+
+    def setUp(self):
+        """Load an empty Journal in a temporary directory."""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.socket_file = os.path.join(self.temp_dir.name, 'data.sock')
+        self.journal = trackerian.Journal(
+            os.path.join(self.temp_dir.name, 'data.pickle'),
+            os.path.join(self.temp_dir.name, 'data.journal')
+        )
+        self.journal.load()
+
+    def tearDown(self):
+        """Remove temporary files and restore Activity class attributes."""
+        self.temp_dir.cleanup()
+        trackerian.Activity.instances = []
+        trackerian.Activity.events = []
+
+    @patch('sys.stdout', new_callable=io.StringIO)
+    def start_daemon(self, requests, mocked_stdout):
+        """Serve a number of requests from a background thread."""
+        thread = threading.Thread(
+            target=trackerian.serve,
+            args=(self.journal, self.socket_file, requests)
+        )
+        thread.start()
+        for _ in range(500):
+            if trackerian.daemon_running(self.socket_file):
+                break
+            thread.join(0.01)
+        return thread
+
+    def test_run_request_returns_output_and_journals(self):
+        output, report = trackerian.run_request(
+            self.journal, edit_args_dict('begin', ['Served'])
+        )
+        self.assertIn('Served', output)
+        self.assertEqual(report, '')
+        self.assertEqual(self.journal.length, 1)
+
+    def test_failed_request_reloads_store(self):
+        with patch('trackerian.main', side_effect=KeyError('broken')):
+            output, _ = trackerian.run_request(
+                self.journal, edit_args_dict('current', True)
+            )
+        self.assertIn('Request failed', output)
+
+    def test_no_daemon_returns_none(self):
+        self.assertIsNone(trackerian.daemon_request(
+            edit_args_dict('current', True), self.socket_file
+        ))
+
+    def test_stale_socket_file_returns_none(self):
+        open(self.socket_file, 'w').close()
+        self.assertFalse(trackerian.daemon_running(self.socket_file))
+        self.assertIsNone(trackerian.daemon_request(
+            edit_args_dict('current', True), self.socket_file
+        ))
+
+    def test_requests_share_daemon_state(self):
+        thread = self.start_daemon(3)
+        trackerian.daemon_request(edit_args_dict('begin', ['Shared']),
+                                  self.socket_file)
+        trackerian.daemon_request(edit_args_dict('tag', ['Daemon']),
+                                  self.socket_file)
+        output, _ = trackerian.daemon_request(
+            edit_args_dict('current', True), self.socket_file
+        )
+        thread.join(5)
+        self.assertIn('Shared', output)
+        self.assertIn('Daemon', output)
+        self.assertFalse(os.path.exists(self.socket_file))
+
+    def test_profile_report_kept_out_of_output(self):
+        thread = self.start_daemon(1)
+        args = edit_args_dict('export', 'all')
+        args['profile'] = 'json'
+        output, report = trackerian.daemon_request(args, self.socket_file)
+        thread.join(5)
+        self.assertEqual(output.splitlines(),
+                         [','.join(trackerian.EXPORT_FIELDS)])
+        self.assertIn('command', [phase['phase'] for phase
+                                  in json.loads(report)['phases']])
+
+    def test_concurrent_clients_all_served(self):
+        thread = self.start_daemon(8)
+        clients = [
+            threading.Thread(target=trackerian.daemon_request, args=(
+                edit_args_dict('begin', ['Client{}'.format(num)]),
+                self.socket_file
+            )) for num in range(8)
+        ]
+        for client in clients:
+            client.start()
+        for client in clients:
+            client.join(5)
+        thread.join(5)
+        self.journal.load()
+        self.assertEqual(len(trackerian.Activity.instances), 8)
+
+
+FOUR_ACTIVITIES = tuple(
+    (datetime.datetime(2018, 12, 10, 9 + hour), hours, name, tags)
+    for hour, hours, name, tags in ((0, 1, 'Code', ['Work']),
+                                    (2, 1, 'code', ['work']),
+                                    (4, 1, 'Lunch', []),
+                                    (6, None, 'Read', ['Home']))
+)
+
+
+def track_activities(rows):
+    """Track activities from (start, hours, name, tags) rows.
+
+    Each activity ends that many hours after its start, or is left
+    running if hours is None.
+
+    Returns:
+        List of the tracked activities.
+
+    """
+    for start, hours, name, tags in rows:
+        trackerian.Activity(name, start)
+        activity = trackerian.Activity.instances[-1]
+        activity.tags = list(tags)
+        if hours is not None:
+            activity.end = start + datetime.timedelta(hours=hours)
+    return list(trackerian.Activity.instances)
+
+
 def edit_args_dict(key, new_value):
     """Edit defaulted argument dictionary and return it.
 
@@ -771,10 +3150,29 @@ def edit_args_dict(key, new_value):
         'finish': False,
         'current': False,
         'summary': None,
+        'histogram': None,
+        'by': None,
+        'since': None,
+        'until': None,
         'list': False,
         'tag': None,
         'edit': None,
         'remove': None,
+        'engine': 'python',
+        'daemon': False,
+        'limit': None,
+        'offset': 0,
+        'newest_first': False,
+        'no_pager': False,
+        'import_file': None,
+        'export': None,
+        'export_format': 'csv',
+        'output': None,
+        'profile': None,
+        'workers': None,
+        'archive_before': None,
+        'user': None,
+        'team': None,
     }
     defaulted_args_dict[key] = new_value
     return defaulted_args_dict
@@ -2,11 +2,91 @@
 
 """Trackerian - a command line time tracker."""
 
-import argparse
+import bisect
 import collections
+import collections.abc
 import datetime
+import itertools
+import os
 import pickle
 import sys
+import time
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# Stores other than pickle, the numpy and parallel engines and the daemon
+# are kept in modules imported when first used, so the common commands do
+# not compile them. Those modules import this one by name, so when it runs
+# as a script they must be given it rather than a second copy
+sys.modules.setdefault('trackerian', sys.modules[__name__])
+MODULE_NAMES = dict.fromkeys((
+    'ColumnFile', 'LazyActivities', 'ColumnActivities', 'ColumnJournal',
+    'SQLiteActivities', 'SQLiteStore', 'SegmentActivities', 'SegmentStore',
+), 'trackerian_stores')
+MODULE_NAMES.update(dict.fromkeys((
+    'summary_arrays', 'numpy_summarise', 'start_partition_worker',
+    'summarise_partition', 'parallel_summarise', 'numpy_histogram',
+), 'trackerian_engines'))
+MODULE_NAMES.update(dict.fromkeys((
+    'run_request', 'totals_request', 'serve',
+), 'trackerian_daemon'))
+
+# NumPy is optional and slow to import so load_numpy imports it the first
+# time the numpy engine is used
+UNLOADED = object()
+numpy = UNLOADED
+
+DATA_FILE = 'data.pickle'
+JOURNAL_FILE = 'data.journal'
+COLUMNS_FILE = 'data.columns'
+COLUMNS_JOURNAL_FILE = 'data.columns.journal'
+SQLITE_FILE = 'data.sqlite'
+SEGMENTS_DIR = 'data.segments'
+ARCHIVE_DIR = 'data.archive'
+SOCKET_FILE = 'data.sock'
+LOCK_FILE = 'data.lock'
+CACHE_FILE = 'data.cache'
+USERS_DIR = 'data.users'
+CACHE_ENTRIES = 16
+CACHE_LIST_ROWS = 1000
+CHECKPOINT_INTERVAL = 1000
+LIST_CHUNK_ROWS = 500
+IMPORT_BATCH_SIZE = 10000
+IMPORT_ERRORS_SHOWN = 10
+EXPORT_FIELDS = ('index', 'id', 'name', 'tags', 'start', 'end',
+                 'duration')
+TIME_PERIODS = ['all', 'day', 'week', 'last-week', 'month', 'year']
+
+EPOCH = datetime.datetime(1970, 1, 1)
+MICROSECOND = datetime.timedelta(microseconds=1)
+NO_END = -2 ** 63
+HOUR_MICROS = 3600 * 10 ** 6
+HOURS_PER_WEEK = 168
+# EPOCH was a Thursday, so hour zero is this many hours into its week
+EPOCH_WEEK_HOUR = 72
+WEEKDAYS = ['Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun']
+HEATMAP_SHADES = ['\u00b7', '\u2591', '\u2592', '\u2593', '\u2588']
+ASCII_SHADES = ['.', ':', '+', '*', '#']
+
+QUICK_OPTIONS = {
+    '-b': 'begin', '--begin': 'begin',
+    '-c': 'current', '--current': 'current',
+    '-f': 'finish', '--finish': 'finish',
+    '-t': 'tag', '--tag': 'tag',
+}
+ARGUMENT_DEFAULTS = {
+    'begin': None, 'current': False, 'finish': False, 'list': None,
+    'summary': None, 'histogram': None, 'by': None, 'since': None,
+    'until': None, 'engine': 'python', 'tag': None, 'edit': None,
+    'remove': None, 'daemon': False, 'limit': None, 'offset': 0,
+    'newest_first': False, 'no_pager': False, 'import_file': None,
+    'export': None, 'export_format': 'csv', 'output': None,
+    'profile': None, 'workers': None, 'archive_before': None,
+    'user': None, 'team': None,
+}
 
 
 def parse_arguments(args):
@@ -19,6 +99,8 @@ def parse_arguments(args):
         Dictionary of arguments and their post-parsed values.
 
     """
+    import argparse
+
     parser = argparse.ArgumentParser(
         description="Command Line Time Tracker",
         formatter_class=argparse.RawTextHelpFormatter
@@ -34,23 +116,104 @@ def parse_arguments(args):
                         help="Finish timing the current activity")
 
     parser.add_argument('-l', '--list', nargs='?',
-                        choices=['all', 'day', 'week'], const='day',
+                        choices=TIME_PERIODS, const='day',
                         help="Print list of tracked activities")
 
+    parser.add_argument('--limit', metavar='rows', type=non_negative_int,
+                        help="List at most this many activities")
+
+    parser.add_argument('--offset', metavar='rows', type=non_negative_int,
+                        default=0,
+                        help="Skip this many activities before listing")
+
+    parser.add_argument('--newest-first', action='store_true',
+                        help="List the most recent activities first")
+
+    parser.add_argument('--no-pager', action='store_true',
+                        help="Print long lists straight to the terminal")
+
     parser.add_argument('-s', '--summary', nargs='?',
-                        choices=['all', 'day', 'week'], const='day',
+                        choices=TIME_PERIODS, const='day',
                         help="Print summary of today's activties or all")
 
+    parser.add_argument('--team', nargs='?', choices=TIME_PERIODS,
+                        const='day',
+                        help="Print summary of every user's activities")
+
+    parser.add_argument('--histogram', nargs='?', choices=TIME_PERIODS,
+                        const='all',
+                        help="Print a heatmap of time tracked by hour\n"
+                        "and weekday, of all activities by default")
+
+    parser.add_argument('--by', choices=['name', 'tag'],
+                        help="Also print a --histogram for each activity\n"
+                        "name or tag")
+
+    parser.add_argument('--since', metavar='time', type=since_time,
+                        help="Only list, summarise or export activities\n"
+                        "starting at or after this ISO 8601 date or time")
+
+    parser.add_argument('--until', metavar='time', type=until_time,
+                        help="Only list, summarise or export activities\n"
+                        "starting before this time or by the end of\n"
+                        "this date")
+
+    parser.add_argument('--engine', choices=['python', 'numpy', 'parallel'],
+                        default='python',
+                        help="Engine used to total summaries and\n"
+                        "histograms. numpy is faster for long histories\n"
+                        "if NumPy is installed. parallel splits\n"
+                        "summaries between worker processes")
+
+    parser.add_argument('--workers', metavar='count', type=positive_int,
+                        help="Worker processes for --engine parallel,\n"
+                        "one per CPU by default")
+
     parser.add_argument('-t', '--tag', metavar='tag', nargs='*',
                         help="Add one word tag(s) to latest activity")
 
     parser.add_argument('-e', '--edit', nargs='*',
                         help="Edit a tracked activity with args:\n"
-                        "{number} {category} {new value(s)}\n"
-                        "Example: --edit 1 name New")
+                        "{number or @ID} {category} {new value(s)}\n"
+                        "Example: --edit @12 name New")
+
+    parser.add_argument('-r', '--remove', metavar='activity number',
+                        type=activity_number,
+                        help="Permanently remove an activity by its\n"
+                        "number or @ID")
+
+    parser.add_argument('--archive-before', metavar='date', type=since_time,
+                        help="Move finished activities started before\n"
+                        "this date into compressed archive files")
+
+    parser.add_argument('--import', metavar='file', dest='import_file',
+                        help="Add finished activities from a .csv or .jsonl\n"
+                        "file with name, start, end and tags fields")
+
+    parser.add_argument('-x', '--export', nargs='?',
+                        choices=TIME_PERIODS, const='day',
+                        help="Write activities as CSV or JSONL for other\n"
+                        "programs")
 
-    parser.add_argument('-r', '--remove', metavar='activity number', type=int,
-                        help="Permanently remove an activity")
+    parser.add_argument('--export-format', choices=['csv', 'jsonl'],
+                        default='csv', help="Format written by --export")
+
+    parser.add_argument('-o', '--output', metavar='file',
+                        help="File --export writes to instead of the\n"
+                        "terminal")
+
+    parser.add_argument('--user', metavar='id', type=user_id,
+                        help="Track and read this user's activities, kept\n"
+                        "in their own folder of {}".format(USERS_DIR))
+
+    parser.add_argument('--daemon', action='store_true',
+                        help="Keep activities loaded and answer other\n"
+                        "commands run from this folder over a socket")
+
+    parser.add_argument('--profile', nargs='?', choices=['text', 'json'],
+                        const='text',
+                        help="Report the time and peak memory of each\n"
+                        "phase of the command on stderr")
 
     if not args:
         parser.print_help()
@@ -58,45 +221,255 @@ def parse_arguments(args):
     return vars(parser.parse_args(args))
 
 
+def non_negative_int(value):
+    """Return value as an int, raising ValueError if it is negative."""
+    number = int(value)
+    if number < 0:
+        raise ValueError(value)
+    return number
+
+
+def activity_number(value):
+    """Return value as an int list number, or as an '@' ID string.
+
+    IDs stay strings so parsed arguments can be sent to a daemon as JSON.
+
+    """
+    if value.startswith('@'):
+        positive_int(value[1:])
+        return value
+    return int(value)
+
+
+def positive_int(value):
+    """Return value as an int, raising ValueError if it is not positive."""
+    number = int(value)
+    if number < 1:
+        raise ValueError(value)
+    return number
+
+
+def user_id(value):
+    """Return value as a user ID, raising ValueError if it is not one.
+
+    IDs name the user's folder, so may only hold letters, digits, '_',
+    '-' and '.', and may not start with '.'.
+
+    """
+    if (not value or value.startswith('.')
+            or not value.replace('_', 'a').replace('-', 'a')
+            .replace('.', 'a').isalnum()):
+        raise ValueError(value)
+    return value
+
+
+def since_time(value):
+    """Return an ISO 8601 date or time as a naive local datetime."""
+    return parse_import_time(value, 'since')
+
+
+def until_time(value):
+    """Return an ISO 8601 time, or the end of an ISO 8601 date."""
+    until = parse_import_time(value, 'until')
+    try:
+        datetime.date.fromisoformat(value.strip())
+    except ValueError:
+        return until
+    return until + datetime.timedelta(days=1)
+
+
+def quick_arguments(args):
+    """Parse a lone begin, current, finish or tag command without argparse.
+
+    These are the commands run most often, so they skip importing
+    argparse and building the full parser.
+
+    Args:
+        args (list): List of arguments and associated values to parse.
+
+    Returns:
+        The dictionary parse_arguments would return, or None if args need
+        the full parser (other options, help or errors).
+
+    """
+    if not args or args[0] not in QUICK_OPTIONS:
+        return None
+    option, values = QUICK_OPTIONS[args[0]], args[1:]
+    if any(value.startswith('-') for value in values):
+        return None
+
+    parsed = dict(ARGUMENT_DEFAULTS)
+    if option in ('current', 'finish'):
+        if values:
+            return None
+        parsed[option] = True
+    else:
+        parsed[option] = values
+    return parsed
+
+
+def load_numpy():
+    """Import NumPy on first use and return it, or None if not installed."""
+    global numpy
+    if numpy is UNLOADED:
+        try:
+            import numpy
+        except ImportError:
+            numpy = None
+    return numpy
+
+
+class Vocabulary:
+    """Class interning activity names and tags as integer IDs.
+
+    Each distinct string is stored once and normalised to its title cased
+    form when first seen, so summaries group on integer keys instead of
+    title casing every activity on every run.
+
+        Attributes:
+            strings (list): Canonical copy of each string by ID.
+            ids (dict): ID of each string.
+            title_ids (list): ID of the title cased form of each string.
+
+    """
+
+    def __init__(self):
+        self.strings = []
+        self.ids = {}
+        self.title_ids = []
+
+    def __len__(self):
+        return len(self.strings)
+
+    def add(self, string, title_id=None):
+        """Store a new string and return its ID."""
+        string_id = len(self.strings)
+        self.strings.append(string)
+        self.ids[string] = string_id
+        self.title_ids.append(string_id if title_id is None else title_id)
+        return string_id
+
+    def id(self, string):
+        """Return the ID of string, adding it if it is new."""
+        try:
+            return self.ids[string]
+        except KeyError:
+            pass
+        title = string.title()
+        if title == string:
+            return self.add(string)
+        title_id = self.ids.get(title)
+        if title_id is None:
+            title_id = self.add(title)
+        return self.add(string, self.title_ids[title_id])
+
+    def intern(self, string):
+        """Return the canonical copy of string."""
+        return self.strings[self.id(string)]
+
+    def intern_all(self, strings):
+        """Return a list of the canonical copies of strings."""
+        return [self.strings[self.id(string)] for string in strings]
+
+    def key(self, string):
+        """Return the ID summaries group string under."""
+        return self.title_ids[self.id(string)]
+
+    def decode(self, totals):
+        """Return totals keyed by title ID as totals keyed by title."""
+        return {self.strings[key]: value for key, value in totals.items()}
+
+
+VOCABULARY = Vocabulary()
+
+
 class Activity:
     """Class representing an activity.
 
         Attributes:
             instances (list): Class attribute to track instantiated members.
+            events (list): Class attribute of changes not yet journalled.
 
             name (str): Name of the activity.
             tags (list): List of tags associated with the tag.
             start (datetime): Time activity began (instantiated).
-            start_str (str): String representation of time activity began.
             end (datetime): Time activity finished (end_activity method).
-            end_str (str): String representation of time activity finished.
-            duration (timedelta): Time difference between start and end.
+            id (int): Number given by stores that keep IDs, which never
+                changes or passes to another activity, else None.
+
+        Only the fields above are stored, in slots, so a long history
+        stays small in memory and on disk. start_str, end_str and duration
+        are derived from them when read.
 
     """
+    __slots__ = ('name', 'tags', 'start', 'end', 'id')
     instances = []
+    events = []
 
-    def __init__(self, name):
+    def __init__(self, name, start=None):
         """Initialise member of Activity class.
 
         Args:
             name (str): Name of the activity.
+            start (datetime): Time activity began. Defaults to now.
 
         """
-        self.name = name
+        self.name = VOCABULARY.intern(name)
         self.tags = []
-        self.start = get_current_datetime()
-        self.start_str = self.start.strftime('%H:%M:%S')
+        self.start = start or get_current_datetime()
         self.end = None
-        self.end_str = None
-        self.duration = None
+        self.id = None
 
         Activity.instances.append(self)
 
+    def __getstate__(self):
+        return (self.name, self.tags, self.start, self.end)
+
+    def __setstate__(self, state):
+        """Restore from a slot tuple or a pre-slots instance __dict__.
+
+        The id is not part of the state, as IndexedActivities pickles the
+        IDs of its activities together.
+
+        """
+        if isinstance(state, dict):
+            state = (state['name'], state['tags'], state['start'],
+                     state.get('end'))
+        self.name, self.tags, self.start, self.end = state
+        self.id = None
+
+    @property
+    def start_str(self):
+        return self.start.time().isoformat('seconds')
+
+    @property
+    def end_str(self):
+        return self.end.time().isoformat('seconds') if self.end else None
+
+    @property
+    def duration(self):
+        return self.end - self.start if self.end else None
+
+    @duration.setter
+    def duration(self, value):
+        self.end = None if value is None else self.start + value
+
     def __str__(self):
+        return self.describe()
+
+    def describe(self, now=None):
+        """Return the activity as a line of text.
+
+        Args:
+            now (datetime): Time running activities are timed up to.
+                Defaults to the current time.
+
+        """
         if not self.end:
             return '({} - Tracking)  {:<20} Duration: {:<10} {}'.format(
                 self.start_str, self.name,
-                str_format_timedelta(self.return_current_duration()),
+                str_format_timedelta((now or get_current_datetime())
+                                     - self.start),
                 ", ".join(self.tags)
             )
 
@@ -111,8 +484,6 @@ class Activity:
         print()
         if not self.end:
             self.end = get_current_datetime()
-            self.end_str = self.end.strftime('%H:%M:%S')
-            self.duration = self.end - self.start
             print('Tracking of {} Finished \t Duration: {}'.format(
                 self.name, str_format_timedelta(self.duration)
             ))
@@ -131,27 +502,29 @@ class Activity:
         Args:
             new_value (str): String of a time formatted HH:MM:SS.
             to_edit (str): Indicates which attribute to update.
+
+        Returns:
+            True if the value was updated, False if new_value was invalid.
         """
         try:
             datetime.datetime.strptime(new_value, '%H:%M:%S')
         except ValueError:
             print("New time invalid. Format should be HH:MM:SS")
-            return
+            return False
 
         hours, minutes, seconds = [int(x) for x in new_value.split(':')]
         if to_edit == 'start':
+            old_start = self.start
             self.start = self.start.replace(
                 hour=hours, minute=minutes, second=seconds, microsecond=0
             )
-            self.start_str = new_value
+            reindex_start(self, old_start)
 
         elif to_edit == 'end':
             self.end = self.start.replace(
                 hour=hours, minute=minutes, second=seconds, microsecond=0
             )
-            self.end_str = new_value
-
-        self.duration = self.end - self.start
+        return True
 
 
 def get_current_datetime():
@@ -174,10 +547,52 @@ def str_format_timedelta(timedelta_object):
     return trimmed
 
 
-def pickle_activities():
-    """Write pickled Activity.instances to file."""
-    with open('data.pickle', 'wb') as pickled_file:
-        pickle.dump(Activity.instances, pickled_file)
+def write_atomically(path, write, sync=True):
+    """Write a file through a temporary copy renamed over path.
+
+    Readers see the old file or the complete new one, even if the process
+    dies part way through writing.
+
+    Args:
+        path (str): Path of the file to replace.
+        write (function): Called with the temporary file, opened 'wb'.
+        sync (bool): Whether to flush the new file to disk before the
+            rename. Only needed where losing the file would lose data.
+
+    """
+    temp_path = '{}.{}.tmp'.format(path, os.getpid())
+    try:
+        with open(temp_path, 'wb') as temp_file:
+            write(temp_file)
+            if sync:
+                temp_file.flush()
+                os.fsync(temp_file.fileno())
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+class StoreUnpickler(pickle.Unpickler):
+    """Unpickler finding Trackerian's classes under either module name.
+
+    Data written when trackerian.py runs as a script refers to __main__,
+    and data written by code importing it refers to trackerian. Both are
+    read back as this module's classes so either can read the other's
+    files.
+
+    """
+
+    def find_class(self, module, name):
+        if module in ('__main__', 'trackerian') and name in globals():
+            return globals()[name]
+        return super().find_class(module, name)
+
+
+def load_pickle(pickled_file):
+    """Return the next object unpickled from pickled_file."""
+    return StoreUnpickler(pickled_file).load()
 
 
 def unpickle_activities():
@@ -186,201 +601,2652 @@ def unpickle_activities():
     Returns:
         List of Activity instances.
     """
-    with open('data.pickle', 'rb') as pickled_file:
-        return pickle.load(pickled_file)
+    with open(DATA_FILE, 'rb') as pickled_file:
+        return load_pickle(pickled_file)
 
 
-def calculate_date_range_start(time_period):
-    """Return earliest date that would be within the give time period.
+def record_event(op, activity, value=None):
+    """Queue a change to an activity for the journal.
 
     Args:
-        time_period (str): String indicating the length of the period.
+        op (str): One of 'begin', 'finish', 'tag', 'edit' or 'remove'.
+        activity (Activity, int): The changed Activity or, for 'remove',
+            the index it was removed from.
+        value: New data needed to replay the change.
 
-    Returns:
-        None if time_period is 'all'.
-        datetime object of start of the current day if time_period is 'day'.
+    """
+    if isinstance(activity, int):
+        index = activity
+    elif Activity.instances and Activity.instances[-1] is activity:
+        index = len(Activity.instances) - 1
+    else:
+        index = Activity.instances.index(activity)
+    if not isinstance(activity, int):
+        touch_activity(activity)
+    Activity.events.append((op, index, value))
+
+
+def apply_event(event):
+    """Replay a journalled change onto Activity.instances.
+
+    Args:
+        event (tuple): Tuple of op, index and value as made by record_event.
 
     """
-    if time_period == 'all':
-        return None
+    op, index, value = event
+    if op == 'begin':
+        Activity(*value)
+        return
 
-    today = get_current_datetime()
-    day_start = today.replace(hour=0, minute=0)
+    if op == 'remove':
+        del Activity.instances[index]
+        return
 
-    if time_period == 'day':
-        return day_start
+    activity = Activity.instances[index]
+    if op == 'finish':
+        value = ('end', value)
+    touch_activity(activity)
+    if op == 'tag':
+        activity.tags.extend(VOCABULARY.intern_all(value))
+        return
 
-    return day_start - datetime.timedelta(days=7)
+    to_edit, new_value = value
+    if to_edit == 'name':
+        activity.name = VOCABULARY.intern(new_value)
+    elif to_edit == 'tags':
+        activity.tags = VOCABULARY.intern_all(new_value)
+    else:
+        old_start = activity.start
+        setattr(activity, to_edit, new_value)
+        if to_edit == 'start':
+            reindex_start(activity, old_start)
 
 
-def print_list(date_range_start):
-    """Print enumerated list of tracked activities since date_range_start.
+def touch_activity(activity):
+    """Tell Activity.instances that activity has changed."""
+    touch = getattr(Activity.instances, 'touch', None)
+    if touch:
+        touch(activity)
 
-    Args:
-        date_range_start (Datetime): Datetime object. Defaults to None.
-        Activities with start datetimes earlier than this are enumerated
-        but not printed.
-    """
-    for num, activity in enumerate(Activity.instances):
-        if not date_range_start or activity.start >= date_range_start:
-            print("{:<5} {}".format(num, activity))
-            print()
 
+def reindex_start(activity, old_start):
+    """Tell Activity.instances that the start of activity has changed."""
+    reindex = getattr(Activity.instances, 'reindex', None)
+    if reindex:
+        reindex(activity, old_start)
 
-def print_summary(date_range_start):
-    """Print summary of tracked activities.
 
-    Activities and their total durations are grouped by name and,
-    in a separate display, by their tags.
-    Only activities with datetimes later than date_range_start arg are used.
+class IndexedActivities(list):
+    """Class representing Activity.instances with a start index and rollups.
 
-    Args:
-        date_range_start (Datetime): Datetime object. Defaults to None.
-            Sets the early end of the date range. Activities whose
-            start datetimes are earlier than this will not be used in
-            calculations or displayed.
+    Alongside the list it keeps start times in sorted order with the list
+    position of each, so select and summarise find the first activity in
+    range by binary search instead of checking every activity.
+
+    It also keeps per-day summary rollups of finished activities by title
+    cased name and tag. A change marks the days it touches as dirty and
+    only those days are totalled again, so a summary combines one bucket
+    per day and only re-reads days holding a running activity or the
+    start of the range.
+
+    Both are pickled with the list and kept up to date by append, del,
+    reindex and touch; other list methods rebuild them. Activities moved
+    out of the list by archive_activities are reached through archive.
+
+    Every activity is given the next ID as it is added. IDs are pickled
+    beside the activities as runs of consecutive IDs, which are few
+    unless many activities have been removed, and next_id with them so
+    they are never reused. The hash index from ID to activity is built
+    the first time an ID is looked up, and kept up to date by append and
+    del from then on, so loading the list does not pay for it.
+
+        Attributes:
+            starts (list): Sorted start datetimes.
+            positions (list): List position of the activity at each start.
+            rollups (dict): Tuples of total, name and tag durations and
+                whether it needs re-reading, by date.
+            dirty_days (set): Dates whose rollups are out of date.
+            archive (Archive): Activities archived from the list.
+            next_id (int): ID the next activity added is given.
+            ids (dict): Activity by ID, or None until first used.
 
     """
-    activity_durations = collections.defaultdict(datetime.timedelta)
-    tag_durations = collections.defaultdict(datetime.timedelta)
 
-    total_time = datetime.timedelta()
+    def __init__(self, activities=(), archive=None, next_id=1):
+        super().__init__(activities)
+        self.archive = Archive() if archive is None else archive
+        self.next_id = next_id
+        self.rebuild()
 
-    for activity in Activity.instances:
-        if date_range_start and activity.start <= date_range_start:
-            continue
-        if activity.duration:
-            duration_to_add = activity.duration
+    def rebuild(self):
+        """Rebuild the start index from the list and mark every day dirty.
+
+        Activities without an ID are given one.
+
+        """
+        order = sorted(range(len(self)), key=lambda num: self[num].start)
+        self.starts = [self[num].start for num in order]
+        self.positions = order
+        self.rollups = {}
+        self.dirty_days = {start.date() for start in self.starts}
+        self.number()
+
+    def number(self):
+        """Give activities without an ID the next IDs, in list order."""
+        self.next_id = max([self.next_id] + [activity.id + 1
+                                             for activity in self
+                                             if activity.id is not None])
+        for activity in self:
+            if activity.id is None:
+                activity.id = self.next_id
+                self.next_id += 1
+        self.ids = None
+
+    def append(self, activity):
+        slot = bisect.bisect_right(self.starts, activity.start)
+        self.starts.insert(slot, activity.start)
+        self.positions.insert(slot, len(self))
+        self.dirty_days.add(activity.start.date())
+        activity.id = self.next_id
+        self.next_id += 1
+        if self.ids is not None:
+            self.ids[activity.id] = activity
+        super().append(activity)
+
+    def _rebuilding(method):
+        """Wrap a list method so the index is rebuilt after it runs."""
+        def rebuilding(self, *args, **kwargs):
+            result = method(self, *args, **kwargs)
+            self.rebuild()
+            return result
+        return rebuilding
+
+    insert = _rebuilding(list.insert)
+    extend = _rebuilding(list.extend)
+    __setitem__ = _rebuilding(list.__setitem__)
+    __iadd__ = _rebuilding(list.__iadd__)
+    pop = _rebuilding(list.pop)
+    remove = _rebuilding(list.remove)
+    clear = _rebuilding(list.clear)
+    sort = _rebuilding(list.sort)
+    reverse = _rebuilding(list.reverse)
+    del _rebuilding
+
+    def __reduce__(self):
+        return (self.restore, (list(self), self.starts, self.positions,
+                               self.rollups, self.dirty_days, self.archive,
+                               self.next_id, self.id_runs()))
+
+    @classmethod
+    def restore(cls, activities, starts, positions, rollups=None,
+                dirty_days=None, archive=None, next_id=None, ids=None):
+        """Return an IndexedActivities from pickled values without sorting.
+
+        Lists pickled before activities had IDs are numbered in order.
+
+        """
+        restored = cls.__new__(cls)
+        list.extend(restored, activities)
+        restored.archive = Archive() if archive is None else archive
+        restored.starts = starts
+        restored.positions = positions
+        restored.rollups = rollups or {}
+        if rollups is None:
+            dirty_days = {start.date() for start in starts}
+        restored.dirty_days = dirty_days or set()
+        restored.ids = None
+        if ids is None:
+            restored.next_id = 1
+            restored.number()
+            return restored
+        restored.next_id = next_id
+        ids = itertools.chain.from_iterable(itertools.starmap(range, ids))
+        for activity, activity_id in zip(restored, ids):
+            activity.id = activity_id
+        return restored
+
+    def id_runs(self):
+        """Return the IDs of the list as [first, stop] runs of IDs."""
+        runs = []
+        for activity in self:
+            if runs and runs[-1][1] == activity.id:
+                runs[-1][1] += 1
+            else:
+                runs.append([activity.id, activity.id + 1])
+        return runs
+
+    def __delitem__(self, index):
+        if isinstance(index, slice):
+            super().__delitem__(index)
+            self.rebuild()
+            return
+        index = range(len(self))[index]
+        self.dirty_days.add(self[index].start.date())
+        if self.ids is not None:
+            self.ids.pop(self[index].id, None)
+        super().__delitem__(index)
+        slot = self.positions.index(index)
+        del self.starts[slot]
+        del self.positions[slot]
+        self.positions = [num - 1 if num > index else num
+                          for num in self.positions]
+
+    def find(self, activity_id):
+        """Return the list position of the activity with an ID, or None."""
+        if self.ids is None:
+            self.ids = {activity.id: activity for activity in self}
+        activity = self.ids.get(activity_id)
+        return None if activity is None else self.index(activity)
+
+    def index(self, activity, *args):
+        """Return the list position of activity.
+
+        The activity is found by binary search of the start index, so
+        only activities starting at the same time are compared.
+
+        """
+        if not args:
+            slot = self.slot(activity, activity.start)
+            if slot is not None:
+                return self.positions[slot]
+        return super().index(activity, *args)
+
+    def slot(self, activity, start):
+        """Return activity's slot in the start index under start, or None."""
+        low = bisect.bisect_left(self.starts, start)
+        high = bisect.bisect_right(self.starts, start, low)
+        for slot in range(low, high):
+            if self[self.positions[slot]] is activity:
+                return slot
+        return None
+
+    def touch(self, activity):
+        """Mark the day of activity as needing its rollup totalled again."""
+        self.dirty_days.add(activity.start.date())
+
+    def reindex(self, activity, old_start):
+        """Move activity within the index after its start has changed."""
+        self.dirty_days.add(old_start.date())
+        self.dirty_days.add(activity.start.date())
+        slot = self.slot(activity, old_start)
+        if slot is None:
+            self.rebuild()
+            return
+        num = self.positions[slot]
+        del self.starts[slot]
+        del self.positions[slot]
+        slot = bisect.bisect_right(self.starts, activity.start)
+        self.starts.insert(slot, activity.start)
+        self.positions.insert(slot, num)
+
+    def window(self, date_range_start, date_range_end=None, inclusive=True):
+        """Return list positions of activities within a range of starts.
+
+        Args:
+            date_range_start (Datetime): Datetime object or None for all.
+            date_range_end (Datetime): Activities starting at or after
+                this are left out. Defaults to None for no end.
+            inclusive (bool): Whether to include activities starting at
+                exactly date_range_start.
+
+        Returns:
+            Sorted list of positions.
+
+        """
+        if not date_range_start:
+            first = 0
+        elif inclusive:
+            first = bisect.bisect_left(self.starts, date_range_start)
         else:
-            duration_to_add = activity.return_current_duration()
+            first = bisect.bisect_right(self.starts, date_range_start)
+        last = len(self.starts)
+        if date_range_end:
+            last = bisect.bisect_left(self.starts, date_range_end, first)
+        if first == 0 and last == len(self.starts):
+            return range(len(self))
+        return sorted(self.positions[first:last])
 
-        total_time += duration_to_add
-        activity_durations[activity.name.title()] += duration_to_add
+    def select(self, date_range_start, date_range_end=None):
+        """Yield (number, Activity) for activities in the date range.
 
-        for tag in activity.tags:
-            tag_durations[tag.title()] += duration_to_add
+        Archived activities in range come first.
 
-    print('Activities Tracked: {} | Total Time Tracked: {}'.format(
-        len(Activity.instances), str_format_timedelta(total_time)
-    ))
-    print()
+        """
+        yield from self.archive.select(date_range_start, date_range_end)
+        for num in self.window(date_range_start, date_range_end):
+            yield num, self[num]
 
-    sort = sorted(activity_durations.items(), key=lambda x: x[1], reverse=True)
-    for activity, duration in sort:
-        print("{:<20} {:<15} {}".format(
-            activity, str_format_timedelta(duration),
-            percentage_of_timedelta(total_time, duration)
-        ))
+    def span(self, date_range_start, date_range_end=None):
+        """Return the list positions from the first to last in range."""
+        positions = self.window(date_range_start, date_range_end)
+        if not positions:
+            return range(0)
+        return range(positions[0], positions[-1] + 1)
 
-    print('', end='\n\n')
+    def day_activities(self, day, date_range_start=None,
+                       date_range_end=None):
+        """Return the activities that started on day, in list order.
 
-    print("Tags Tracked:", end='\n\n')
+        Args:
+            day (date): The day to return activities for.
+            date_range_start (Datetime): If given, only activities
+                starting at or after this are returned.
+            date_range_end (Datetime): If given, only activities
+                starting before this are returned.
 
-    sort = sorted(tag_durations.items(), key=lambda x: x[1], reverse=True)
-    for tag, duration in sort:
-        print("{:<20} {:<15} {}".format(
-            tag, str_format_timedelta(duration),
-            percentage_of_timedelta(total_time, duration)
-        ))
+        """
+        day_start = datetime.datetime.combine(day, datetime.time())
+        day_end = day_start + datetime.timedelta(days=1)
+        positions = self.window(
+            max(date_range_start or day_start, day_start),
+            min(date_range_end or day_end, day_end)
+        )
+        return [self[num] for num in positions]
+
+    def refresh_rollups(self):
+        """Total the finished activities of every dirty day."""
+        for day in self.dirty_days:
+            activities = self.day_activities(day)
+            if not activities:
+                self.rollups.pop(day, None)
+                continue
+            finished = [activity for activity in activities
+                        if activity.end is not None]
+            self.rollups[day] = sum_durations(finished, None) + (
+                len(finished) != len(activities),
+            )
+        self.dirty_days = set()
 
+    def summarise(self, date_range_start, date_range_end=None):
+        """Return summary totals for activities in the date range.
 
-def percentage_of_timedelta(total, duration):
-    """Return percentage duration timedelta is of total timedelta."""
-    proportion = duration.total_seconds() / total.total_seconds()
-    return '{:.2%}'.format(proportion)
+        Finished days are combined from their rollups. The first and last
+        days of the range and days with an activity still running are
+        totalled from their activities. Archived activities are added
+        first.
 
+        """
+        self.refresh_rollups()
 
-def edit_activity(activity_to_edit, info_to_edit, new_value):
-    """Edit Activity information.
+        total_time, archived_names, archived_tags = self.archive.summarise(
+            date_range_start, date_range_end
+        )
+        activity_durations = collections.defaultdict(datetime.timedelta,
+                                                     archived_names)
+        tag_durations = collections.defaultdict(datetime.timedelta,
+                                                archived_tags)
+
+        first_day = last_day = None
+        exact = []
+        if date_range_start:
+            first_day = date_range_start.date()
+            exact.extend(self.day_activities(first_day, date_range_start,
+                                             date_range_end))
+        if date_range_end:
+            last_day = date_range_end.date()
+
+        for day in sorted(self.rollups):
+            if first_day and day <= first_day:
+                continue
+            if last_day and day >= last_day:
+                break
+            day_total, day_names, day_tags, needs_reading = self.rollups[day]
+            if needs_reading:
+                exact.extend(self.day_activities(day))
+                continue
+            total_time += day_total
+            for name, duration in day_names.items():
+                activity_durations[name] += duration
+            for tag, duration in day_tags.items():
+                tag_durations[tag] += duration
+
+        if last_day and (not first_day or last_day > first_day):
+            exact.extend(self.day_activities(last_day, None, date_range_end))
+
+        day_total, day_names, day_tags = sum_durations(exact, None)
+        total_time += day_total
+        for name, duration in day_names.items():
+            activity_durations[name] += duration
+        for tag, duration in day_tags.items():
+            tag_durations[tag] += duration
+
+        return total_time, activity_durations, tag_durations
+
+
+class Archive:
+    """Class representing activities moved into compressed archive files.
+
+    Each archive_activities call writes one gzip compressed pickle of rows
+    to a folder beside the snapshot. The files are read-only and never
+    change once written. The snapshot keeps the list of files, with the
+    range of starts each holds, and per-day rollups of their totals, so
+    summaries of whole days never open them and lists only read the
+    files reaching their range.
 
-    Args:
-        activity_to_edit (class member): The Activity to edit
-        info_to_edit (str): String representing which variable to edit
-        new_value (list): List containing the new value(s) for the variable
+        Attributes:
+            directory (str): Folder holding the archive files.
+            files (list): Dictionaries of the file name, number of rows
+                and first and last start of each file, oldest first.
+            rollups (dict): Tuples of total, name and tag durations by
+                date.
+            cache (dict): Rows of each file read so far by file name.
 
     """
-    if info_to_edit.lower() in ('name', 'n'):
-        activity_to_edit.name = new_value[0].title()
 
-    elif info_to_edit.lower() in ('tag', 't'):
-        activity_to_edit.tags = new_value
+    def __init__(self, directory=None):
+        self.directory = directory or ARCHIVE_DIR
+        self.files = []
+        self.rollups = {}
+        self.cache = {}
 
-    elif info_to_edit.lower() in ('end', 'e'):
-        activity_to_edit.update_datetime('end', new_value[0])
+    def __getstate__(self):
+        return self.files, self.rollups
 
-    elif info_to_edit.lower() in ('start', 's'):
-        activity_to_edit.update_datetime('start', new_value[0])
+    def __setstate__(self, state):
+        self.files, self.rollups = state
+        self.directory = ARCHIVE_DIR
+        self.cache = {}
 
-    else:
-        print("Information category {} not recognised. Choose from: "
-              "'name', 'tag', 'end' or 'start'.".format(info_to_edit))
+    def __len__(self):
+        return sum(info['count'] for info in self.files)
 
+    def read(self, info):
+        """Return the list of row tuples held in an archive file."""
+        if info['file'] not in self.cache:
+            import gzip
+            path = os.path.join(self.directory, info['file'])
+            with gzip.open(path, 'rb') as archive_file:
+                self.cache[info['file']] = load_pickle(archive_file)
+        return self.cache[info['file']]
 
-def main():
-    """Coordinate creation and time tracking of activities."""
-    args = parse_arguments(sys.argv[1:])
+    def rows(self, date_range_start, date_range_end=None):
+        """Yield (number, row tuple) for archived rows in the date range.
 
-    print()
+        Only files holding starts within the range are read.
 
-    if args['begin']:
-        if Activity.instances and not Activity.instances[-1].end:
-            Activity.instances[-1].end_activity()
-        Activity(' '.join(args['begin']))
-        print(Activity.instances[-1])
+        """
+        low, high = micros_range(date_range_start, date_range_end)
+        offset = 0
+        for info in self.files:
+            if info['last'] >= low and info['first'] < high:
+                for number, row in enumerate(self.read(info), offset):
+                    if low <= row[0] < high:
+                        yield number, row
+            offset += info['count']
 
-    elif args['list']:
-        print_list(calculate_date_range_start(args['list']))
+    def select(self, date_range_start, date_range_end=None):
+        """Yield (number, Activity) for archived activities in the range.
 
-    elif args['summary']:
-        print_summary(calculate_date_range_start(args['summary']))
+        Numbers start with A as archived activities cannot be edited or
+        removed.
 
-    # Args below IndexError if there are no Activity instances so catch here
-    try:
-        Activity.instances[-1]
-    except IndexError:
-        print("No activities have been tracked")
-        return
+        """
+        for number, row in self.rows(date_range_start, date_range_end):
+            yield 'A{}'.format(number), row_activity(*row)
 
-    if args['tag']:
-        Activity.instances[-1].tags.extend(args['tag'])
+    def summarise(self, date_range_start, date_range_end=None):
+        """Return summary totals of archived activities in the date range.
 
-    elif args['current']:
-        if Activity.instances[-1].end:
-            print("Currently Not Tracking an Activity")
-        else:
-            print(Activity.instances[-1])
+        Days wholly within the range are combined from their rollups. Only
+        a day the range starts or ends part way through is totalled from
+        its rows.
 
-    elif args['finish']:
-        Activity.instances[-1].end_activity()
+        """
+        summaries = []
+        for day in sorted(self.rollups):
+            day_start = datetime.datetime.combine(day, datetime.time())
+            day_end = day_start + datetime.timedelta(days=1)
+            if ((date_range_start and day_end <= date_range_start)
+                    or (date_range_end and day_start >= date_range_end)):
+                continue
+            if ((date_range_start and day_start < date_range_start)
+                    or (date_range_end and day_end > date_range_end)):
+                rows = self.rows(max(day_start, date_range_start or day_start),
+                                 min(day_end, date_range_end or day_end))
+                summaries.append(sum_row_durations(
+                    (row for _, row in rows), None
+                ))
+            else:
+                summaries.append(self.rollups[day])
+        return merge_summaries(summaries)
+
+    def add(self, rows):
+        """Write rows to a new archive file and add them to the rollups.
 
-    elif args['remove'] is not None:
-        try:
-            del Activity.instances[args['remove']]
-        except IndexError:
-            print("There is no activity at index {}.".format(args['remove']))
+        Args:
+            rows (list): (start, end, name, tags) tuples of finished
+                activities.
 
-    elif args['edit']:
-        try:
-            activity_to_edit = Activity.instances[int(args['edit'][0])]
-        except ValueError:
-            print("{} is not a valid integer.".format(args['edit'][0]))
-            return
-        except IndexError:
-            print("There is no activity at index {}.".format(args['edit'][0]))
-            return
+        """
+        import gzip
 
-        edit_activity(activity_to_edit, args['edit'][1], args['edit'][2:])
+        def write(archive_file):
+            with gzip.GzipFile(fileobj=archive_file, mode='wb') as gzipped:
+                pickle.dump(rows, gzipped)
 
-    print()
+        os.makedirs(self.directory, exist_ok=True)
+        file_name = os.urandom(16).hex() + '.pickle.gz'
+        path = os.path.join(self.directory, file_name)
+        write_atomically(path, write)
+        os.chmod(path, 0o444)
 
+        days = collections.defaultdict(list)
+        for row in rows:
+            days[micros_to_datetime(row[0]).date()].append(row)
+        for day, day_rows in days.items():
+            summary = sum_row_durations(day_rows, None)
+            if day in self.rollups:
+                summary = merge_summaries([self.rollups[day], summary])
+            self.rollups[day] = summary
 
-if __name__ == '__main__':
-    # Load data from data.pickle or create it if missing
-    try:
-        Activity.instances = unpickle_activities()
-    except FileNotFoundError:
-        with open('data.pickle', 'w') as file_creator:
-            pass
+        starts = [row[0] for row in rows]
+        self.files.append({'file': file_name, 'count': len(rows),
+                           'first': min(starts), 'last': max(starts)})
+        self.cache[file_name] = rows
+
+
+class TailActivities(collections.abc.Sequence):
+    """Class representing only the latest of Activity.instances.
+
+    Stands in for the full history for commands that only read or change
+    the latest activity.
+
+        Attributes:
+            length (int): Number of activities in the full history.
+            last (Activity): The latest activity or None if there are none.
+
+    """
+
+    def __init__(self, length, last):
+        self.length = length
+        self.last = last
+
+    def __len__(self):
+        return self.length
+
+    def __getitem__(self, index):
+        if self.length and index in (-1, self.length - 1):
+            return self.last
+        raise IndexError("only the latest activity is loaded")
 
-    main()
-    pickle_activities()
+
+class Journal:
+    """Class representing a snapshot file plus an append-only event log.
+
+    Commands append one record per change to the journal instead of
+    rewriting the whole history. Once the journal holds
+    CHECKPOINT_INTERVAL records it is folded into a fresh snapshot so
+    replay time stays bounded.
+
+    A small head file beside the journal holds the latest activity, the
+    number of activities and the journal size it was written for. While
+    that size matches the journal, load_tail can answer commands that only
+    touch the latest activity without reading the snapshot or replaying
+    the journal.
+
+        Attributes:
+            data_file (str): Path of the pickled snapshot.
+            journal_file (str): Path of the event journal.
+            head_file (str): Path of the latest activity record.
+            archive_dir (str): Folder of the snapshot's archive files.
+            token (str): Identifies the snapshot the journal applies to.
+            length (int): Number of events currently in the journal.
+            tail (bool): Whether only the head was loaded.
+
+    """
+
+    def __init__(self, data_file=None, journal_file=None):
+        self.data_file = data_file or DATA_FILE
+        self.journal_file = journal_file or JOURNAL_FILE
+        self.head_file = os.path.splitext(self.journal_file)[0] + '.head'
+        self.archive_dir = os.path.splitext(self.data_file)[0] + '.archive'
+        self.token = None
+        self.length = 0
+        self.current = False
+        self.tail = False
+        self.head_stale = True
+
+    def read_snapshot(self):
+        """Return the snapshot's activities and token."""
+        with open(self.data_file, 'rb') as pickled_file:
+            activities = load_pickle(pickled_file)
+            if not isinstance(activities, IndexedActivities):
+                activities = IndexedActivities(activities)
+            activities.archive.directory = self.archive_dir
+            try:
+                return activities, load_pickle(pickled_file)
+            except EOFError:
+                return activities, None
+
+    def write_snapshot(self):
+        """Write Activity.instances and the current token to the snapshot."""
+        def write(pickled_file):
+            pickle.dump(Activity.instances, pickled_file)
+            pickle.dump(self.token, pickled_file)
+
+        write_atomically(self.data_file, write)
+
+    def load(self):
+        """Load the snapshot into Activity.instances and replay the journal.
+
+        A missing snapshot is created empty. A journal written against an
+        older snapshot (a checkpoint interrupted before the journal was
+        reset) is ignored, and a torn final record is truncated away.
+
+        """
+        Activity.events = []
+        self.length = 0
+        self.current = False
+        self.tail = False
+        self.head_stale = self.read_head() is None
+        try:
+            Activity.instances, self.token = self.read_snapshot()
+        except FileNotFoundError:
+            Activity.instances = IndexedActivities(
+                archive=Archive(self.archive_dir)
+            )
+            self.checkpoint()
+            return
+
+        try:
+            journal = open(self.journal_file, 'r+b')
+        except FileNotFoundError:
+            return
+
+        with journal:
+            try:
+                _, _, token = load_pickle(journal)
+            except (EOFError, pickle.UnpicklingError):
+                return
+            if token != self.token:
+                return
+
+            self.current = True
+            good_offset = journal.tell()
+            while True:
+                try:
+                    event = load_pickle(journal)
+                except (EOFError, pickle.UnpicklingError):
+                    break
+                apply_event(event)
+                self.length += 1
+                good_offset = journal.tell()
+
+            if os.fstat(journal.fileno()).st_size != good_offset:
+                journal.truncate(good_offset)
+                self.head_stale = True
+
+    def read_head(self):
+        """Return the head record if it matches the journal, else None.
+
+        Returns:
+            Tuple of the journal length in events, the number of
+            activities and the latest Activity (None if there are none).
+
+        """
+        try:
+            with open(self.head_file, 'rb') as head:
+                size, length, count, last = load_pickle(head)
+            if size != os.path.getsize(self.journal_file):
+                return None
+        except (OSError, EOFError, pickle.UnpicklingError, ValueError):
+            return None
+        return length, count, last
+
+    def write_head(self):
+        """Record the latest activity against the journal's current size."""
+        last = Activity.instances[-1] if Activity.instances else None
+        record = (os.path.getsize(self.journal_file), self.length,
+                  len(Activity.instances), last)
+        write_atomically(self.head_file,
+                         lambda head: pickle.dump(record, head), sync=False)
+        self.head_stale = False
+
+    def load_tail(self):
+        """Load only the latest activity from the head record.
+
+        Returns:
+            True if the head was current and Activity.instances now holds
+            a TailActivities, False if a full load is needed.
+
+        """
+        head = self.read_head()
+        if head is None:
+            return False
+        self.length, count, last = head
+        Activity.instances = TailActivities(count, last)
+        Activity.events = []
+        self.current = True
+        self.tail = True
+        self.head_stale = False
+        return True
+
+    def commit(self):
+        """Write Activity.events to the journal, checkpointing when full."""
+        if not Activity.events and (self.tail
+                                    or self.length < CHECKPOINT_INTERVAL):
+            if self.head_stale and self.current:
+                self.write_head()
+            return
+
+        if self.length + len(Activity.events) >= CHECKPOINT_INTERVAL:
+            if self.tail:
+                events = Activity.events
+                self.load()
+                for event in events:
+                    apply_event(event)
+                Activity.events = events
+            self.checkpoint()
+            return
+
+        self.append()
+
+    def version(self):
+        """Return a value that changes whenever the store is written."""
+        return file_version(self.data_file, self.journal_file)
+
+    def append(self):
+        """Write Activity.events to the journal without checkpointing."""
+        if not Activity.events:
+            return
+
+        mode = 'ab' if self.current else 'wb'
+        with open(self.journal_file, mode) as journal:
+            if not self.current:
+                pickle.dump(('checkpoint', None, self.token), journal)
+            for event in Activity.events:
+                pickle.dump(event, journal)
+
+        self.current = True
+        self.length += len(Activity.events)
+        Activity.events = []
+        self.write_head()
+
+    def checkpoint(self):
+        """Write Activity.instances to a new snapshot and reset the journal."""
+        # A head left from the old journal must not outlive a half-finished
+        # checkpoint so remove it before anything else changes
+        try:
+            os.remove(self.head_file)
+        except FileNotFoundError:
+            pass
+
+        self.token = os.urandom(16).hex()
+        self.write_snapshot()
+
+        with open(self.journal_file, 'wb') as journal:
+            pickle.dump(('checkpoint', None, self.token), journal)
+
+        self.current = True
+        self.length = 0
+        Activity.events = []
+        self.write_head()
+
+
+def file_version(*paths):
+    """Return a tuple that changes whenever any of paths is written.
+
+    Each file contributes its inode, modification time and size, or None
+    if it does not exist.
+
+    """
+    version = []
+    for path in paths:
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            version.append(None)
+        else:
+            version.append((stat.st_ino, stat.st_mtime_ns, stat.st_size))
+    return tuple(version)
+
+
+def datetime_to_micros(datetime_object):
+    """Return datetime_object as integer microseconds since EPOCH."""
+    return (datetime_object - EPOCH) // MICROSECOND
+
+
+def micros_to_datetime(micros):
+    """Return datetime for integer microseconds since EPOCH."""
+    return EPOCH + datetime.timedelta(microseconds=micros)
+
+
+def micros_range(date_range_start, date_range_end=None):
+    """Return (low, high) microseconds so low <= start < high is in range.
+
+    Args:
+        date_range_start (Datetime): Datetime object or None for no start.
+        date_range_end (Datetime): Datetime object or None for no end.
+
+    """
+    low = datetime_to_micros(date_range_start) if date_range_start else NO_END
+    high = (datetime_to_micros(date_range_end) if date_range_end
+            else 2 ** 63 - 1)
+    return low, high
+
+
+def in_date_range(start, date_range_start, date_range_end=None):
+    """Return whether a start datetime is within the date range."""
+    return ((not date_range_start or start >= date_range_start)
+            and (not date_range_end or start < date_range_end))
+
+
+def activity_row(activity):
+    """Return activity as a (start, end, name, tags) column row."""
+    end = datetime_to_micros(activity.end) if activity.end else NO_END
+    return (datetime_to_micros(activity.start), end,
+            activity.name, tuple(activity.tags))
+
+
+def row_activity(start, end, name, tags):
+    """Return a new Activity, not added to instances, from a column row."""
+    activity = Activity.__new__(Activity)
+    activity.name = VOCABULARY.intern(name)
+    activity.tags = VOCABULARY.intern_all(tags)
+    activity.start = micros_to_datetime(start)
+    activity.end = None if end == NO_END else micros_to_datetime(end)
+    activity.id = None
+    return activity
+
+
+def sum_row_durations(rows, date_range_start, date_range_end=None):
+    """Return total, per name and per tag durations of column rows.
+
+    Args:
+        rows (iterable): (start, end, name, tags) tuples as made by
+            activity_row.
+        date_range_start (Datetime): Datetime object or None for all.
+        date_range_end (Datetime): Datetime object or None for no end.
+
+    """
+    low, high = micros_range(date_range_start, date_range_end)
+    now = datetime_to_micros(get_current_datetime())
+
+    name_micros = collections.defaultdict(int)
+    tag_micros = collections.defaultdict(int)
+    key = VOCABULARY.key
+    total = 0
+    for start, end, name, tags in rows:
+        if not low <= start < high:
+            continue
+        duration = (now if end == NO_END else end) - start
+        total += duration
+        name_micros[key(name)] += duration
+        for tag in tags:
+            tag_micros[key(tag)] += duration
+
+    def to_timedelta(micros):
+        return datetime.timedelta(microseconds=micros)
+
+    return (
+        to_timedelta(total),
+        {name: to_timedelta(micros) for name, micros in
+         VOCABULARY.decode(name_micros).items()},
+        {tag: to_timedelta(micros) for tag, micros in
+         VOCABULARY.decode(tag_micros).items()},
+    )
+
+
+STORES = {
+    'pickle': 'Journal',
+    'columns': 'ColumnJournal',
+    'sqlite': 'SQLiteStore',
+    'segments': 'SegmentStore',
+}
+
+
+def __getattr__(name):
+    """Return a name from the module in MODULE_NAMES, importing it.
+
+    Called for names not defined here, so trackerian.SQLiteStore and the
+    like work as they did before those moved out of this module.
+
+    """
+    if name not in MODULE_NAMES:
+        raise AttributeError("module 'trackerian' has no attribute "
+                             "{!r}".format(name))
+    import importlib
+    return getattr(importlib.import_module(MODULE_NAMES[name]), name)
+
+
+def store_name():
+    """Return the key of STORES chosen by the TRACKERIAN_STORE variable."""
+    return os.environ.get('TRACKERIAN_STORE', 'pickle')
+
+
+def user_directory(user):
+    """Return the folder holding a user's data files, '' for no user."""
+    if user is None:
+        return ''
+    return os.path.join(USERS_DIR, user)
+
+
+def list_users():
+    """Return the sorted IDs of users with a folder in USERS_DIR."""
+    try:
+        entries = os.listdir(USERS_DIR)
+    except FileNotFoundError:
+        return []
+    return sorted(entry for entry in entries
+                  if os.path.isdir(os.path.join(USERS_DIR, entry)))
+
+
+def store_at(name, directory=''):
+    """Return an unloaded store of the named kind with files in directory.
+
+    Args:
+        name (str): Key of STORES.
+        directory (str): Folder of the data files. Defaults to the cwd.
+
+    """
+    class_name = STORES[name]
+    store = (globals().get(class_name) or __getattr__(class_name))()
+    if not directory:
+        return store
+    if isinstance(store, Journal):
+        return type(store)(os.path.join(directory, store.data_file),
+                           os.path.join(directory, store.journal_file))
+    return type(store)(os.path.join(directory, store.data_file))
+
+
+def open_store(name, tail=False, directory=''):
+    """Return a loaded Journal or SQLiteStore for the named store.
+
+    A store that has no snapshot yet is seeded from the pickle store so
+    switching stores keeps existing history.
+
+    Args:
+        name (str): Key of STORES.
+        tail (bool): Load only the latest activity if the store can.
+        directory (str): Folder of the data files. Defaults to the cwd.
+
+    """
+    journal = store_at(name, directory)
+    data_file = os.path.join(directory, DATA_FILE)
+    if (name != 'pickle' and not os.path.exists(journal.data_file)
+            and os.path.exists(data_file)):
+        Journal(data_file, os.path.join(directory, JOURNAL_FILE)).load()
+        journal.checkpoint()
+    if tail and getattr(journal, 'load_tail', None) and journal.load_tail():
+        return journal
+    journal.load()
+    return journal
+
+
+def implied_arguments(args):
+    """Return args with the command implied by --since or --until alone.
+
+    On their own they list every activity in their range.
+
+    """
+    if ((args['since'] or args['until'])
+            and not (args['list'] or args['summary'] or args['histogram']
+                     or args['team'] or args['export'])):
+        return dict(args, list='all')
+    return args
+
+
+def result_key(args):
+    """Return the ResultCache key of a list or summary command, or None.
+
+    Only commands that print a list or summary and nothing else have
+    their results cached.
+
+    """
+    args = implied_arguments(args)
+    if (args['begin'] or args['current'] or args['finish'] or args['tag']
+            or args['histogram'] or args['edit'] or args['import_file']
+            or args['export'] or args['archive_before'] or args['team']
+            or args['remove'] is not None):
+        return None
+    if args['list']:
+        start, end = calculate_date_range(args['list'], args['since'],
+                                          args['until'])
+        return ('list', start, end, args['limit'], args['offset'],
+                args['newest_first'])
+    if args['summary']:
+        start, end = calculate_date_range(args['summary'], args['since'],
+                                          args['until'])
+        return ('summary', start, end)
+    return None
+
+
+def load_uncached(store, key):
+    """Load store in full if only its tail is loaded and key is not cached.
+
+    Lists and summaries found in RESULTS are run with only the tail
+    loaded, but a range can move on, at midnight, before the command
+    runs.
+
+    """
+    if (isinstance(Activity.instances, TailActivities)
+            and RESULTS.get(key) is None):
+        store.load()
+
+
+def tail_only(args):
+    """Return whether args only read or change the latest activity."""
+    return bool(args['current'] or args['finish'] or args['tag']) and not (
+        args['begin'] or args['list'] or args['summary'] or args['histogram']
+        or args['since'] or args['until'] or args['remove'] is not None
+        or args['edit']
+        or args['import_file'] or args['export'] or args['archive_before']
+        or args['team']
+    )
+
+
+def calculate_date_range_start(time_period):
+    """Return earliest date that would be within the give time period.
+
+    Args:
+        time_period (str): String indicating the length of the period.
+
+    Returns:
+        None if time_period is 'all'.
+        datetime object of start of the current day if time_period is 'day'.
+
+    """
+    return calculate_date_range(time_period)[0]
+
+
+def calculate_date_range(time_period, since=None, until=None):
+    """Return the start and end of a time period.
+
+    Activities in the range start at or after its start and before its
+    end. 'week' is the last seven days and today, 'last-week' the Monday
+    to Sunday before this one, and 'month' and 'year' run from the start
+    of the current month and year.
+
+    Args:
+        time_period (str): One of TIME_PERIODS.
+        since (Datetime): Replaces the start of the period if given.
+        until (Datetime): Replaces the end of the period if given.
+
+    Returns:
+        Tuple of start and end datetime objects, either of which is None
+        if the range is open at that side.
+
+    """
+    start = end = None
+    if time_period != 'all':
+        day_start = get_current_datetime().replace(hour=0, minute=0, second=0,
+                                                   microsecond=0)
+        if time_period == 'day':
+            start = day_start
+        elif time_period == 'last-week':
+            end = day_start - datetime.timedelta(days=day_start.weekday())
+            start = end - datetime.timedelta(days=7)
+        elif time_period == 'month':
+            start = day_start.replace(day=1)
+        elif time_period == 'year':
+            start = day_start.replace(month=1, day=1)
+        else:
+            start = day_start - datetime.timedelta(days=7)
+    return since or start, until or end
+
+
+def print_list(date_range_start, limit=None, offset=0, newest_first=False,
+               pager=False, date_range_end=None):
+    """Print enumerated list of tracked activities since date_range_start.
+
+    Args:
+        date_range_start (Datetime): Datetime object. Defaults to None.
+        Activities with start datetimes earlier than this are enumerated
+        but not printed.
+        limit (int): Most activities to print. Defaults to None for all.
+        offset (int): Number of matching activities to skip first.
+        newest_first (bool): Print the latest activities first.
+        pager (bool): Send the list through a pager if printing to a
+            terminal.
+        date_range_end (Datetime): Activities starting at or after this
+            are not printed. Defaults to None for no end.
+    """
+    process = open_pager() if pager else None
+    output = process.stdin if process else sys.stdout
+    chunks = render_list(date_range_start, limit, offset, newest_first,
+                         date_range_end)
+    try:
+        while True:
+            with PROFILE.phase('compute'):
+                chunk = next(chunks, None)
+            if chunk is None:
+                break
+            with PROFILE.phase('render'):
+                output.write(chunk)
+    except BrokenPipeError:
+        pass
+    finally:
+        if process:
+            try:
+                process.stdin.close()
+            except BrokenPipeError:
+                pass
+            process.wait()
+
+
+def render_list(date_range_start, limit=None, offset=0, newest_first=False,
+                date_range_end=None):
+    """Yield the text of print_list in chunks of LIST_CHUNK_ROWS rows.
+
+    Rows are only formatted once they are within the requested page, and
+    running activities are all timed against the same moment. Lists of
+    up to CACHE_LIST_ROWS rows are kept in RESULTS with their running
+    activities and the number columns printed for them, which are the
+    only rows formatted again on later use. Only the latest activity may
+    be loaded then, so whether IDs are shown is taken from the cache.
+
+    """
+    key = ('list', date_range_start, date_range_end, limit, offset,
+           newest_first)
+    now = get_current_datetime()
+    cached = RESULTS.get(key)
+    if cached is not None:
+        rows, running = cached
+        rows = list(rows)
+        for index, number, activity in running:
+            rows[index] = list_row(number, activity, now)
+        for first in range(0, len(rows), LIST_CHUNK_ROWS):
+            yield ''.join(rows[first:first + LIST_CHUNK_ROWS])
+        return
+
+    stop = None if limit is None else offset + limit
+    selected = itertools.islice(
+        select_activities(date_range_start, newest_first, date_range_end),
+        offset, stop
+    )
+    ids = hasattr(Activity.instances, 'find')
+    rendered, running = [], []
+    while True:
+        rows = []
+        for num, activity in itertools.islice(selected, LIST_CHUNK_ROWS):
+            number = list_number(num, activity, ids)
+            if not activity.end:
+                running.append((len(rendered) + len(rows), number,
+                                activity))
+            rows.append(list_row(number, activity, now))
+        if not rows:
+            break
+        if rendered is not None:
+            rendered.extend(rows)
+            if len(rendered) > CACHE_LIST_ROWS:
+                rendered = None
+        yield ''.join(rows)
+    if rendered is not None:
+        RESULTS.put(key, (rendered, running))
+
+
+def list_number(num, activity, ids=False):
+    """Return the number column print_list shows for an activity.
+
+    Args:
+        num (int, str): The activity's number in the list.
+        activity (Activity): The activity.
+        ids (bool): Whether to show the activity's ID after its number.
+
+    """
+    if ids:
+        return '{:<5} {:<7}'.format(
+            num, '' if activity.id is None else '@{}'.format(activity.id)
+        )
+    return '{:<5}'.format(num)
+
+
+def list_row(number, activity, now):
+    """Return the text print_list shows for an activity.
+
+    Args:
+        number (str): Number column as made by list_number.
+        activity (Activity): The activity.
+        now (datetime): Time running activities are timed up to.
+
+    """
+    return "{} {}\n\n".format(number, activity.describe(now))
+
+
+def open_pager():
+    """Start $PAGER (less by default) reading from a pipe.
+
+    Returns:
+        The pager process, or None if output is not a terminal or the
+        pager could not be started.
+
+    """
+    if not sys.stdout.isatty():
+        return None
+    import shlex
+    import subprocess
+
+    command = shlex.split(os.environ.get('PAGER') or 'less -FRX')
+    try:
+        return subprocess.Popen(command, stdin=subprocess.PIPE,
+                                universal_newlines=True)
+    except OSError:
+        return None
+
+
+def select_activities(date_range_start, newest_first=False,
+                      date_range_end=None):
+    """Yield (number, Activity) for activities in the date range.
+
+    Args:
+        date_range_start (Datetime): Datetime object or None for all.
+        newest_first (bool): Yield from the end of the list backwards.
+        date_range_end (Datetime): Datetime object or None for no end.
+
+    """
+    window = getattr(Activity.instances, 'window', None)
+    if newest_first and window:
+        for num in reversed(window(date_range_start, date_range_end)):
+            yield num, Activity.instances[num]
+        yield from reversed(list(Activity.instances.archive.select(
+            date_range_start, date_range_end
+        )))
+        return
+
+    select = getattr(Activity.instances, 'select', None)
+    if select:
+        selected = select(date_range_start, date_range_end)
+        yield from reversed(list(selected)) if newest_first else selected
+        return
+    if newest_first:
+        numbers = range(len(Activity.instances) - 1, -1, -1)
+    else:
+        numbers = range(len(Activity.instances))
+
+    for num in numbers:
+        activity = Activity.instances[num]
+        if in_date_range(activity.start, date_range_start, date_range_end):
+            yield num, activity
+
+
+def print_summary(date_range_start, engine='python', date_range_end=None,
+                  workers=None):
+    """Print summary of tracked activities.
+
+    Activities and their total durations are grouped by name and,
+    in a separate display, by their tags.
+    Only activities starting from date_range_start until date_range_end
+    are used.
+
+    Args:
+        date_range_start (Datetime): Datetime object. Defaults to None.
+            Sets the early end of the date range. Activities whose
+            start datetimes are earlier than this will not be used in
+            calculations or displayed.
+        engine (str): 'python', 'numpy' to total with NumPy arrays or
+            'parallel' to total parts of the history in worker processes.
+        date_range_end (Datetime): Datetime object or None for no end.
+            Activities starting at or after this are not used.
+        workers (int): Worker processes for the parallel engine. Defaults
+            to one per CPU.
+
+    """
+    engine = usable_engine(engine)
+    key = ('summary', date_range_start, date_range_end)
+    with PROFILE.phase('compute'):
+        cached = RESULTS.get(key)
+        if cached is not None:
+            count, summary = refresh_summary(*cached)
+        else:
+            count, summary = compute_summary(date_range_start, engine,
+                                             date_range_end, workers)
+            RESULTS.put(key, summary_entry(count, summary, date_range_start,
+                                           date_range_end))
+
+    with PROFILE.phase('render'):
+        render_summary(count, summary)
+
+
+def usable_engine(engine):
+    """Return engine, or 'python' with a message if it cannot run here."""
+    if engine == 'numpy' and load_numpy() is None:
+        print("NumPy is not installed so the python engine will be used.")
+        print()
+        return 'python'
+    if engine == 'parallel' and not can_fork():
+        print("Worker processes cannot be forked here so the python engine "
+              "will be used.")
+        print()
+        return 'python'
+    return engine
+
+
+def render_summary(count, summary):
+    """Print the number of activities and summary totals by name and tag."""
+    total_time, activity_durations, tag_durations = summary
+    print('Activities Tracked: {} | Total Time Tracked: {}'.format(
+        count, str_format_timedelta(total_time)
+    ))
+    print()
+
+    sort = sorted(activity_durations.items(), key=lambda x: x[1],
+                  reverse=True)
+    for activity, duration in sort:
+        print("{:<20} {:<15} {}".format(
+            activity, str_format_timedelta(duration),
+            percentage_of_timedelta(total_time, duration)
+        ))
+
+    print('', end='\n\n')
+
+    print("Tags Tracked:", end='\n\n')
+
+    sort = sorted(tag_durations.items(), key=lambda x: x[1], reverse=True)
+    for tag, duration in sort:
+        print("{:<20} {:<15} {}".format(
+            tag, str_format_timedelta(duration),
+            percentage_of_timedelta(total_time, duration)
+        ))
+
+
+def print_team_summary(date_range_start, engine='python', date_range_end=None,
+                       workers=None):
+    """Print a summary of every user's activities together.
+
+    Users are summarised one at a time, each under their own lock, and
+    only their totals are kept, so no more than one user's history is
+    loaded at once. A user whose summary is cached for the current
+    version of their store is not loaded at all, and a user with a
+    daemon running is totalled by their daemon. The summary is followed
+    by each user's total time. Users whose daemon fails to answer are
+    skipped and named.
+
+    Takes the same arguments as print_summary.
+
+    """
+    users = list_users()
+    if not users:
+        print("No users have tracked activities. Track them by adding "
+              "--user to commands.")
+        return
+    engine = usable_engine(engine)
+
+    instances, events = Activity.instances, Activity.events
+    count, summaries, user_totals, skipped = 0, [], {}, []
+    try:
+        with PROFILE.phase('compute'):
+            for user in users:
+                result = user_summary(user, date_range_start, engine,
+                                      date_range_end, workers)
+                if result is None:
+                    skipped.append(user)
+                    continue
+                count += result[0]
+                summaries.append(result[1])
+                user_totals[user] = result[1][0]
+    finally:
+        Activity.instances, Activity.events = instances, events
+    summary = merge_summaries(summaries)
+
+    with PROFILE.phase('render'):
+        render_summary(count, summary)
+        print('', end='\n\n')
+        print("Users Tracked:", end='\n\n')
+        sort = sorted(user_totals.items(), key=lambda x: x[1], reverse=True)
+        for user, duration in sort:
+            print("{:<20} {:<15} {}".format(
+                user, str_format_timedelta(duration),
+                percentage_of_timedelta(summary[0], duration)
+            ))
+        if skipped:
+            print()
+            print("Skipped {} as their daemon could not total their "
+                  "activities.".format(', '.join(skipped)))
+
+
+def user_summary(user, date_range_start, engine='python',
+                 date_range_end=None, workers=None):
+    """Return the number of activities and summary totals of one user.
+
+    The user's store is loaded into Activity.instances, replacing what
+    was there, unless the summary is in their ResultCache. The lock on
+    their data files is held throughout. If the user's daemon holds the
+    lock it is asked for the totals instead.
+
+    Returns:
+        (count, summary) as returned by compute_summary, or None if the
+        user's daemon could not total their activities.
+
+    """
+    directory = user_directory(user)
+    lock = StoreLock(os.path.join(directory, LOCK_FILE))
+    while not lock.acquire(blocking=False):
+        reply = daemon_exchange(
+            {'totals': [None if time_bound is None
+                        else time_bound.isoformat()
+                        for time_bound in (date_range_start,
+                                           date_range_end)],
+             'engine': engine, 'workers': workers},
+            os.path.join(directory, SOCKET_FILE)
+        )
+        if reply is not None:
+            return None if 'error' in reply else decode_totals(reply)
+        time.sleep(0.01)
+    try:
+        name = store_name()
+        key = ('summary', date_range_start, date_range_end)
+        results = ResultCache(store_at(name, directory).version(),
+                              os.path.join(directory, CACHE_FILE))
+        cached = results.get(key)
+        if cached is not None:
+            return refresh_summary(*cached)
+        journal = open_store(name, directory=directory)
+        count, summary = compute_summary(date_range_start, engine,
+                                         date_range_end, workers)
+        results.put(key, summary_entry(count, summary, date_range_start,
+                                       date_range_end))
+        results.save(journal.version())
+        return count, summary
+    finally:
+        lock.release()
+
+
+def encode_totals(count, summary):
+    """Return count and summary totals as JSON values in microseconds."""
+    total_time, activity_durations, tag_durations = summary
+    return {
+        'count': count,
+        'total': total_time // MICROSECOND,
+        'names': {name: duration // MICROSECOND
+                  for name, duration in activity_durations.items()},
+        'tags': {tag: duration // MICROSECOND
+                 for tag, duration in tag_durations.items()},
+    }
+
+
+def decode_totals(totals):
+    """Return the count and summary totals encoded by encode_totals."""
+    def to_timedelta(micros):
+        return datetime.timedelta(microseconds=micros)
+
+    return totals['count'], (
+        to_timedelta(totals['total']),
+        {name: to_timedelta(micros)
+         for name, micros in totals['names'].items()},
+        {tag: to_timedelta(micros) for tag, micros in totals['tags'].items()},
+    )
+
+
+def compute_summary(date_range_start, engine='python', date_range_end=None,
+                    workers=None):
+    """Return the number of activities and summary totals with an engine.
+
+    Takes the same arguments as print_summary, with engine one that can
+    run here.
+
+    """
+    if engine == 'numpy':
+        from trackerian_engines import numpy_summarise
+        summary = numpy_summarise(Activity.instances, date_range_start,
+                                  date_range_end)
+    elif engine == 'parallel':
+        from trackerian_engines import parallel_summarise
+        summary = parallel_summarise(date_range_start, date_range_end,
+                                     workers)
+    else:
+        summary = summarise_activities(date_range_start, date_range_end)
+    archive = getattr(Activity.instances, 'archive', ())
+    if archive and engine != 'python':
+        summary = merge_summaries([
+            archive.summarise(date_range_start, date_range_end), summary
+        ])
+    return len(Activity.instances) + len(archive), summary
+
+
+def summary_entry(count, summary, date_range_start, date_range_end=None):
+    """Return the ResultCache entry of a summary computed just now.
+
+    The entry records the title cased name and tags of the running
+    activity if it is in range, so its time since can be added on use.
+
+    """
+    running = None
+    if Activity.instances and not Activity.instances[-1].end:
+        activity = Activity.instances[-1]
+        if in_date_range(activity.start, date_range_start, date_range_end):
+            tags = {VOCABULARY.key(tag): None for tag in activity.tags}
+            running = (VOCABULARY.strings[VOCABULARY.key(activity.name)],
+                       tuple(VOCABULARY.decode(tags)))
+    return get_current_datetime(), count, summary, running
+
+
+def refresh_summary(computed, count, summary, running):
+    """Return a cached summary with the time since it was computed added.
+
+    Only the total and the running activity's name and tags change.
+
+    """
+    if running is None:
+        return count, summary
+    elapsed = get_current_datetime() - computed
+    total_time, activity_durations, tag_durations = summary
+    activity_durations = dict(activity_durations)
+    tag_durations = dict(tag_durations)
+    name, tags = running
+    activity_durations[name] += elapsed
+    for tag in tags:
+        tag_durations[tag] += elapsed
+    return count, (total_time + elapsed, activity_durations, tag_durations)
+
+
+def summarise_activities(date_range_start, date_range_end=None):
+    """Return total, per name and per tag durations in the date range.
+
+    Args:
+        date_range_start (Datetime): Datetime object or None for all.
+        date_range_end (Datetime): Datetime object or None for no end.
+
+    Returns:
+        Tuple of total timedelta and dictionaries of timedelta by
+        title cased activity name and by title cased tag.
+
+    """
+    summarise = getattr(Activity.instances, 'summarise', None)
+    if summarise:
+        return summarise(date_range_start, date_range_end)
+    return sum_durations(Activity.instances, date_range_start, date_range_end)
+
+
+def sum_durations(activities, date_range_start, date_range_end=None):
+    """Return total, per name and per tag durations of activities.
+
+    Args:
+        activities (iterable): Activity objects to total.
+        date_range_start (Datetime): Datetime object or None for all.
+        date_range_end (Datetime): Datetime object or None for no end.
+
+    """
+    activity_durations = collections.defaultdict(datetime.timedelta)
+    tag_durations = collections.defaultdict(datetime.timedelta)
+    key = VOCABULARY.key
+
+    total_time = datetime.timedelta()
+
+    for activity in activities:
+        if not in_date_range(activity.start, date_range_start,
+                             date_range_end):
+            continue
+        if activity.end is not None:
+            duration_to_add = activity.duration
+        else:
+            duration_to_add = activity.return_current_duration()
+
+        total_time += duration_to_add
+        activity_durations[key(activity.name)] += duration_to_add
+
+        for tag in activity.tags:
+            tag_durations[key(tag)] += duration_to_add
+
+    return (total_time, VOCABULARY.decode(activity_durations),
+            VOCABULARY.decode(tag_durations))
+
+
+def can_fork():
+    """Return whether worker processes can be started by forking."""
+    import multiprocessing
+    return 'fork' in multiprocessing.get_all_start_methods()
+
+
+def merge_summaries(summaries):
+    """Return the summary totals of summaries of consecutive partitions.
+
+    Names and tags keep the order they were first seen in, so merging
+    partitions in list order gives the groups in the order the serial
+    engine finds them.
+
+    """
+    total_time = datetime.timedelta()
+    activity_durations = collections.defaultdict(datetime.timedelta)
+    tag_durations = collections.defaultdict(datetime.timedelta)
+    for partition_total, names, tags in summaries:
+        total_time += partition_total
+        for name, duration in names.items():
+            activity_durations[name] += duration
+        for tag, duration in tags.items():
+            tag_durations[tag] += duration
+    return total_time, dict(activity_durations), dict(tag_durations)
+
+
+class WeekHistogram:
+    """Class totalling time spent in each hour of the week.
+
+    Buckets run from Monday 00:00 to Sunday 23:00. Intervals are split at
+    hour boundaries without visiting each hour: the part hours at either
+    end are added directly, whole weeks of full hours are counted once
+    for every bucket and the rest of the run of full hours is marked in
+    a difference array. Adding an interval costs the same however long
+    it is, and one crossing midnight or the end of the week wraps round.
+
+        Attributes:
+            partial (list): Microseconds in each bucket from part hours.
+            runs (list): Difference array of full hours over two weeks,
+                so a run can start late in the week and carry on.
+            weeks (int): Whole weeks of full hours, in every bucket.
+
+    """
+
+    def __init__(self):
+        self.partial = [0] * HOURS_PER_WEEK
+        self.runs = [0] * (2 * HOURS_PER_WEEK)
+        self.weeks = 0
+
+    def add(self, start, end):
+        """Add the interval between start and end microseconds since EPOCH."""
+        first, last = start // HOUR_MICROS, end // HOUR_MICROS
+        bucket = (first + EPOCH_WEEK_HOUR) % HOURS_PER_WEEK
+        if first >= last:
+            self.partial[bucket] += max(end - start, 0)
+            return
+        self.partial[bucket] += (first + 1) * HOUR_MICROS - start
+        self.partial[(last + EPOCH_WEEK_HOUR) % HOURS_PER_WEEK] += (
+            end - last * HOUR_MICROS
+        )
+        weeks, hours = divmod(last - first - 1, HOURS_PER_WEEK)
+        self.weeks += weeks
+        if hours:
+            run_start = (bucket + 1) % HOURS_PER_WEEK
+            self.runs[run_start] += 1
+            self.runs[run_start + hours] -= 1
+
+    def totals(self):
+        """Return a list of the microseconds in each hour of the week."""
+        hours = list(itertools.accumulate(self.runs))
+        return [self.partial[hour] + HOUR_MICROS * (
+            self.weeks + hours[hour] + hours[hour + HOURS_PER_WEEK]
+        ) for hour in range(HOURS_PER_WEEK)]
+
+
+def histogram_activities(date_range_start, date_range_end=None, by=None):
+    """Return time spent in each hour of the week by activities in range.
+
+    Args:
+        date_range_start (Datetime): Datetime object or None for all.
+        date_range_end (Datetime): Datetime object or None for no end.
+        by (str): 'name' or 'tag' to also total each title cased name or
+            tag separately. Defaults to None.
+
+    Returns:
+        Tuple of the list of microseconds in each hour of the week for
+        every activity and a dictionary of such lists by name or tag.
+
+    """
+    now = datetime_to_micros(get_current_datetime())
+    key = VOCABULARY.key
+    overall = WeekHistogram()
+    groups = collections.defaultdict(WeekHistogram)
+    for _, activity in select_activities(date_range_start,
+                                         date_range_end=date_range_end):
+        start = datetime_to_micros(activity.start)
+        end = datetime_to_micros(activity.end) if activity.end else now
+        overall.add(start, end)
+        if by == 'name':
+            groups[key(activity.name)].add(start, end)
+        elif by == 'tag':
+            for tag in activity.tags:
+                groups[key(tag)].add(start, end)
+    return overall.totals(), VOCABULARY.decode(
+        {group: histogram.totals() for group, histogram in groups.items()}
+    )
+
+
+def print_histogram(date_range_start, by=None, engine='python',
+                    date_range_end=None):
+    """Print heatmaps of the time tracked in each hour of each weekday.
+
+    The first heatmap covers every activity in range, followed by one for
+    each name or tag if by is given, busiest first. Activities are
+    chosen by start time as in print_summary and counted up to now if
+    still running.
+
+    Args:
+        date_range_start (Datetime): Datetime object or None for all.
+        by (str): 'name' or 'tag' to add a heatmap for each. Defaults to
+            None.
+        engine (str): 'python' or 'numpy' to split with NumPy arrays.
+        date_range_end (Datetime): Datetime object or None for no end.
+
+    """
+    if engine == 'numpy' and load_numpy() is None:
+        print("NumPy is not installed so the python engine will be used.")
+        print()
+        engine = 'python'
+
+    with PROFILE.phase('compute'):
+        if engine == 'numpy':
+            from trackerian_engines import numpy_histogram
+            activities = Activity.instances
+            if getattr(activities, 'archive', None):
+                activities = [activity for _, activity in select_activities(
+                    date_range_start, date_range_end=date_range_end
+                )]
+            overall, groups = numpy_histogram(activities, date_range_start,
+                                              date_range_end, by)
+        else:
+            overall, groups = histogram_activities(date_range_start,
+                                                   date_range_end, by)
+
+    with PROFILE.phase('render'):
+        try:
+            HEATMAP_SHADES[-1].encode(sys.stdout.encoding or 'ascii')
+            shades = HEATMAP_SHADES
+        except (UnicodeEncodeError, LookupError):
+            shades = ASCII_SHADES
+
+        print('\n'.join(render_heatmap('All Activities', overall, shades)))
+        for group, totals in sorted(groups.items(), key=lambda x: sum(x[1]),
+                                    reverse=True):
+            print()
+            print('\n'.join(render_heatmap(group, totals, shades)))
+
+
+def render_heatmap(title, totals, shades):
+    """Return the lines of a weekday by hour heatmap.
+
+    Each hour is two characters wide and shaded by its share of the
+    busiest hour, with the hours tracked on each weekday at the end of
+    its row.
+
+    Args:
+        title (str): Name shown above the heatmap.
+        totals (list): Microseconds in each hour of the week, Monday
+            00:00 first.
+        shades (list): Characters for an empty hour then each quarter of
+            the busiest hour.
+
+    """
+    busiest = max(totals)
+    lines = [
+        '{} | Total Time Tracked: {}'.format(title, str_format_timedelta(
+            datetime.timedelta(microseconds=sum(totals))
+        )),
+        '',
+        ('    ' + ''.join('{:<6}'.format('{:02}'.format(hour))
+                          for hour in range(0, 24, 3))).rstrip(),
+    ]
+    for day, weekday in enumerate(WEEKDAYS):
+        hours = totals[day * 24:(day + 1) * 24]
+        cells = ''.join(
+            shades[-(-4 * micros // busiest) if micros else 0] * 2
+            for micros in hours
+        )
+        lines.append('{:<4}{} {:>7.1f}h'.format(weekday, cells,
+                                                sum(hours) / HOUR_MICROS))
+    if busiest:
+        hour = totals.index(busiest)
+        lines.append('')
+        lines.append("Busiest hour {} {:02}:00 with {}. {} none {} more"
+                     .format(WEEKDAYS[hour // 24], hour % 24,
+                             str_format_timedelta(
+                                 datetime.timedelta(microseconds=busiest)
+                             ), shades[0], ''.join(shades[1:])))
+    return lines
+
+
+def read_import_records(path):
+    """Yield (line number, record) for each record in an import file.
+
+    CSV records are dictionaries keyed by the header row. JSONL records
+    are left as the text of their line for parse_import_record to decode.
+
+    """
+    extension = os.path.splitext(path)[1].lower()
+    with open(path, newline='', encoding='utf-8') as import_file:
+        if extension == '.csv':
+            import csv
+
+            reader = csv.DictReader(import_file)
+            for record in reader:
+                yield reader.line_num, record
+        else:
+            for line_number, line in enumerate(import_file, 1):
+                if line.strip():
+                    yield line_number, line
+
+
+def parse_import_time(value, field):
+    """Return an ISO 8601 value as a naive local datetime."""
+    if not isinstance(value, str) or not value.strip():
+        raise ValueError("missing {}".format(field))
+    try:
+        parsed = datetime.datetime.fromisoformat(value.strip())
+    except ValueError:
+        raise ValueError("{} is not an ISO 8601 time: {}".format(field, value))
+    if parsed.tzinfo:
+        parsed = parsed.astimezone().replace(tzinfo=None)
+    return parsed
+
+
+def parse_import_record(record):
+    """Return the name, start, end and tags of an import record.
+
+    Raises:
+        ValueError: Describing why the record is invalid.
+
+    """
+    if isinstance(record, str):
+        import json
+        record = json.loads(record)
+    if not isinstance(record, dict):
+        raise ValueError("record is not an object")
+
+    name = record.get('name')
+    if not isinstance(name, str) or not name.strip():
+        raise ValueError("missing name")
+    start = parse_import_time(record.get('start'), 'start')
+    end = parse_import_time(record.get('end'), 'end')
+    if end <= start:
+        raise ValueError("end is not after start")
+
+    tags = record.get('tags') or []
+    if isinstance(tags, str):
+        tags = tags.split()
+    elif (not isinstance(tags, list)
+          or not all(isinstance(tag, str) for tag in tags)):
+        raise ValueError("tags must be a list of strings")
+    return name.strip(), start, end, tags
+
+
+def commit_import(store, final=False):
+    """Write a batch of imported activities to store.
+
+    Stores that read lazily commit every batch and are reloaded, so
+    imported activities are served from disk rather than kept in memory.
+    Where every activity is in memory anyway a journal only has batches
+    appended, leaving one checkpoint for the final commit.
+
+    """
+    if store is None:
+        return
+    from trackerian_stores import LazyActivities
+
+    if isinstance(Activity.instances, LazyActivities):
+        store.commit()
+        if Activity.instances.appended:
+            store.load()
+    elif final or not getattr(store, 'append', None):
+        store.commit()
+    else:
+        store.append()
+
+
+def import_activities(path, store=None, batch_size=None):
+    """Add finished activities read from a CSV or JSONL file.
+
+    Records are read one at a time and committed to store every
+    batch_size activities, so memory use does not grow with the file.
+    Invalid records are reported and skipped.
+
+    Args:
+        path (str): .csv file with a header row or .jsonl file with one
+            object per line, each having name, start, end and tags.
+        store: Loaded store to commit batches to. Defaults to None to
+            leave the changes in Activity.events.
+        batch_size (int): Activities per commit. Defaults to
+            IMPORT_BATCH_SIZE.
+
+    """
+    if os.path.splitext(path)[1].lower() not in ('.csv', '.jsonl', '.json',
+                                                 '.ndjson'):
+        print("Import files must be .csv or .jsonl")
+        return
+    if not os.path.exists(path):
+        print("{} does not exist.".format(path))
+        return
+    if Activity.instances and not Activity.instances[-1].end:
+        print("Finish tracking {} before importing.".format(
+            Activity.instances[-1].name
+        ))
+        return
+
+    batch_size = batch_size or IMPORT_BATCH_SIZE
+    imported = skipped = 0
+    for line_number, record in read_import_records(path):
+        try:
+            name, start, end, tags = parse_import_record(record)
+        except ValueError as error:
+            skipped += 1
+            if skipped <= IMPORT_ERRORS_SHOWN:
+                print("Skipped line {}: {}".format(line_number, error))
+            continue
+
+        activity = Activity(name, start)
+        activity.end = end
+        record_event('begin', activity, (activity.name, start))
+        record_event('finish', activity, end)
+        if tags:
+            activity.tags = VOCABULARY.intern_all(tags)
+            record_event('tag', activity, list(activity.tags))
+
+        imported += 1
+        if imported % batch_size == 0:
+            commit_import(store)
+    commit_import(store, final=True)
+
+    print("Imported {} activities from {}".format(imported, path))
+    if skipped:
+        print("Skipped {} invalid records".format(skipped))
+
+
+def archive_activities(before, store=None):
+    """Move finished activities started before a time into the archive.
+
+    The activities are written to a new archive file and removed from
+    the snapshot, which keeps per-day rollups of them. Activities left
+    in the snapshot are numbered from 0 again.
+
+    Args:
+        before (Datetime): Activities starting before this are archived.
+        store: Loaded store to write a new snapshot to. Defaults to None
+            to leave the snapshot unwritten.
+
+    """
+    if not isinstance(Activity.instances, IndexedActivities):
+        print("Only the pickle store can archive activities.")
+        return
+
+    def archived(activity):
+        return activity.end and activity.start < before
+
+    instances = Activity.instances
+    rows = [activity_row(activity) for activity in instances
+            if archived(activity)]
+    if not rows:
+        print("There are no finished activities started before {}."
+              .format(before))
+        return
+
+    instances.archive.add(rows)
+    Activity.instances = IndexedActivities(
+        (activity for activity in instances if not archived(activity)),
+        instances.archive, instances.next_id
+    )
+    Activity.events = []
+    if store is not None:
+        store.checkpoint()
+    print("Archived {} activities started before {}".format(len(rows),
+                                                            before))
+
+
+def export_records(date_range_start, date_range_end=None):
+    """Yield a dictionary of EXPORT_FIELDS for activities in range.
+
+    Times are ISO 8601 and durations are in seconds. Running activities
+    have no end and are timed up to now.
+
+    """
+    now = get_current_datetime()
+    for num, activity in select_activities(date_range_start,
+                                           date_range_end=date_range_end):
+        end = activity.end
+        yield {
+            'index': num,
+            'id': activity.id,
+            'name': activity.name,
+            'tags': list(activity.tags),
+            'start': activity.start.isoformat(),
+            'end': end.isoformat() if end else None,
+            'duration': ((end or now) - activity.start).total_seconds(),
+        }
+
+
+def export_lines(records, export_format):
+    """Yield records as lines of CSV, starting with a header, or JSONL.
+
+    CSV tags are separated by spaces and a running activity's end is
+    left empty, so the file can be read back with --import.
+
+    """
+    if export_format == 'jsonl':
+        import json
+        for record in records:
+            yield json.dumps(record) + '\n'
+        return
+
+    import csv
+    import io
+
+    line = io.StringIO()
+    writer = csv.writer(line, lineterminator='\n')
+    writer.writerow(EXPORT_FIELDS)
+    yield line.getvalue()
+    for record in records:
+        line.seek(0)
+        line.truncate()
+        record['tags'] = ' '.join(record['tags'])
+        writer.writerow(['' if record[field] is None else record[field]
+                         for field in EXPORT_FIELDS])
+        yield line.getvalue()
+
+
+def export_activities(date_range_start, export_format='csv', output=None,
+                      date_range_end=None):
+    """Write activities since date_range_start for other programs to read.
+
+    Records stream from select_activities through export_records and
+    export_lines and are written LIST_CHUNK_ROWS lines at a time, so the
+    whole history is never held as text.
+
+    Args:
+        date_range_start (Datetime): Datetime object or None for all.
+        export_format (str): 'csv' or 'jsonl'.
+        output (str): Path of the file to write. Defaults to None for
+            standard output.
+        date_range_end (Datetime): Datetime object or None for no end.
+
+    """
+    lines = export_lines(export_records(date_range_start, date_range_end),
+                         export_format)
+    export_file = (open(output, 'w', newline='', encoding='utf-8')
+                   if output else sys.stdout)
+    try:
+        while True:
+            with PROFILE.phase('compute'):
+                chunk = ''.join(itertools.islice(lines, LIST_CHUNK_ROWS))
+            if not chunk:
+                break
+            with PROFILE.phase('render'):
+                export_file.write(chunk)
+    finally:
+        if output:
+            export_file.close()
+
+
+def percentage_of_timedelta(total, duration):
+    """Return percentage duration timedelta is of total timedelta.
+
+    A zero total, as when nothing was tracked in a range, gives 0.00%.
+
+    """
+    if not total:
+        return '{:.2%}'.format(0)
+    proportion = duration.total_seconds() / total.total_seconds()
+    return '{:.2%}'.format(proportion)
+
+
+def activity_position(reference):
+    """Return the list position of the activity a command refers to.
+
+    Args:
+        reference (int, str): List number, counted from the end if
+            negative, or ID following '@' as shown by print_list.
+
+    Returns:
+        The position, or None after printing why there is no such
+        activity.
+
+    """
+    reference = str(reference)
+    if reference.startswith('@'):
+        find = getattr(Activity.instances, 'find', None)
+        if find is None:
+            print("Only the pickle store keeps activity IDs.")
+            return None
+        try:
+            position = find(int(reference[1:]))
+        except ValueError:
+            print("{} is not a valid ID.".format(reference))
+            return None
+        if position is None:
+            print("There is no activity with ID {}.".format(reference))
+        return position
+
+    try:
+        return range(len(Activity.instances))[int(reference)]
+    except ValueError:
+        print("{} is not a valid integer.".format(reference))
+    except IndexError:
+        print("There is no activity at index {}.".format(reference))
+    return None
+
+
+def edit_activity(activity_to_edit, info_to_edit, new_value):
+    """Edit Activity information.
+
+    Args:
+        activity_to_edit (class member): The Activity to edit
+        info_to_edit (str): String representing which variable to edit
+        new_value (list): List containing the new value(s) for the variable
+
+    """
+    if info_to_edit.lower() in ('name', 'n'):
+        activity_to_edit.name = VOCABULARY.intern(new_value[0].title())
+        edited = ('name', activity_to_edit.name)
+
+    elif info_to_edit.lower() in ('tag', 't'):
+        activity_to_edit.tags = VOCABULARY.intern_all(new_value)
+        edited = ('tags', list(activity_to_edit.tags))
+
+    elif info_to_edit.lower() in ('end', 'e'):
+        if not activity_to_edit.update_datetime('end', new_value[0]):
+            return
+        edited = ('end', activity_to_edit.end)
+
+    elif info_to_edit.lower() in ('start', 's'):
+        if not activity_to_edit.update_datetime('start', new_value[0]):
+            return
+        edited = ('start', activity_to_edit.start)
+
+    else:
+        print("Information category {} not recognised. Choose from: "
+              "'name', 'tag', 'end' or 'start'.".format(info_to_edit))
+        return
+
+    record_event('edit', activity_to_edit, edited)
+
+
+def peak_memory():
+    """Return the peak resident memory of this process in bytes.
+
+    Returns:
+        None where the resource module is not available, as on Windows.
+
+    """
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes and macOS bytes
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+class NullProfile:
+    """Stand-in for Profile when --profile is not given.
+
+    Its phases record nothing, so code can always run inside
+    `with PROFILE.phase(name):` at the cost of a method call.
+
+    """
+
+    def phase(self, name):
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+class Profile:
+    """Class timing the phases of a command for --profile.
+
+    Code runs a phase inside `with PROFILE.phase(name):`. Phases may
+    nest, and time spent in an inner phase is left out of the outer one,
+    so the phases add up to the time measured. Memory is the process's
+    peak resident size, which only grows, so each phase reports the peak
+    when it ended and how far it raised it.
+
+        Attributes:
+            phases (dict): [calls, seconds, peak, growth] by phase name in
+                the order they were first entered. Memory is in bytes.
+            stack (list): [name, start, peak] of each open phase.
+
+    """
+
+    def __init__(self):
+        self.phases = {}
+        self.stack = []
+
+    def phase(self, name):
+        """Open phase name, to be closed by using the Profile in a with."""
+        self.stack.append([name, time.perf_counter(), peak_memory()])
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        name, start, peak = self.stack.pop()
+        self.add(name, time.perf_counter() - start, peak)
+        return False
+
+    def add(self, name, seconds, peak_before=None):
+        """Add seconds spent in phase name, measured by the caller.
+
+        Args:
+            name (str): Phase name.
+            seconds (float): Wall time spent in the phase.
+            peak_before (int): Peak memory when the phase started, if
+                known, so its growth can be counted.
+
+        """
+        peak = peak_memory()
+        calls, total, highest, growth = self.phases.get(name,
+                                                        (0, 0.0, None, 0))
+        if peak is not None:
+            highest = max(highest or 0, peak)
+            if peak_before is not None:
+                growth += peak - peak_before
+        self.phases[name] = [calls + 1, total + seconds, highest, growth]
+        if self.stack:
+            # Move the enclosing phase's start on past the inner phase
+            self.stack[-1][1] += seconds
+
+    def results(self):
+        """Return the phases and their totals as a JSON ready dictionary."""
+        def megabytes(size):
+            return None if size is None else round(size / 2 ** 20, 1)
+
+        peaks = [peak for _, _, peak, _ in self.phases.values()
+                 if peak is not None]
+        return {
+            'phases': [{
+                'phase': name,
+                'calls': calls,
+                'ms': round(seconds * 1000, 3),
+                'peak_mb': megabytes(peak),
+                'growth_mb': megabytes(growth),
+            } for name, (calls, seconds, peak, growth) in self.phases.items()],
+            'total_ms': round(sum(seconds for _, seconds, _, _
+                                  in self.phases.values()) * 1000, 3),
+            'peak_mb': megabytes(max(peaks)) if peaks else None,
+        }
+
+    def report(self, report_format='text'):
+        """Return the results as a table or, for 'json', a JSON line."""
+        results = self.results()
+        if report_format == 'json':
+            import json
+            return json.dumps(results) + '\n'
+
+        def cell(value, spec):
+            return '-' if value is None else format(value, spec)
+
+        lines = ["{:<10} {:>6} {:>12} {:>10} {:>10}".format(
+            'Phase', 'Calls', 'Time ms', 'Peak MB', 'Grew MB'
+        )]
+        for phase in results['phases']:
+            lines.append("{:<10} {:>6} {:>12.2f} {:>10} {:>10}".format(
+                phase['phase'], phase['calls'], phase['ms'],
+                cell(phase['peak_mb'], '.1f'), cell(phase['growth_mb'], '.1f')
+            ))
+        lines.append("{:<10} {:>6} {:>12.2f} {:>10}".format(
+            'Total', '', results['total_ms'], cell(results['peak_mb'], '.1f')
+        ))
+        return '\n'.join(lines) + '\n'
+
+
+PROFILE = NullProfile()
+
+
+class NullResultCache:
+    """Stand-in for ResultCache when results are not cached.
+
+    It never holds an entry, so list and summary code can always ask
+    RESULTS first.
+
+    """
+
+    def get(self, key):
+        return None
+
+    def put(self, key, entry):
+        pass
+
+    def save(self, version):
+        pass
+
+
+class ResultCache:
+    """Class keeping list and summary results between commands.
+
+    Entries are saved with the version of the store they were computed
+    from, and the whole file is ignored once the store has been written
+    since, so any change main() commits invalidates every entry. Entries
+    hold the running activity, if any, so it is the only part brought up
+    to date on use. At most CACHE_ENTRIES are kept, dropping those used
+    least recently.
+
+        Attributes:
+            cache_file (str): Path of the pickled entries.
+            entries (OrderedDict): Entries by key, least recently used
+                first.
+            changed (bool): Whether entries have changed since loading.
+
+    """
+
+    def __init__(self, version, cache_file=None):
+        self.cache_file = cache_file or CACHE_FILE
+        self.entries = collections.OrderedDict()
+        self.changed = False
+        try:
+            with open(self.cache_file, 'rb') as cached:
+                cached_version, entries = load_pickle(cached)
+        except (OSError, EOFError, pickle.UnpicklingError, ValueError):
+            return
+        if cached_version == version:
+            self.entries = entries
+
+    def get(self, key):
+        """Return the entry stored under key, or None."""
+        entry = self.entries.get(key)
+        if entry is not None:
+            self.entries.move_to_end(key)
+        return entry
+
+    def put(self, key, entry):
+        """Store entry under key, dropping the least recently used."""
+        self.entries[key] = entry
+        self.entries.move_to_end(key)
+        while len(self.entries) > CACHE_ENTRIES:
+            self.entries.popitem(last=False)
+        self.changed = True
+
+    def save(self, version):
+        """Write new entries for the store at version, if there are any."""
+        if not self.changed:
+            return
+        write_atomically(self.cache_file,
+                         lambda cached: pickle.dump((version, self.entries),
+                                                    cached),
+                         sync=False)
+        self.changed = False
+
+
+def open_result_cache(store, args):
+    """Return a ResultCache for a list or summary, else a NullResultCache.
+
+    Args:
+        store: A store, loaded or not, whose version() the cache is for.
+        args (dict): Parsed arguments.
+
+    """
+    if result_key(args) is None:
+        return NullResultCache()
+    return ResultCache(store.version(), cache_file_of(store))
+
+
+def cache_file_of(store):
+    """Return the path of the ResultCache file kept beside store's files."""
+    return os.path.join(os.path.dirname(store.data_file), CACHE_FILE)
+
+
+RESULTS = NullResultCache()
+
+
+def main(args=None, store=None):
+    """Coordinate creation and time tracking of activities.
+
+    Args:
+        args (dict): Parsed arguments. Defaults to parsing sys.argv.
+        store: Loaded store, for commands that commit as they go.
+
+    """
+    if args is None:
+        args = parse_arguments(sys.argv[1:])
+    args = implied_arguments(args)
+
+    # Exports are read by other programs so are written without padding
+    if args['export']:
+        start, end = calculate_date_range(args['export'], args['since'],
+                                          args['until'])
+        export_activities(start, args['export_format'], args['output'], end)
+        return
+
+    print()
+
+    if args['begin']:
+        if Activity.instances and not Activity.instances[-1].end:
+            Activity.instances[-1].end_activity()
+            record_event('finish', Activity.instances[-1],
+                         Activity.instances[-1].end)
+        Activity(' '.join(args['begin']))
+        record_event('begin', Activity.instances[-1],
+                     (Activity.instances[-1].name,
+                      Activity.instances[-1].start))
+        print(Activity.instances[-1])
+
+    elif args['list']:
+        start, end = calculate_date_range(args['list'], args['since'],
+                                          args['until'])
+        load_uncached(store, ('list', start, end, args['limit'],
+                              args['offset'], args['newest_first']))
+        print_list(start, args['limit'], args['offset'], args['newest_first'],
+                   pager=not args['no_pager'], date_range_end=end)
+
+    elif args['summary']:
+        start, end = calculate_date_range(args['summary'], args['since'],
+                                          args['until'])
+        load_uncached(store, ('summary', start, end))
+        print_summary(start, args['engine'], end, args['workers'])
+
+    elif args['team']:
+        start, end = calculate_date_range(args['team'], args['since'],
+                                          args['until'])
+        print_team_summary(start, args['engine'], end, args['workers'])
+        print()
+        return
+
+    elif args['histogram']:
+        start, end = calculate_date_range(args['histogram'], args['since'],
+                                          args['until'])
+        print_histogram(start, args['by'], args['engine'], end)
+
+    elif args['import_file']:
+        import_activities(args['import_file'], store)
+
+    elif args['archive_before']:
+        archive_activities(args['archive_before'], store)
+
+    # Args below IndexError if there are no Activity instances so catch here
+    try:
+        Activity.instances[-1]
+    except IndexError:
+        print("No activities have been tracked")
+        return
+
+    if args['tag']:
+        tags = VOCABULARY.intern_all(args['tag'])
+        Activity.instances[-1].tags.extend(tags)
+        record_event('tag', Activity.instances[-1], tags)
+
+    elif args['current']:
+        if Activity.instances[-1].end:
+            print("Currently Not Tracking an Activity")
+        else:
+            print(Activity.instances[-1])
+
+    elif args['finish']:
+        was_running = not Activity.instances[-1].end
+        Activity.instances[-1].end_activity()
+        if was_running:
+            record_event('finish', Activity.instances[-1],
+                         Activity.instances[-1].end)
+
+    elif args['remove'] is not None:
+        index = activity_position(args['remove'])
+        if index is not None:
+            del Activity.instances[index]
+            record_event('remove', index)
+
+    elif args['edit']:
+        index = activity_position(args['edit'][0])
+        if index is None:
+            return
+
+        edit_activity(Activity.instances[index], args['edit'][1],
+                      args['edit'][2:])
+
+    print()
+
+
+class StoreLock:
+    """Class representing an advisory lock on the data files.
+
+    A command holds the lock from loading the store until its changes are
+    committed, so overlapping commands take turns instead of the last
+    writer undoing the others. A daemon holds it for as long as it runs.
+    Where fcntl is unavailable locking is skipped.
+
+        Attributes:
+            lock_file (str): Path of the file locked.
+            handle (file): Open lock file while the lock is held.
+
+    """
+
+    def __init__(self, lock_file=None):
+        self.lock_file = lock_file or LOCK_FILE
+        self.handle = None
+
+    def acquire(self, blocking=True):
+        """Take the lock, or return False if it is held and not blocking."""
+        if fcntl is None:
+            return True
+        handle = open(self.lock_file, 'a')
+        try:
+            fcntl.flock(handle,
+                        fcntl.LOCK_EX if blocking else
+                        fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            handle.close()
+            return False
+        self.handle = handle
+        return True
+
+    def release(self):
+        """Give up the lock."""
+        if self.handle:
+            self.handle.close()
+            self.handle = None
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.release()
+
+
+def receive_all(connection):
+    """Return everything read from connection until the sender is done."""
+    chunks = []
+    while True:
+        chunk = connection.recv(65536)
+        if not chunk:
+            return b''.join(chunks)
+        chunks.append(chunk)
+
+
+def daemon_running(socket_file=None):
+    """Return whether a daemon is accepting connections on socket_file."""
+    socket_file = socket_file or SOCKET_FILE
+    if not os.path.exists(socket_file):
+        return False
+    import socket
+
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+        try:
+            client.connect(socket_file)
+        except OSError:
+            return False
+    return True
+
+
+def daemon_request(args, socket_file=None):
+    """Send parsed args to a running daemon and return its reply.
+
+    Args:
+        args (dict): Arguments as returned by parse_arguments.
+        socket_file (str): Path the daemon listens on. Defaults to
+            SOCKET_FILE.
+
+    Returns:
+        Tuple of the output of the command and its profile report, or
+        None if no daemon is running so the store should be used
+        directly.
+
+    """
+    reply = daemon_exchange(args, socket_file)
+    if reply is None:
+        return None
+    return reply['output'], reply['profile']
+
+
+def daemon_exchange(message, socket_file=None):
+    """Send a JSON message to a running daemon and return its reply.
+
+    Returns:
+        The decoded reply, or None if no daemon is running.
+
+    """
+    socket_file = socket_file or SOCKET_FILE
+    if not os.path.exists(socket_file):
+        return None
+    import json
+    import socket
+
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+        try:
+            client.connect(socket_file)
+        except OSError:
+            return None
+        client.sendall(json.dumps(message).encode('utf-8'))
+        client.shutdown(socket.SHUT_WR)
+        return json.loads(receive_all(client).decode('utf-8'))
+
+
+if __name__ == '__main__':
+    STARTED = time.perf_counter()
+    ARGS = quick_arguments(sys.argv[1:]) or parse_arguments(sys.argv[1:])
+    if ARGS['profile']:
+        PROFILE = Profile()
+        PROFILE.add('parse', time.perf_counter() - STARTED)
+    STORE = store_name()
+
+    # A team summary takes each user's lock in turn as it reads them
+    if ARGS['team']:
+        with PROFILE.phase('command'):
+            main(ARGS)
+        if ARGS['profile']:
+            sys.stderr.write(PROFILE.report(ARGS['profile']))
+        sys.exit()
+
+    # Each user's data files, lock and socket are kept in their own folder
+    DIRECTORY = user_directory(ARGS['user'])
+    if DIRECTORY:
+        os.makedirs(DIRECTORY, exist_ok=True)
+    SOCKET = os.path.join(DIRECTORY, SOCKET_FILE)
+    LOCK = StoreLock(os.path.join(DIRECTORY, LOCK_FILE))
+
+    if ARGS['daemon']:
+        if daemon_running(SOCKET):
+            print("A daemon is already running on {}".format(SOCKET))
+            sys.exit()
+        import signal
+        from trackerian_daemon import serve
+        signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit())
+        LOCK.acquire()
+        serve(open_store(STORE, directory=DIRECTORY), SOCKET)
+        sys.exit()
+
+    # A running daemon already holds every activity in memory, and holds
+    # the lock, so ask it while waiting for the lock. Its reply includes
+    # its own profile of the command
+    with PROFILE.phase('lock'):
+        while not LOCK.acquire(blocking=False):
+            REPLY = daemon_request(ARGS, SOCKET)
+            if REPLY is not None:
+                sys.stdout.write(REPLY[0])
+                sys.stderr.write(REPLY[1])
+                sys.exit()
+            time.sleep(0.01)
+
+    # Load the snapshot plus journalled changes, creating them if missing.
+    # Commands touching only the latest activity read just its head record,
+    # as do lists and summaries already cached for this version of the store
+    with PROFILE.phase('load'):
+        RESULTS = open_result_cache(store_at(STORE, DIRECTORY), ARGS)
+        JOURNAL = open_store(STORE, tail=tail_only(ARGS) or (
+            RESULTS.get(result_key(ARGS)) is not None
+        ), directory=DIRECTORY)
+
+    with PROFILE.phase('command'):
+        main(ARGS, JOURNAL)
+    with PROFILE.phase('save'):
+        JOURNAL.commit()
+        RESULTS.save(JOURNAL.version())
+    LOCK.release()
+
+    if ARGS['profile']:
+        sys.stderr.write(PROFILE.report(ARGS['profile']))
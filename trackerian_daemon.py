@@ -0,0 +1,131 @@
+"""Daemon serving Trackerian commands from a loaded store.
+
+trackerian imports this module only to start a daemon. Clients talk to
+it through daemon_request in trackerian. Everything it shares with
+trackerian is reached through that module, as run_request replaces its
+RESULTS and PROFILE for each command.
+
+"""
+
+import datetime
+import json
+import os
+
+import trackerian
+
+
+def run_request(journal, args):
+    """Run main() with args against a loaded store.
+
+    A request that fails is reported in the output and the store is
+    reloaded so its unjournalled changes are dropped.
+
+    Returns:
+        Tuple of the command's output and its profile report, which is
+        empty unless args ask for one.
+
+    """
+    import contextlib
+    import io
+
+    if args['profile']:
+        trackerian.PROFILE = trackerian.Profile()
+    else:
+        trackerian.PROFILE = trackerian.NullProfile()
+    trackerian.RESULTS = trackerian.open_result_cache(journal, args)
+
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        try:
+            with trackerian.PROFILE.phase('command'):
+                trackerian.main(args, journal)
+            with trackerian.PROFILE.phase('save'):
+                journal.commit()
+                trackerian.RESULTS.save(journal.version())
+        except Exception as error:
+            journal.load()
+            print("Request failed: {}".format(error))
+    trackerian.RESULTS = trackerian.NullResultCache()
+    report = ''
+    if args['profile']:
+        report = trackerian.PROFILE.report(args['profile'])
+        trackerian.PROFILE = trackerian.NullProfile()
+    return output.getvalue(), report
+
+
+def totals_request(message):
+    """Return a daemon's reply to a request for its summary totals.
+
+    Args:
+        message (dict): 'totals' holding the ISO 8601 start and end of
+            the range, or None for no limit, with 'engine' and 'workers'
+            as print_summary takes them.
+
+    Returns:
+        The totals as made by encode_totals, or a dictionary with an
+        'error' if they could not be worked out.
+
+    """
+    try:
+        start, end = [None if time_bound is None
+                      else datetime.datetime.fromisoformat(time_bound)
+                      for time_bound in message['totals']]
+        return trackerian.encode_totals(*trackerian.compute_summary(
+            start, message['engine'], end, message['workers']
+        ))
+    except Exception as error:
+        return {'error': str(error)}
+
+
+def serve(journal, socket_file=None, requests=None):
+    """Answer daemon_request calls on a Unix socket.
+
+    Requests are answered one at a time so every caller sees the changes
+    made before it, and each is journalled before its output is sent.
+
+    Args:
+        journal: Loaded store whose Activity.instances are served.
+        socket_file (str): Path to listen on. Defaults to SOCKET_FILE.
+        requests (int): Number of requests to answer before stopping.
+            Defaults to None to run until interrupted.
+
+    """
+    import socket
+
+    socket_file = socket_file or trackerian.SOCKET_FILE
+    if trackerian.daemon_running(socket_file):
+        print("A daemon is already running on {}".format(socket_file))
+        return
+    if os.path.exists(socket_file):
+        os.remove(socket_file)
+
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    server.bind(socket_file)
+    server.listen()
+    print("Daemon listening on {}. Press Ctrl+C to stop.".format(socket_file))
+
+    try:
+        while requests is None or requests > 0:
+            connection, _ = server.accept()
+            with connection:
+                connection.settimeout(5)
+                try:
+                    request = trackerian.receive_all(connection)
+                    if not request:
+                        continue
+                    message = json.loads(request.decode('utf-8'))
+                    if 'totals' in message:
+                        reply = totals_request(message)
+                    else:
+                        output, report = run_request(journal, message)
+                        reply = {'output': output, 'profile': report}
+                    connection.sendall(json.dumps(reply).encode('utf-8'))
+                except (OSError, ValueError):
+                    continue
+            if requests is not None:
+                requests -= 1
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+        os.remove(socket_file)
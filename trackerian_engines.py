@@ -0,0 +1,265 @@
+"""NumPy and parallel summary engines for Trackerian.
+
+trackerian imports this module the first time the numpy or parallel
+engine is used. Everything it shares with trackerian is reached through
+that module, so values replaced there at run time are seen here too.
+
+"""
+
+import collections
+import datetime
+import os
+
+import trackerian
+
+
+def summary_arrays(activities):
+    """Return dictionary encoded NumPy columns for activities.
+
+    Column backed activities without unsaved changes are wrapped without
+    copying. Otherwise each activity is encoded, taking its end from its
+    duration as sum_durations does.
+
+    Returns:
+        Tuple of int64 starts and ends (NO_END while running), name and
+        tag set ID arrays, and the lists of names and tag sets they index.
+
+    """
+    from trackerian_stores import ColumnActivities
+
+    numpy = trackerian.load_numpy()
+    if (isinstance(activities, ColumnActivities) and activities.columns
+            and activities._unchanged()):
+        columns = activities.columns
+        return (numpy.frombuffer(columns.starts, dtype=numpy.int64),
+                numpy.frombuffer(columns.ends, dtype=numpy.int64),
+                numpy.frombuffer(columns.name_ids, dtype=numpy.int32),
+                numpy.frombuffer(columns.tagset_ids, dtype=numpy.int32),
+                columns.names, columns.tagsets)
+
+    starts, ends, name_ids, tagset_ids = [], [], [], []
+    names, tagsets = {}, {}
+    for activity in activities:
+        start = trackerian.datetime_to_micros(activity.start)
+        starts.append(start)
+        if activity.end is not None:
+            ends.append(start + activity.duration // trackerian.MICROSECOND)
+        else:
+            ends.append(trackerian.NO_END)
+        name_ids.append(names.setdefault(activity.name, len(names)))
+        tagset_ids.append(tagsets.setdefault(tuple(activity.tags),
+                                             len(tagsets)))
+    return (numpy.array(starts, dtype=numpy.int64),
+            numpy.array(ends, dtype=numpy.int64),
+            numpy.array(name_ids, dtype=numpy.int32),
+            numpy.array(tagset_ids, dtype=numpy.int32),
+            list(names), list(tagsets))
+
+
+def numpy_summarise(activities, date_range_start, date_range_end=None):
+    """Return the same totals as summarise_activities using NumPy.
+
+    Durations are masked to the range and summed per name and tag set ID
+    with numpy.add.at, then merged by title case once per ID. Groups are
+    ordered by the first activity that added to them, as in the python
+    engine.
+
+    Args:
+        activities (iterable): Activity objects or a ColumnActivities.
+        date_range_start (Datetime): Datetime object or None for all.
+        date_range_end (Datetime): Datetime object or None for no end.
+
+    """
+    numpy = trackerian.load_numpy()
+    starts, ends, name_ids, tagset_ids, names, tagsets = summary_arrays(
+        activities
+    )
+    now = trackerian.datetime_to_micros(trackerian.get_current_datetime())
+    durations = numpy.where(ends == trackerian.NO_END, now, ends) - starts
+
+    rows = numpy.arange(len(starts))
+    if date_range_start or date_range_end:
+        low, high = trackerian.micros_range(date_range_start, date_range_end)
+        mask = (starts >= low) & (starts < high)
+        durations, rows = durations[mask], rows[mask]
+        name_ids, tagset_ids = name_ids[mask], tagset_ids[mask]
+
+    def grouped(ids, size):
+        """Return summed durations and first row for each ID."""
+        sums = numpy.zeros(size, dtype=numpy.int64)
+        numpy.add.at(sums, ids, durations)
+        first = numpy.full(size, len(starts), dtype=numpy.int64)
+        numpy.minimum.at(first, ids, rows)
+        return sums, first
+
+    def to_timedelta(micros):
+        return datetime.timedelta(microseconds=int(micros))
+
+    name_sums, name_first = grouped(name_ids, len(names))
+    title_sums = collections.defaultdict(int)
+    title_first = {}
+    for name_id in numpy.argsort(name_first, kind='stable'):
+        if name_first[name_id] == len(starts):
+            break
+        title = trackerian.VOCABULARY.key(names[name_id])
+        title_sums[title] += name_sums[name_id]
+        title_first.setdefault(title, name_first[name_id])
+
+    tagset_sums, tagset_first = grouped(tagset_ids, len(tagsets))
+    tag_sums = collections.defaultdict(int)
+    for tagset_id in numpy.argsort(tagset_first, kind='stable'):
+        if tagset_first[tagset_id] == len(starts):
+            break
+        for tag in tagsets[tagset_id]:
+            tag_sums[trackerian.VOCABULARY.key(tag)] += tagset_sums[tagset_id]
+
+    return (
+        to_timedelta(durations.sum()),
+        {trackerian.VOCABULARY.strings[title]: to_timedelta(title_sums[title])
+         for title in sorted(title_sums, key=title_first.get)},
+        {tag: to_timedelta(micros) for tag, micros in
+         trackerian.VOCABULARY.decode(tag_sums).items()},
+    )
+
+
+def start_partition_worker():
+    """Reopen anything a forked worker must not share with its parent."""
+    reconnect = getattr(trackerian.Activity.instances, 'reconnect', None)
+    if reconnect:
+        reconnect()
+
+
+def summarise_partition(first, stop, date_range_start, date_range_end=None):
+    """Return summary totals of the activities at positions first to stop.
+
+    Run in a worker process forked after the store was loaded, so it reads
+    the parent's Activity.instances without it being sent to it.
+
+    """
+    slice_rows = getattr(trackerian.Activity.instances, 'slice_rows', None)
+    if slice_rows:
+        return trackerian.sum_row_durations(slice_rows(first, stop),
+                                            date_range_start, date_range_end)
+    return trackerian.sum_durations(trackerian.Activity.instances[first:stop],
+                                    date_range_start, date_range_end)
+
+
+def parallel_summarise(date_range_start, date_range_end=None, workers=None):
+    """Return the same totals as summarise_activities using processes.
+
+    The list positions that can hold the date range are split into one
+    partition per worker. Each worker, forked with the store loaded,
+    totals its partition as rows and the partial totals are merged in
+    list order. A single worker totals the one partition in this process.
+
+    Args:
+        date_range_start (Datetime): Datetime object or None for all.
+        date_range_end (Datetime): Datetime object or None for no end.
+        workers (int): Number of worker processes. Defaults to one per
+            CPU.
+
+    """
+    span = getattr(trackerian.Activity.instances, 'span', None)
+    if span:
+        positions = span(date_range_start, date_range_end)
+    else:
+        positions = range(len(trackerian.Activity.instances))
+
+    workers = min(workers or os.cpu_count() or 1, len(positions)) or 1
+    size = -(-len(positions) // workers)
+    partitions = [(first, min(first + size, positions.stop))
+                  for first in range(positions.start, positions.stop,
+                                     size or 1)]
+    if workers == 1:
+        return trackerian.merge_summaries(
+            summarise_partition(first, stop, date_range_start,
+                                date_range_end)
+            for first, stop in partitions
+        )
+
+    import concurrent.futures
+    import multiprocessing
+    with concurrent.futures.ProcessPoolExecutor(
+            workers, multiprocessing.get_context('fork'),
+            initializer=start_partition_worker) as executor:
+        futures = [executor.submit(summarise_partition, first, stop,
+                                   date_range_start, date_range_end)
+                   for first, stop in partitions]
+        return trackerian.merge_summaries(future.result()
+                                          for future in futures)
+
+
+def numpy_histogram(activities, date_range_start, date_range_end=None,
+                    by=None):
+    """Return the same totals as histogram_activities using NumPy.
+
+    WeekHistogram's split is done for every activity at once, with the
+    buckets of each name or tag set ID as one row of a matrix. Rows are
+    then merged by title case once per ID.
+
+    Args:
+        activities (iterable): Activity objects or a ColumnActivities.
+        date_range_start (Datetime): Datetime object or None for all.
+        date_range_end (Datetime): Datetime object or None for no end.
+        by (str): 'name', 'tag' or None.
+
+    """
+    numpy = trackerian.load_numpy()
+    starts, ends, name_ids, tagset_ids, names, tagsets = summary_arrays(
+        activities
+    )
+    now = trackerian.datetime_to_micros(trackerian.get_current_datetime())
+    ends = numpy.where(ends == trackerian.NO_END, now, ends)
+    if date_range_start or date_range_end:
+        low, high = trackerian.micros_range(date_range_start, date_range_end)
+        mask = (starts >= low) & (starts < high)
+        starts, ends = starts[mask], ends[mask]
+        name_ids, tagset_ids = name_ids[mask], tagset_ids[mask]
+
+    if by == 'name':
+        ids, size = name_ids, len(names)
+    elif by == 'tag':
+        ids, size = tagset_ids, len(tagsets)
+    else:
+        ids, size = numpy.zeros(len(starts), dtype=numpy.int32), 1
+
+    hour_micros = trackerian.HOUR_MICROS
+    week_hours = trackerian.HOURS_PER_WEEK
+    first, last = starts // hour_micros, ends // hour_micros
+    bucket = (first + trackerian.EPOCH_WEEK_HOUR) % week_hours
+    crosses = first < last
+    partial = numpy.zeros((size, week_hours), dtype=numpy.int64)
+    numpy.add.at(partial, (ids, bucket), numpy.maximum(
+        numpy.where(crosses, (first + 1) * hour_micros, ends) - starts, 0
+    ))
+    numpy.add.at(partial,
+                 (ids, (last + trackerian.EPOCH_WEEK_HOUR) % week_hours),
+                 numpy.where(crosses, ends - last * hour_micros, 0))
+
+    weeks, hours = numpy.divmod(numpy.maximum(last - first - 1, 0),
+                                week_hours)
+    week_counts = numpy.zeros(size, dtype=numpy.int64)
+    numpy.add.at(week_counts, ids, weeks)
+    runs = numpy.zeros((size, 2 * week_hours), dtype=numpy.int64)
+    run_start = (bucket + 1) % week_hours
+    numpy.add.at(runs, (ids, run_start), 1)
+    numpy.add.at(runs, (ids, run_start + hours), -1)
+    runs = runs.cumsum(axis=1)
+    matrix = partial + hour_micros * (
+        runs[:, :week_hours] + runs[:, week_hours:] + week_counts[:, None]
+    )
+
+    groups = {}
+    if by == 'name':
+        for name_id, name in enumerate(names):
+            title = trackerian.VOCABULARY.key(name)
+            groups[title] = groups.get(title, 0) + matrix[name_id]
+    elif by == 'tag':
+        for tagset_id, tagset in enumerate(tagsets):
+            for tag in tagset:
+                title = trackerian.VOCABULARY.key(tag)
+                groups[title] = groups.get(title, 0) + matrix[tagset_id]
+    return matrix.sum(axis=0).tolist(), trackerian.VOCABULARY.decode(
+        {group: totals.tolist() for group, totals in groups.items()
+         if totals.any()}
+    )
@@ -0,0 +1,1057 @@
+"""Column, SQLite and segment stores for Trackerian.
+
+trackerian imports this module the first time one of these stores is
+opened, so commands run against the default pickle store never load it.
+Everything it shares with trackerian is reached through that module, so
+values replaced there at run time are seen here too.
+
+"""
+
+import abc
+import array
+import bisect
+import collections
+import collections.abc
+import datetime
+import itertools
+import json
+import mmap
+import os
+import pickle
+import struct
+
+import trackerian
+
+
+class ColumnFile:
+    """Class representing a memory-mapped, fixed-width columnar snapshot.
+
+    The file is a header followed by int64 start and end columns (end is
+    NO_END while an activity runs), int32 name and tag set ID columns and a
+    JSON footer holding the name and tag set dictionaries. Columns are
+    memoryviews onto the mapping so scanning them does not copy the file.
+    A header flag records whether the starts are in order, in which case
+    a date range is found by binary search.
+
+        Attributes:
+            token (str): Token of the journal the snapshot belongs to.
+            count (int): Number of rows.
+            sorted (bool): Whether rows are in order of start time.
+            starts, ends, name_ids, tagset_ids (memoryview): Columns.
+            names (list): Activity names indexed by name ID.
+            tagsets (list): Tuples of tags indexed by tag set ID.
+
+    """
+    header = struct.Struct('<4sHBxq32s')
+    magic = b'TRKC'
+    version = 1
+    SORTED = 1
+
+    def __init__(self, path):
+        with open(path, 'rb') as column_file:
+            self.map = mmap.mmap(column_file.fileno(), 0,
+                                 access=mmap.ACCESS_READ)
+
+        magic, version, flags, self.count, token = self.header.unpack_from(
+            self.map
+        )
+        if magic != self.magic or version != self.version:
+            raise ValueError("{} is not a trackerian column file".format(path))
+        self.sorted = bool(flags & self.SORTED)
+        self.token = token.decode('ascii').rstrip('\0') or None
+
+        view = memoryview(self.map)
+        offset = self.header.size
+        columns = []
+        for code, width in (('q', 8), ('q', 8), ('i', 4), ('i', 4)):
+            size = width * self.count
+            columns.append(view[offset:offset + size].cast(code))
+            offset += size
+        self.starts, self.ends, self.name_ids, self.tagset_ids = columns
+
+        self.names, tagsets = json.loads(bytes(view[offset:]).decode('utf-8'))
+        self.tagsets = [tuple(tagset) for tagset in tagsets]
+
+    def row(self, row):
+        """Return the (start, end, name, tags) tuple stored at row."""
+        return (self.starts[row], self.ends[row],
+                self.names[self.name_ids[row]],
+                self.tagsets[self.tagset_ids[row]])
+
+    def activity(self, row):
+        """Return a new Activity built from the values stored at row."""
+        return trackerian.row_activity(*self.row(row))
+
+    def rows_between(self, low, high):
+        """Return the rows that can start in [low, high) microseconds."""
+        if not self.sorted:
+            return range(self.count)
+        first = bisect.bisect_left(self.starts, low)
+        return range(first, bisect.bisect_left(self.starts, high, first))
+
+    @classmethod
+    def write(cls, path, rows, token):
+        """Write rows of (start, end, name, tags) tuples to a column file.
+
+        The file is written beside path and moved into place by
+        write_atomically, so existing mappings of the old file stay valid.
+
+        """
+        starts, ends = array.array('q'), array.array('q')
+        name_ids, tagset_ids = array.array('i'), array.array('i')
+        names, tagsets = {}, {}
+        flags = cls.SORTED
+        for start, end, name, tags in rows:
+            if starts and start < starts[-1]:
+                flags = 0
+            starts.append(start)
+            ends.append(end)
+            name_ids.append(names.setdefault(name, len(names)))
+            tagset_ids.append(tagsets.setdefault(tags, len(tagsets)))
+
+        def write(column_file):
+            column_file.write(cls.header.pack(
+                cls.magic, cls.version, flags, len(starts),
+                (token or '').encode('ascii')
+            ))
+            for column in (starts, ends, name_ids, tagset_ids):
+                column.tofile(column_file)
+            column_file.write(json.dumps(
+                [list(names), [list(tagset) for tagset in tagsets]]
+            ).encode('utf-8'))
+
+        trackerian.write_atomically(path, write)
+
+
+class LazyActivities(collections.abc.MutableSequence):
+    """Class representing Activity.instances backed by a stored snapshot.
+
+    Snapshot rows are only turned into Activity objects when they are
+    indexed, which in everyday use is just the latest one. Removed rows and
+    activities begun since the snapshot are tracked alongside it until the
+    store next writes them out. Subclasses provide build_activity.
+
+        Attributes:
+            base_count (int): Number of rows in the snapshot.
+            deleted (list): Sorted snapshot rows that have been removed.
+            loaded (dict): Activity objects for snapshot rows by row number.
+            appended (list): Activity objects added since the snapshot.
+
+    """
+
+    def __init__(self, base_count=0):
+        self.base_count = base_count
+        self.deleted = []
+        self.loaded = {}
+        self.appended = []
+
+    @abc.abstractmethod
+    def build_activity(self, row):
+        """Return a new Activity for a snapshot row."""
+
+    def _snapshot_length(self):
+        """Return the number of snapshot rows that have not been removed."""
+        return self.base_count - len(self.deleted)
+
+    def _row(self, position):
+        """Return the snapshot row shown at position."""
+        row = position
+        while True:
+            shifted = position + bisect.bisect_right(self.deleted, row)
+            if shifted == row:
+                return row
+            row = shifted
+
+    def _activity(self, row):
+        """Return the Activity for a snapshot row, loading it if needed."""
+        activity = self.loaded.get(row)
+        if activity is None:
+            activity = self.loaded[row] = self.build_activity(row)
+        return activity
+
+    def __len__(self):
+        return self._snapshot_length() + len(self.appended)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        position = range(len(self))[index]
+        snapshot_length = self._snapshot_length()
+        if position >= snapshot_length:
+            return self.appended[position - snapshot_length]
+        return self._activity(self._row(position))
+
+    def __setitem__(self, index, activity):
+        position = range(len(self))[index]
+        snapshot_length = self._snapshot_length()
+        if position >= snapshot_length:
+            self.appended[position - snapshot_length] = activity
+        else:
+            self.loaded[self._row(position)] = activity
+
+    def __delitem__(self, index):
+        position = range(len(self))[index]
+        snapshot_length = self._snapshot_length()
+        if position >= snapshot_length:
+            del self.appended[position - snapshot_length]
+        else:
+            row = self._row(position)
+            self.loaded.pop(row, None)
+            bisect.insort(self.deleted, row)
+
+    def insert(self, index, activity):
+        snapshot_length = self._snapshot_length()
+        if index < snapshot_length:
+            raise IndexError("Activities can only be added after the "
+                             "snapshot rows")
+        self.appended.insert(index - snapshot_length, activity)
+
+    def index(self, activity, *args):
+        for position, appended in enumerate(self.appended):
+            if appended is activity:
+                return self._snapshot_length() + position
+        for row, loaded in self.loaded.items():
+            if loaded is activity:
+                return row - bisect.bisect_left(self.deleted, row)
+        raise ValueError("Activity is not in the list")
+
+    def _live_rows(self, rows=None):
+        """Yield (position, row) for snapshot rows that were not removed.
+
+        Args:
+            rows (range): Snapshot rows to read. Defaults to all of them.
+
+        """
+        if rows is None:
+            rows = range(self.base_count)
+        deleted = set(self.deleted)
+        position = rows.start - bisect.bisect_left(self.deleted, rows.start)
+        for row in rows:
+            if row not in deleted:
+                yield position, row
+                position += 1
+
+    def __iter__(self):
+        for _, row in self._live_rows():
+            yield self._activity(row)
+        yield from self.appended
+
+    def _unchanged(self):
+        """Return True if the store matches this list exactly."""
+        return not (trackerian.Activity.events or self.deleted
+                    or self.appended)
+
+    def select(self, date_range_start, date_range_end=None):
+        """Yield (number, Activity) for activities in the date range."""
+        for num, activity in enumerate(self):
+            if trackerian.in_date_range(activity.start, date_range_start,
+                                        date_range_end):
+                yield num, activity
+
+    def slice_rows(self, first, stop):
+        """Yield (start, end, name, tags) rows for positions first to stop."""
+        for activity in self[first:stop]:
+            yield trackerian.activity_row(activity)
+
+
+class ColumnActivities(LazyActivities):
+    """Class representing Activity.instances backed by a ColumnFile.
+
+    print_list and print_summary scan the columns directly through the
+    select and summarise methods.
+
+        Attributes:
+            columns (ColumnFile): The snapshot, or None if there is none.
+
+    """
+
+    def __init__(self, columns=None):
+        super().__init__(columns.count if columns else 0)
+        self.columns = columns
+
+    def build_activity(self, row):
+        """Return a new Activity for a snapshot row."""
+        return self.columns.activity(row)
+
+    def rows(self):
+        """Yield (start, end, name, tags) tuples for every activity."""
+        for _, row in self._live_rows():
+            if row in self.loaded:
+                yield trackerian.activity_row(self.loaded[row])
+            else:
+                yield self.columns.row(row)
+        for activity in self.appended:
+            yield trackerian.activity_row(activity)
+
+    def rows_between(self, low, high):
+        """Return the snapshot rows that can start in [low, high).
+
+        Rows are found by binary search when the columns are in start
+        order and no loaded activity has been moved from its stored start.
+
+        """
+        if not self.columns:
+            return range(0)
+        starts = self.columns.starts
+        for row, activity in self.loaded.items():
+            if trackerian.datetime_to_micros(activity.start) != starts[row]:
+                return range(self.base_count)
+        return self.columns.rows_between(low, high)
+
+    def span(self, date_range_start, date_range_end=None):
+        """Return the list positions that can hold the date range."""
+        if not self._unchanged():
+            return range(len(self))
+        return self.rows_between(*trackerian.micros_range(
+            date_range_start, date_range_end
+        ))
+
+    def slice_rows(self, first, stop):
+        """Yield (start, end, name, tags) rows for positions first to stop."""
+        if self.deleted:
+            yield from super().slice_rows(first, stop)
+            return
+        for row in range(first, min(stop, self.base_count)):
+            activity = self.loaded.get(row)
+            if activity:
+                yield trackerian.activity_row(activity)
+            else:
+                yield self.columns.row(row)
+        for activity in self.appended[max(first - self.base_count, 0):
+                                      max(stop - self.base_count, 0)]:
+            yield trackerian.activity_row(activity)
+
+    def select(self, date_range_start, date_range_end=None):
+        """Yield (number, Activity) for activities in the date range.
+
+        Activities built for rows that were not loaded are not kept in
+        loaded, so listing or exporting many rows does not make later
+        lookups scan them all.
+
+        """
+        low, high = trackerian.micros_range(date_range_start, date_range_end)
+        starts = self.columns.starts if self.columns else None
+        for position, row in self._live_rows(self.rows_between(low, high)):
+            if row in self.loaded:
+                activity = self.loaded[row]
+                if trackerian.in_date_range(activity.start,
+                                            date_range_start,
+                                            date_range_end):
+                    yield position, activity
+            elif low <= starts[row] < high:
+                yield position, self.columns.activity(row)
+
+        offset = self._snapshot_length()
+        for position, activity in enumerate(self.appended, offset):
+            if trackerian.in_date_range(activity.start, date_range_start,
+                                        date_range_end):
+                yield position, activity
+
+    def summarise(self, date_range_start, date_range_end=None):
+        """Return summary totals for activities in the date range.
+
+        Snapshot rows are read straight from the columns; names and tag
+        sets are looked up in VOCABULARY once per dictionary entry rather
+        than per row.
+
+        Returns:
+            Tuple of total timedelta and dictionaries of timedelta by
+            activity name and by tag.
+
+        """
+        low, high = trackerian.micros_range(date_range_start, date_range_end)
+        now = trackerian.datetime_to_micros(trackerian.get_current_datetime())
+
+        name_micros = collections.defaultdict(int)
+        tag_micros = collections.defaultdict(int)
+        total = 0
+        objects = []
+
+        if self.columns:
+            columns = self.columns
+            key = trackerian.VOCABULARY.key
+            name_keys = [key(name) for name in columns.names]
+            tagset_keys = [tuple(key(tag) for tag in tagset)
+                           for tagset in columns.tagsets]
+            starts, ends = columns.starts, columns.ends
+            name_ids, tagset_ids = columns.name_ids, columns.tagset_ids
+
+            for _, row in self._live_rows(self.rows_between(low, high)):
+                if row in self.loaded:
+                    objects.append(self.loaded[row])
+                    continue
+                start = starts[row]
+                if not low <= start < high:
+                    continue
+                end = ends[row]
+                duration = (now if end == trackerian.NO_END else end) - start
+
+                total += duration
+                name_micros[name_keys[name_ids[row]]] += duration
+                for tag in tagset_keys[tagset_ids[row]]:
+                    tag_micros[tag] += duration
+
+        for activity in objects + self.appended:
+            if not trackerian.in_date_range(activity.start,
+                                            date_range_start,
+                                            date_range_end):
+                continue
+            if activity.end is not None:
+                duration = activity.duration // trackerian.MICROSECOND
+            else:
+                duration = (activity.return_current_duration()
+                            // trackerian.MICROSECOND)
+
+            total += duration
+            name_micros[trackerian.VOCABULARY.key(activity.name)] += duration
+            for tag in activity.tags:
+                tag_micros[trackerian.VOCABULARY.key(tag)] += duration
+
+        def to_timedelta(micros):
+            return datetime.timedelta(microseconds=micros)
+
+        return (
+            to_timedelta(total),
+            {name: to_timedelta(m) for name, m in
+             trackerian.VOCABULARY.decode(name_micros).items()},
+            {tag: to_timedelta(m) for tag, m in
+             trackerian.VOCABULARY.decode(tag_micros).items()},
+        )
+
+
+class ColumnJournal(trackerian.Journal):
+    """Journal whose snapshot is a memory-mapped ColumnFile."""
+
+    def __init__(self, data_file=None, journal_file=None):
+        super().__init__(data_file or trackerian.COLUMNS_FILE,
+                         journal_file or trackerian.COLUMNS_JOURNAL_FILE)
+
+    def read_snapshot(self):
+        """Return a ColumnActivities over the snapshot and its token."""
+        columns = ColumnFile(self.data_file)
+        return ColumnActivities(columns), columns.token
+
+    def write_snapshot(self):
+        """Write Activity.instances and the current token as a ColumnFile."""
+        if isinstance(trackerian.Activity.instances, ColumnActivities):
+            rows = trackerian.Activity.instances.rows()
+        else:
+            rows = (trackerian.activity_row(activity)
+                    for activity in trackerian.Activity.instances)
+        ColumnFile.write(self.data_file, rows, self.token)
+
+
+class SQLiteActivities(LazyActivities):
+    """Class representing Activity.instances backed by a SQLite database.
+
+    Activities are numbered in the order of their row IDs. While there are
+    no uncommitted changes, select and summarise answer from indexed
+    queries rather than by loading every activity.
+
+        Attributes:
+            connection (sqlite3.Connection): Open database connection.
+
+    """
+    record_sql = (
+        "SELECT id, start_time, end_time, name, "
+        "(SELECT group_concat(tag, char(31)) FROM "
+        "(SELECT tag FROM tags WHERE activity_id = activities.id "
+        "ORDER BY position)) FROM activities"
+    )
+
+    def __init__(self, connection):
+        count, = connection.execute(
+            "SELECT COUNT(*) FROM activities"
+        ).fetchone()
+        super().__init__(count)
+        self.connection = connection
+
+    @staticmethod
+    def record_activity(record):
+        """Return a new Activity from a row of record_sql."""
+        _, start, end, name, tags = record
+        return trackerian.row_activity(
+            start, trackerian.NO_END if end is None else end, name,
+            tags.split('\x1f') if tags else []
+        )
+
+    def build_activity(self, row):
+        """Return a new Activity for a snapshot row."""
+        if row < self.base_count // 2:
+            order, offset = 'ASC', row
+        else:
+            order, offset = 'DESC', self.base_count - 1 - row
+        record = self.connection.execute(
+            self.record_sql + " ORDER BY id {} LIMIT 1 OFFSET ?".format(order),
+            (offset,)
+        ).fetchone()
+        return self.record_activity(record)
+
+    def __iter__(self):
+        if self._unchanged():
+            records = self.connection.execute(
+                self.record_sql + " ORDER BY id LIMIT ?", (self.base_count,)
+            )
+            for row, record in enumerate(records):
+                yield self.loaded.get(row) or self.record_activity(record)
+        else:
+            yield from super().__iter__()
+
+    def reconnect(self):
+        """Open a connection of this process's own, as needed after fork."""
+        import sqlite3
+        _, _, path = self.connection.execute(
+            "PRAGMA database_list"
+        ).fetchone()
+        self.connection = sqlite3.connect(path)
+
+    def span(self, date_range_start, date_range_end=None):
+        """Return the list positions from the first to last in range."""
+        if not self._unchanged() or not (date_range_start or date_range_end):
+            return range(len(self))
+        first_id, last_id = self.connection.execute(
+            "SELECT MIN(id), MAX(id) FROM activities INDEXED BY "
+            "activities_start WHERE start_time >= ? AND start_time < ?",
+            trackerian.micros_range(date_range_start, date_range_end)
+        ).fetchone()
+        if first_id is None:
+            return range(0)
+        first, last = self.connection.execute(
+            "SELECT COUNT(CASE WHEN id < ? THEN 1 END), "
+            "COUNT(CASE WHEN id <= ? THEN 1 END) FROM activities",
+            (first_id, last_id)
+        ).fetchone()
+        return range(first, last)
+
+    def slice_rows(self, first, stop):
+        """Yield (start, end, name, tags) rows for positions first to stop."""
+        if not self._unchanged():
+            yield from super().slice_rows(first, stop)
+            return
+        records = self.connection.execute(
+            self.record_sql + " ORDER BY id LIMIT ? OFFSET ?",
+            (max(min(stop, self.base_count) - first, 0), first)
+        )
+        for _, start, end, name, tags in records:
+            yield (start, trackerian.NO_END if end is None else end, name,
+                   tuple(tags.split('\x1f')) if tags else ())
+
+    def select(self, date_range_start, date_range_end=None):
+        """Yield (number, Activity) for activities in the date range.
+
+        The first and last activities in range are found through the
+        start time index and only rows between them are read.
+
+        """
+        if not self._unchanged():
+            yield from super().select(date_range_start, date_range_end)
+            return
+
+        low, high = trackerian.micros_range(date_range_start, date_range_end)
+        if date_range_start is None and date_range_end is None:
+            first_id, last_id, position = 0, None, 0
+        else:
+            first_id, last_id = self.connection.execute(
+                "SELECT MIN(id), MAX(id) FROM activities INDEXED BY "
+                "activities_start WHERE start_time >= ? AND start_time < ?",
+                (low, high)
+            ).fetchone()
+            if first_id is None:
+                return
+            position, = self.connection.execute(
+                "SELECT COUNT(*) FROM activities WHERE id < ?", (first_id,)
+            ).fetchone()
+
+        records = self.connection.execute(
+            self.record_sql + " WHERE id >= ? AND id <= COALESCE(?, id) "
+            "ORDER BY id", (first_id, last_id)
+        )
+        for record in records:
+            if low <= record[1] < high:
+                activity = self.loaded.get(position)
+                yield position, activity or self.record_activity(record)
+            position += 1
+
+    def summarise(self, date_range_start, date_range_end=None):
+        """Return summary totals for activities in the date range.
+
+        Totals come from GROUP BY queries over the start time index using
+        the title cased names and tags stored with each row.
+
+        Returns:
+            Tuple of total timedelta and dictionaries of timedelta by
+            activity name and by tag.
+
+        """
+        if not self._unchanged():
+            return trackerian.sum_durations(self, date_range_start,
+                                            date_range_end)
+
+        now = trackerian.datetime_to_micros(trackerian.get_current_datetime())
+        where, parameters = '', (now,)
+        if date_range_start or date_range_end:
+            where = "WHERE activities.start_time >= ? " \
+                    "AND activities.start_time < ?"
+            parameters = (now,) + trackerian.micros_range(
+                date_range_start, date_range_end
+            )
+        duration_sql = "SUM(COALESCE(activities.end_time, ?) - " \
+                       "activities.start_time)"
+
+        def to_timedelta(micros):
+            return datetime.timedelta(microseconds=micros or 0)
+
+        total, = self.connection.execute(
+            "SELECT {} FROM activities {}".format(duration_sql, where),
+            parameters
+        ).fetchone()
+        names = self.connection.execute(
+            "SELECT title, {} FROM activities {} GROUP BY title "
+            "ORDER BY MIN(id)".format(duration_sql, where), parameters
+        )
+        tags = self.connection.execute(
+            "SELECT tags.title, {} FROM tags JOIN activities "
+            "ON activities.id = tags.activity_id {} GROUP BY tags.title "
+            "ORDER BY MIN(activities.id), MIN(tags.position)".format(
+                duration_sql, where
+            ), parameters
+        )
+        return (
+            to_timedelta(total),
+            {name: to_timedelta(micros) for name, micros in names},
+            {tag: to_timedelta(micros) for tag, micros in tags},
+        )
+
+
+class SQLiteStore:
+    """Class representing activities kept in an indexed SQLite database.
+
+    Each recorded event is written as its own small transaction instead of
+    rewriting the history, and list and summary queries use indexes on
+    start time, name and tag.
+
+        Attributes:
+            data_file (str): Path of the database.
+            connection (sqlite3.Connection): Open connection, once loaded.
+            count (int): Number of activities in the database.
+
+    """
+    schema = """
+        CREATE TABLE IF NOT EXISTS activities (
+            id INTEGER PRIMARY KEY,
+            start_time INTEGER NOT NULL,
+            end_time INTEGER,
+            name TEXT NOT NULL,
+            title TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS tags (
+            activity_id INTEGER NOT NULL REFERENCES activities (id),
+            position INTEGER NOT NULL,
+            tag TEXT NOT NULL,
+            title TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS activities_start
+            ON activities (start_time);
+        CREATE INDEX IF NOT EXISTS activities_title ON activities (title);
+        CREATE INDEX IF NOT EXISTS tags_activity
+            ON tags (activity_id, position);
+        CREATE INDEX IF NOT EXISTS tags_title ON tags (title);
+    """
+
+    def __init__(self, data_file=None):
+        self.data_file = data_file or trackerian.SQLITE_FILE
+        self.connection = None
+        self.count = 0
+
+    def connect(self):
+        """Open the database, creating its tables if needed."""
+        if self.connection is None:
+            try:
+                import sqlite3
+            except ImportError:
+                raise RuntimeError("This Python was built without sqlite3")
+            self.connection = sqlite3.connect(self.data_file)
+            self.connection.executescript(self.schema)
+
+    def load(self):
+        """Set Activity.instances to a SQLiteActivities for the database."""
+        self.connect()
+        trackerian.Activity.events = []
+        trackerian.Activity.instances = SQLiteActivities(self.connection)
+        self.count = trackerian.Activity.instances.base_count
+
+    def version(self):
+        """Return a value that changes whenever the store is written."""
+        return trackerian.file_version(self.data_file)
+
+    def commit(self):
+        """Apply each of Activity.events to the database in turn."""
+        if not trackerian.Activity.events:
+            return
+        with self.connection:
+            for event in trackerian.Activity.events:
+                self.apply(event)
+        self.load()
+
+    def checkpoint(self):
+        """Replace the database contents with Activity.instances."""
+        self.connect()
+        with self.connection:
+            self.connection.execute("DELETE FROM tags")
+            self.connection.execute("DELETE FROM activities")
+            self.count = 0
+            for activity in list(trackerian.Activity.instances):
+                self.insert(activity.name, activity.start, activity.end,
+                            activity.tags)
+        trackerian.Activity.events = []
+
+    def insert(self, name, start, end=None, tags=()):
+        """Insert an activity row and its tags."""
+        cursor = self.connection.execute(
+            "INSERT INTO activities (start_time, end_time, name, title) "
+            "VALUES (?, ?, ?, ?)",
+            (trackerian.datetime_to_micros(start),
+             trackerian.datetime_to_micros(end) if end else None, name,
+             name.title())
+        )
+        self.add_tags(cursor.lastrowid, tags)
+        self.count += 1
+
+    def add_tags(self, activity_id, tags):
+        """Append tags to those of the activity with activity_id."""
+        position, = self.connection.execute(
+            "SELECT COALESCE(MAX(position) + 1, 0) FROM tags "
+            "WHERE activity_id = ?", (activity_id,)
+        ).fetchone()
+        self.connection.executemany(
+            "INSERT INTO tags (activity_id, position, tag, title) "
+            "VALUES (?, ?, ?, ?)",
+            [(activity_id, position + offset, tag, tag.title())
+             for offset, tag in enumerate(tags)]
+        )
+
+    def id_at(self, index):
+        """Return the row ID of the activity numbered index."""
+        if index < self.count // 2:
+            order, offset = 'ASC', index
+        else:
+            order, offset = 'DESC', self.count - 1 - index
+        activity_id, = self.connection.execute(
+            "SELECT id FROM activities ORDER BY id {} LIMIT 1 OFFSET ?".format(
+                order
+            ), (offset,)
+        ).fetchone()
+        return activity_id
+
+    def apply(self, event):
+        """Apply a recorded event to the database.
+
+        Args:
+            event (tuple): Tuple of op, index and value as made by
+                record_event.
+
+        """
+        op, index, value = event
+        if op == 'begin':
+            self.insert(*value)
+            return
+
+        activity_id = self.id_at(index)
+        if op == 'remove':
+            self.connection.execute(
+                "DELETE FROM tags WHERE activity_id = ?", (activity_id,)
+            )
+            self.connection.execute(
+                "DELETE FROM activities WHERE id = ?", (activity_id,)
+            )
+            self.count -= 1
+            return
+
+        if op == 'tag':
+            self.add_tags(activity_id, value)
+            return
+
+        if op == 'finish':
+            value = ('end', value)
+        to_edit, new_value = value
+        if to_edit == 'name':
+            self.connection.execute(
+                "UPDATE activities SET name = ?, title = ? WHERE id = ?",
+                (new_value, new_value.title(), activity_id)
+            )
+        elif to_edit == 'tags':
+            self.connection.execute(
+                "DELETE FROM tags WHERE activity_id = ?", (activity_id,)
+            )
+            self.add_tags(activity_id, new_value)
+        else:
+            self.connection.execute(
+                "UPDATE activities SET {}_time = ? WHERE id = ?".format(
+                    to_edit
+                ), (None if new_value is None
+                    else trackerian.datetime_to_micros(new_value), activity_id)
+            )
+
+
+class SegmentActivities(LazyActivities):
+    """Class representing Activity.instances split across segment files.
+
+    Only segments whose activities could fall within a requested range
+    are read, so a day's list or summary does not depend on how long the
+    history is.
+
+        Attributes:
+            store (SegmentStore): Store holding the segment files.
+            offsets (list): Number of the first activity in each segment.
+
+    """
+
+    def __init__(self, store):
+        self.store = store
+        self.offsets = []
+        count = 0
+        for segment in store.manifest:
+            self.offsets.append(count)
+            count += segment['count']
+        super().__init__(count)
+
+    def locate(self, row):
+        """Return the segment number and offset within it of row."""
+        segment = bisect.bisect_right(self.offsets, row) - 1
+        return segment, row - self.offsets[segment]
+
+    def build_activity(self, row):
+        """Return a new Activity for a snapshot row."""
+        segment, offset = self.locate(row)
+        rows = self.store.read_segment(segment)
+        return trackerian.row_activity(*rows[offset])
+
+    def _windowed_rows(self, date_range_start, date_range_end=None):
+        """Yield (number, row tuple) from segments reaching the range.
+
+        Args:
+            date_range_start (Datetime): Datetime object or None for all.
+            date_range_end (Datetime): Datetime object or None for no end.
+
+        """
+        low, high = trackerian.micros_range(date_range_start, date_range_end)
+        for segment, info in enumerate(self.store.manifest):
+            if info['last'] < low or info['first'] >= high:
+                continue
+            rows = self.store.read_segment(segment)
+            for offset, row in enumerate(rows, self.offsets[segment]):
+                if offset in self.loaded:
+                    row = trackerian.activity_row(self.loaded[offset])
+                yield offset, row
+
+    def select(self, date_range_start, date_range_end=None):
+        """Yield (number, Activity) for activities in the date range."""
+        if not self._unchanged():
+            yield from super().select(date_range_start, date_range_end)
+            return
+
+        low, high = trackerian.micros_range(date_range_start, date_range_end)
+        for num, row in self._windowed_rows(date_range_start,
+                                            date_range_end):
+            if not low <= row[0] < high:
+                continue
+            activity = self.loaded.get(num)
+            yield num, activity or trackerian.row_activity(*row)
+
+    def span(self, date_range_start, date_range_end=None):
+        """Return the list positions of the segments reaching the range."""
+        if not self._unchanged():
+            return range(len(self))
+        low, high = trackerian.micros_range(date_range_start, date_range_end)
+        reaching = [segment for segment, info in enumerate(self.store.manifest)
+                    if info['last'] >= low and info['first'] < high]
+        if not reaching:
+            return range(0)
+        last = reaching[-1]
+        return range(self.offsets[reaching[0]],
+                     self.offsets[last] + self.store.manifest[last]['count'])
+
+    def slice_rows(self, first, stop):
+        """Yield (start, end, name, tags) rows for positions first to stop.
+
+        Only the segment files holding those positions are read.
+
+        """
+        if not self._unchanged():
+            yield from super().slice_rows(first, stop)
+            return
+        for segment, offset in enumerate(self.offsets):
+            count = self.store.manifest[segment]['count']
+            if offset + count <= first or offset >= stop:
+                continue
+            rows = self.store.read_segment(segment)
+            yield from rows[max(first - offset, 0):stop - offset]
+
+    def summarise(self, date_range_start, date_range_end=None):
+        """Return summary totals, reading only segments within range."""
+        if not self._unchanged():
+            return trackerian.sum_durations(self, date_range_start,
+                                            date_range_end)
+        return trackerian.sum_row_durations(
+            (row for _, row in self._windowed_rows(date_range_start,
+                                                   date_range_end)),
+            date_range_start, date_range_end
+        )
+
+
+class SegmentStore:
+    """Class representing activities kept in per-month segment files.
+
+    A JSON manifest lists the segments in order with their row count and
+    earliest and latest start times. A segment holds a run of consecutive
+    activities that began in the same month, so a change rewrites only
+    the segments it touches.
+
+        Attributes:
+            data_file (str): Directory holding the manifest and segments.
+            manifest (list): Dictionaries describing each segment.
+
+    """
+
+    def __init__(self, data_dir=None):
+        self.data_file = data_dir or trackerian.SEGMENTS_DIR
+        self.manifest = []
+        self.cache = {}
+
+    def path(self, file_name):
+        """Return the path of a file within the store directory."""
+        return os.path.join(self.data_file, file_name)
+
+    def read_segment(self, segment):
+        """Return the list of row tuples held in a segment."""
+        if segment not in self.cache:
+            file_name = self.manifest[segment]['file']
+            with open(self.path(file_name), 'rb') as segment_file:
+                self.cache[segment] = trackerian.load_pickle(segment_file)
+        return self.cache[segment]
+
+    def load(self):
+        """Read the manifest and set Activity.instances from it."""
+        self.cache = {}
+        try:
+            with open(self.path('manifest.json')) as manifest_file:
+                self.manifest = json.load(manifest_file)
+        except FileNotFoundError:
+            self.manifest = []
+        trackerian.Activity.events = []
+        trackerian.Activity.instances = SegmentActivities(self)
+
+    def version(self):
+        """Return a value that changes whenever the store is written."""
+        return trackerian.file_version(self.path('manifest.json'))
+
+    def write(self, segments):
+        """Write segments then the manifest describing them.
+
+        Changed segments are written to new files, as Archive.add does,
+        so a reader holding the old manifest never opens a segment
+        rewritten under it. The files they replace are removed once the
+        new manifest is in place.
+
+        Args:
+            segments (list): (month, rows, file name) tuples where file
+                name is None for new segments and rows is None for
+                segments left untouched.
+
+        """
+        os.makedirs(self.data_file, exist_ok=True)
+        used = {file_name for _, _, file_name in segments if file_name}
+        manifest = []
+        for segment, (month, rows, file_name) in enumerate(segments):
+            if rows is None:
+                manifest.append(self.manifest[segment])
+                continue
+            if not rows:
+                continue
+            file_name = os.urandom(16).hex() + '.pickle'
+            trackerian.write_atomically(
+                self.path(file_name),
+                lambda segment_file: pickle.dump(rows, segment_file)
+            )
+
+            starts = [row[0] for row in rows]
+            manifest.append({'file': file_name, 'month': month,
+                             'count': len(rows), 'first': min(starts),
+                             'last': max(starts)})
+
+        trackerian.write_atomically(
+            self.path('manifest.json'),
+            lambda manifest_file: manifest_file.write(
+                json.dumps(manifest).encode('utf-8')
+            )
+        )
+
+        kept = {segment['file'] for segment in manifest}
+        for file_name in used - kept:
+            os.remove(self.path(file_name))
+
+    def commit(self):
+        """Rewrite only the segments changed by Activity.events.
+
+        Only segments holding loaded or deleted rows are read to compare,
+        the rest are kept as they are.
+
+        """
+        if not trackerian.Activity.events:
+            return
+
+        instances = trackerian.Activity.instances
+        deleted = set(instances.deleted)
+        touched_segments = {instances.locate(row)[0]
+                            for row in itertools.chain(instances.loaded,
+                                                       deleted)}
+        segments = []
+        for segment, info in enumerate(self.manifest):
+            if segment not in touched_segments:
+                segments.append((info['month'], None, info['file']))
+                continue
+            first = instances.offsets[segment]
+            touched = range(first, first + info['count'])
+            stored = self.read_segment(segment)
+            rows = []
+            for row in touched:
+                if row in deleted:
+                    continue
+                if row in instances.loaded:
+                    rows.append(trackerian.activity_row(instances.loaded[row]))
+                else:
+                    rows.append(stored[row - first])
+            changed = rows != stored
+            segments.append((info['month'], rows if changed else None,
+                             info['file']))
+
+        for activity in instances.appended:
+            row = trackerian.activity_row(activity)
+            month = activity.start.strftime('%Y-%m')
+            if not segments or segments[-1][0] != month:
+                segments.append((month, [], None))
+            last_month, rows, file_name = segments[-1]
+            if rows is None:
+                rows = list(self.read_segment(len(segments) - 1))
+                segments[-1] = (last_month, rows, file_name)
+            rows.append(row)
+
+        self.write(segments)
+        self.load()
+
+    def checkpoint(self):
+        """Replace all segments with ones built from Activity.instances."""
+        segments = []
+        for activity in list(trackerian.Activity.instances):
+            month = activity.start.strftime('%Y-%m')
+            if not segments or segments[-1][0] != month:
+                segments.append((month, [], None))
+            segments[-1][1].append(trackerian.activity_row(activity))
+
+        old_files = [segment['file'] for segment in self.manifest]
+        self.manifest = []
+        self.write(segments)
+        for file_name in old_files:
+            if os.path.exists(self.path(file_name)):
+                os.remove(self.path(file_name))
+        trackerian.Activity.events = []